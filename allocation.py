@@ -0,0 +1,146 @@
+######################################
+# Shared-inventory allocation
+# Splits one owned stockpile across several independent raid targets so
+# the total crafted sulfur is as small as possible. Each target is solved
+# on its own into a cost curve (least sulfur for every way of spending the
+# owned explosives), and the curves are combined target by target with a
+# min-plus convolution, so the work grows linearly with the targets.
+######################################
+
+import numpy as np
+
+from batch import summarize_solution
+from matrices import get_matrices
+from solvers import dp_cost_curve, dp_solution, solve_raid, SolverNotApplicable
+
+
+def combine_curves(curves, limits):
+    """
+    Min-plus convolution of dp_cost_curve results that share the same owned limits.
+    Returns the state given to each curve in the cheapest combined plan (spending as little
+    owned inventory as possible on ties) and its total sulfur.
+    """
+    # Flat index = mixed-radix state, so the array axes run from the last owned explosive to the first
+    shape = tuple(limit + 1 for limit in reversed(limits)) or (1,)
+    combined = np.full(shape, np.inf)
+    combined.flat[0] = 0
+    choices = []
+    for curve in curves:
+        merged = np.full(shape, np.inf)
+        choice = np.zeros(shape, dtype=np.int64)
+        for state, sulfur in curve["cost"].items():
+            spent = tuple(reversed(curve["digits"](state))) or (0,)
+            target = tuple(slice(d, None) for d in spent)
+            source = tuple(slice(None, size - d) for d, size in zip(spent, shape))
+            candidate = combined[source] + sulfur
+            better = candidate < merged[target]
+            merged[target][better] = candidate[better]
+            choice[target][better] = state
+        combined = merged
+        choices.append(choice.ravel())
+
+    flat = combined.ravel()
+    best = flat.min()
+    if best == np.inf:
+        raise ValueError("No feasible allocation found.")
+    spent_total = np.zeros(flat.size, dtype=np.int64)
+    for axis in range(len(shape)):
+        spent_total += np.indices(shape)[axis].ravel()
+    state = int(min(np.flatnonzero(flat == best), key=lambda s: spent_total[s]))
+
+    states = [0] * len(curves)
+    for t in reversed(range(len(curves))):
+        states[t] = int(choices[t][state])
+        state -= states[t]
+    return states, int(best)
+
+
+def split_solution(targets, solution, explosive_list, explosives, structures):
+    """
+    Hands the pattern counts of one merged solution back out to the targets, in order.
+    Owned explosives go to instances in order before anything is crafted, as in expand_instances.
+    """
+    matrices = get_matrices(explosives, structures)
+    sulfur = {exp: int(matrices.sulfur[matrices.explosive_index[exp]]) for exp in explosive_list}
+    remaining_owned = dict(solution["owned_used"])
+    left = {struct: [list(item) for item in items] for struct, items in solution["pattern_counts"].items()}
+    solutions = []
+    for selected_structures in targets:
+        pattern_counts = {}
+        owned_used = {exp: 0 for exp in explosive_list}
+        sulfur_cost = 0
+        for struct, qty in selected_structures.items():
+            pattern_counts[struct] = []
+            while qty:
+                pattern, available = left[struct][0]
+                taken = min(qty, available)
+                pattern_counts[struct].append((pattern, taken))
+                qty -= taken
+                left[struct][0][1] -= taken
+                if left[struct][0][1] == 0:
+                    left[struct].pop(0)
+                for _ in range(taken):
+                    for exp, used in pattern.items():
+                        owned = min(remaining_owned.get(exp, 0), used)
+                        remaining_owned[exp] = remaining_owned.get(exp, 0) - owned
+                        owned_used[exp] += owned
+                        sulfur_cost += (used - owned) * sulfur[exp]
+        solutions.append({
+            "pattern_counts": pattern_counts,
+            "owned_used": owned_used,
+            "sulfur_cost": sulfur_cost,
+            "optimal": solution["optimal"],
+        })
+    return solutions
+
+
+def allocate_inventory(targets, explosive_dict, explosives, structures, plan_table=None, time_limit=None):
+    """
+    Allocates the owned explosives in explosive_dict across targets (a list of
+    selected_structures dicts) to minimize the crafted sulfur of all raids together.
+    Every target may use every explosive in explosive_dict.
+    Returns {"targets": [...], "sulfur_cost", "owned_used", "explosive_crafted_totals",
+    "crafted_resources", "optimal", "method"}, with one batch.summarize_solution summary per
+    target. method is "curves" for the per-target decomposition, or "merged" when the owned
+    inventory is too large for cost curves and all targets are solved as one per-type model
+    (identical structures across targets are interchangeable, so that is still exact).
+    """
+    if not targets:
+        raise ValueError("Select at least one target.")
+    explosive_list = list(explosive_dict.keys())
+    try:
+        curves = [
+            dp_cost_curve(selected_structures, explosive_dict, explosives, structures)
+            for selected_structures in targets
+        ]
+    except SolverNotApplicable:
+        curves = None
+
+    if curves is not None:
+        method = "curves"
+        states, _ = combine_curves(curves, curves[0]["limits"])
+        solutions = [dp_solution(curve, state) for curve, state in zip(curves, states)]
+    else:
+        method = "merged"
+        merged = {}
+        for selected_structures in targets:
+            for struct, qty in selected_structures.items():
+                merged[struct] = merged.get(struct, 0) + qty
+        solution = solve_raid(merged, explosive_dict, explosives, structures, "auto", plan_table, time_limit)
+        solutions = split_solution(targets, solution, explosive_list, explosives, structures)
+
+    summaries = [
+        summarize_solution(selected_structures, explosive_dict, solution, explosives, structures)
+        for selected_structures, solution in zip(targets, solutions)
+    ]
+    owned_used = {exp: sum(summary["explosive_owned_totals"][exp] for summary in summaries) for exp in explosive_list}
+    crafted = {exp: sum(summary["explosive_crafted_totals"][exp] for summary in summaries) for exp in explosive_list}
+    return {
+        "targets": summaries,
+        "sulfur_cost": sum(summary["sulfur_cost"] for summary in summaries),
+        "owned_used": owned_used,
+        "explosive_crafted_totals": crafted,
+        "crafted_resources": get_matrices(explosives, structures).resources_for(crafted),
+        "optimal": all(summary["optimal"] for summary in summaries),
+        "method": method,
+    }
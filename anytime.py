@@ -0,0 +1,167 @@
+######################################
+# Anytime optimization
+# A greedy plan is ready in milliseconds: owned explosives go wherever
+# they save the most sulfur each, and every remaining HP is filled with
+# the cheapest crafted combination. A lower bound from sulfur-per-damage
+# ratios gives the optimality gap.
+# Quality levels say how long the exact solver may then try to improve it.
+######################################
+
+import math
+
+from matrices import get_matrices
+from patterns import cheapest_cover, scaled_options
+
+# Seconds the exact solver gets after the greedy plan; None means no limit of its own
+QUALITY_TIME_LIMITS = {
+    "fast": 0,
+    "balanced": 1.0,
+    "exact": None,
+}
+QUALITY_LEVELS = tuple(QUALITY_TIME_LIMITS)
+
+
+def _owned_spends(hp, owned, remaining):
+    # Owned usage vectors for one instance: strongest explosive first, each taking either as many
+    # as the HP left needs or one fewer, stopping after any of them to craft the rest
+    spends = []
+    spent = {}
+
+    def walk(j, dealt):
+        if dealt >= hp or j == len(owned):
+            return
+        exp, damage = owned[j]
+        need = -(-(hp - dealt) // damage)
+        for count in sorted({min(remaining[exp], need), min(remaining[exp], need - 1)}, reverse=True):
+            if count:
+                spent[exp] = count
+                spends.append((dict(spent), dealt + count * damage))
+            walk(j + 1, dealt + count * damage)
+            spent.pop(exp, None)
+
+    walk(0, 0)
+    return spends
+
+
+# Ways to rank where owned explosives go next, from (sulfur saved on one instance, explosives spent)
+GREEDY_RANKINGS = (
+    lambda saving, spent: (saving / spent, saving),
+    lambda saving, spent: (saving, -spent),
+)
+
+
+def greedy_solution(selected_structures, explosive_dict, explosives, structures):
+    """
+    A quick plan, not necessarily the cheapest, as the same solution dict as
+    patterns.solve_by_type (with "optimal" False). Every instance starts out crafted; owned
+    explosives are then added to a group of identical instances at a time, always where they
+    rank best: once by sulfur saved per explosive spent and once by sulfur saved per instance,
+    keeping the cheaper plan. Whatever HP they leave is crafted as cheaply as possible.
+    """
+    return min(
+        (_greedy(selected_structures, explosive_dict, explosives, structures, rank) for rank in GREEDY_RANKINGS),
+        key=lambda solution: solution["sulfur_cost"],
+    )
+
+
+def _greedy(selected_structures, explosive_dict, explosives, structures, rank):
+    matrices = get_matrices(explosives, structures)
+    explosive_list = list(explosive_dict.keys())
+    remaining = dict(explosive_dict)
+    types = {}
+    # (structure, owned spent per instance) -> identical instances: count, damage dealt by owned, sulfur
+    groups = {}
+    for struct, qty in selected_structures.items():
+        hp = int(matrices.scaled_hp[matrices.structure_index[struct]])
+        options = scaled_options(struct, explosive_list, matrices)
+        if not options:
+            raise ValueError(f"Selected explosives cannot destroy '{struct}'.")
+        types[struct] = (hp, options, sorted(((exp, damage) for exp, damage, _ in options), key=lambda o: -o[1]))
+        groups[(struct, ())] = {"count": qty, "dealt": 0, "sulfur": cheapest_cover(hp, options)[0]}
+
+    while True:
+        best = None
+        for key, group in groups.items():
+            hp, options, by_damage = types[key[0]]
+            owned = [(exp, damage) for exp, damage in by_damage if remaining[exp] > 0]
+            if not group["count"] or not owned:
+                continue
+            for spent, dealt in _owned_spends(hp - group["dealt"], owned, remaining):
+                sulfur = cheapest_cover(hp - group["dealt"] - dealt, options)[0]
+                saving = group["sulfur"] - sulfur
+                if saving > 0:
+                    order = rank(saving, sum(spent.values()))
+                    if best is None or order > best[0]:
+                        best = (order, key, spent, dealt, sulfur)
+        if best is None:
+            break
+        # Every instance of the group can take the same explosives while they last
+        _, key, spent, dealt, sulfur = best
+        group = groups[key]
+        times = min([group["count"]] + [remaining[exp] // count for exp, count in spent.items()])
+        merged = dict(key[1])
+        for exp, count in spent.items():
+            remaining[exp] -= count * times
+            merged[exp] = merged.get(exp, 0) + count
+        group["count"] -= times
+        target = groups.setdefault(
+            (key[0], tuple(sorted(merged.items()))), {"count": 0, "dealt": group["dealt"] + dealt, "sulfur": sulfur}
+        )
+        target["count"] += times
+
+    pattern_counts = {struct: [] for struct in selected_structures}
+    sulfur_cost = 0
+    for (struct, spent), group in groups.items():
+        if not group["count"]:
+            continue
+        hp, options, _ = types[struct]
+        pattern = dict(cheapest_cover(hp - group["dealt"], options)[1])
+        for exp, count in spent:
+            pattern[exp] = pattern.get(exp, 0) + count
+        pattern_counts[struct].append(
+            ({exp: pattern[exp] for exp in explosive_list if pattern.get(exp)}, group["count"])
+        )
+        sulfur_cost += group["sulfur"] * group["count"]
+    return {
+        "pattern_counts": pattern_counts,
+        "owned_used": {exp: explosive_dict[exp] - remaining[exp] for exp in explosive_list},
+        "sulfur_cost": sulfur_cost,
+        "optimal": False,
+    }
+
+
+def raid_lower_bound(selected_structures, explosive_dict, explosives, structures):
+    """
+    Sulfur no plan can beat. Every point of HP dealt by crafting costs at least the best
+    sulfur-per-damage ratio on that structure, and one owned explosive can take at most its
+    damage times the best ratio among the selected structures off that.
+    """
+    matrices = get_matrices(explosives, structures)
+    explosive_list = list(explosive_dict.keys())
+    ratios = {}
+    bound = 0.0
+    for struct, qty in selected_structures.items():
+        options = scaled_options(struct, explosive_list, matrices)
+        if not options:
+            raise ValueError(f"Selected explosives cannot destroy '{struct}'.")
+        # Options are sorted by ratio, best first
+        _, damage, sulfur = options[0]
+        ratios[struct] = sulfur / damage
+        bound += qty * int(matrices.scaled_hp[matrices.structure_index[struct]]) * ratios[struct]
+    for exp, owned in explosive_dict.items():
+        if owned:
+            row = matrices.explosive_index[exp]
+            bound -= owned * max((
+                int(matrices.scaled_damage[row, matrices.structure_index[struct]]) * ratio
+                for struct, ratio in ratios.items()
+            ), default=0)
+    return max(0, math.ceil(bound - 1e-6))
+
+
+def optimality_gap(sulfur_cost, lower_bound):
+    """
+    (sulfur_cost - lower_bound) / sulfur_cost, 0 when the plan is known to be optimal.
+    """
+    if sulfur_cost <= lower_bound:
+        return 0.0
+    return (sulfur_cost - lower_bound) / sulfur_cost
@@ -1,146 +1,319 @@
-from flask import Flask, render_template, request, redirect, url_for
+from flask import (
+    Flask, render_template, request, redirect, url_for, jsonify, Response, stream_with_context, g, make_response
+)
+from markupsafe import escape
+import cProfile
+import io
 import json
-from pulp import *
+import os
+import pstats
+import threading
+import uuid
+from time import perf_counter
+from anytime import QUALITY_LEVELS
+from datastore import get_store, CURRENT
+from engine import instrumented_raid_optimizer
+from incremental import IncrementalOptimizer, cold_session_raid_optimizer, session_raid_optimizer
+from result_cache import ResultCache, SharedMemoryTier, SingleFlight, raid_cache_key
+from solver_pool import SolverPool, SolverBusy, SolverTimeout
+from jobs import JobManager
+from batch import evaluate_raids, parse_explosives, parse_raid_spec
+from metrics import MetricsRegistry
+from patterns import NoPlanFound
+from sweep import parse_sweep, write_sweep_csv
 
-# Load data
-with open('explosives.json', 'r') as file:
-    explosives = json.load(file)
-with open('structures.json', 'r') as file:
-    structures = json.load(file)
+# Game data lives in a versioned store. The current version, its matrices and its plan table are
+# loaded here, before any worker processes fork; each request picks a version with ?data=<name>
+store = get_store()
+store.get(CURRENT)
+
+# Slots of the shared memory caches that forked web workers (serve.py) read and write; 0 turns them off
+shared_cache_slots = int(os.environ.get("RAID_SHARED_CACHE_SLOTS", 0))
+shared_cache_slot_bytes = int(os.environ.get("RAID_SHARED_CACHE_SLOT_KB", 64)) * 1024
+
+def shared_tier():
+    if shared_cache_slots <= 0:
+        return None
+    return SharedMemoryTier(shared_cache_slots, shared_cache_slot_bytes)
+
+# Optimizer results keyed on canonical inputs; set RAID_CACHE_DB to share them through SQLite
+optimizer_cache = ResultCache(
+    maxsize=int(os.environ.get("RAID_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("RAID_CACHE_TTL", 600)),
+    sqlite_path=os.environ.get("RAID_CACHE_DB"),
+    shared=shared_tier(),
+)
+# Identical optimizer requests arriving together wait on one solve instead of each starting their own
+optimizer_flights = SingleFlight()
+# Per-user incremental optimizers, keyed by the raid_session cookie and dropped after RAID_SESSION_TTL idle seconds
+optimizer_sessions = ResultCache(
+    maxsize=int(os.environ.get("RAID_SESSION_LIMIT", 256)),
+    ttl=float(os.environ.get("RAID_SESSION_TTL", 1800)),
+)
+SESSION_COOKIE = "raid_session"
+# Plans shown on the optimizer page, kept so their full instance list can be fetched a page at a time
+plan_pages = ResultCache(
+    maxsize=int(os.environ.get("RAID_PLAN_PAGES", 256)),
+    ttl=float(os.environ.get("RAID_SESSION_TTL", 1800)),
+    shared=shared_tier(),
+)
 
 app = Flask(__name__)
 
-def calculate_resources(explosive_type, quantity):
-    explosive = explosives[explosive_type]
-    raw_materials = explosive['raw_materials']
-    total_resources = {material: amount * quantity for material, amount in raw_materials.items()}
-    return total_resources
+def on_game_data_swap(name, old_engine, new_engine):
+    # Cached plans are keyed on the old content hash and could never be hit again; sessions
+    # bound to the old engine are replaced the next time their user submits
+    optimizer_cache.clear()
+    app.logger.info("Game data '%s' reloaded: %s -> %s", name, old_engine.version[:12], new_engine.version[:12])
 
-def specific_damage_values(explosive_list, structure):
-    damage_values = {}
-    for explosive in explosive_list:
-        damage_values[explosive] = explosives[explosive]["damage_per_structure"][structure]
-    return damage_values
+store.add_listener(on_game_data_swap)
+# Seconds between checks of the game data files; 0 turns hot reloading off
+data_watch_interval = float(os.environ.get("RAID_DATA_WATCH_INTERVAL", 2))
+if data_watch_interval > 0:
+    store.watch(data_watch_interval)
 
-def run_raid_optimizer(selected_structures, explosive_dict):
+def cached_raid_optimizer(selected_structures, explosive_dict, mode="by_type", solver="auto", optimizer=None,
+                          quality="exact"):
     """
-    Runs the sulfur optimizer given selected structures and explosives (with owned amounts).
-    Returns a dict with detailed breakdowns for display.
+    run_raid_optimizer on the request's game data, memoized on the canonicalized inputs and the
+    data's content hash. Concurrent misses for the same key share a single solve. A session's
+    IncrementalOptimizer, if given, solves small edits of its earlier raids in this process so it
+    can reuse its previous work; other misses solve on a worker and hand their tables back to the
+    session. Only "exact" quality uses it; quicker levels run in this process.
     """
-    explosive_list = list(explosive_dict.keys())
-    prob = LpProblem("Rust_Raid_Optimizer", LpMinimize)
-
-    owned_vars = {}
-    crafted_vars = {}
-
-    # Create variables for each structure instance and explosive
-    for struct, qty in selected_structures.items():
-        for i in range(qty):
-            for exp in explosive_list:
-                owned_vars[(exp, struct, i)] = LpVariable(f"owned_{exp}_{struct}_{i+1}", 0, cat='Integer')
-                crafted_vars[(exp, struct, i)] = LpVariable(f"crafted_{exp}_{struct}_{i+1}", 0, cat='Integer')
-
-    # Constraint: total owned used ≤ owned amount
-    for exp in explosive_list:
-        prob += lpSum([owned_vars[(exp, struct, i)] for struct, qty in selected_structures.items() for i in range(qty)]) <= explosive_dict[exp]
-
-    # Objective: minimize sulfur cost (only crafted explosives cost sulfur)
-    prob += lpSum([
-        crafted_vars[(exp, struct, i)] * explosives[exp]['raw_materials']['sulfur']
-        for (exp, struct, i) in crafted_vars
-    ]), "Total_Sulfur_Cost"
-
-    # Calculate max single-hit damage for each structure
-    max_damage = {struct: max(explosives[exp]['damage_per_structure'][struct] for exp in explosive_list) for struct in selected_structures}
-
-    # Damage constraints: both owned and crafted count toward damage
-    for struct, qty in selected_structures.items():
-        for i in range(qty):
-            # Lower bound: must destroy the structure
-            prob += lpSum([
-                (owned_vars[(exp, struct, i)] + crafted_vars[(exp, struct, i)]) * explosives[exp]['damage_per_structure'][struct]
-                for exp in explosive_list
-            ]) >= structures[struct], f"{struct}_{i+1}_lower"
-            # Upper bound: don't use way more than needed
-            prob += lpSum([
-                (owned_vars[(exp, struct, i)] + crafted_vars[(exp, struct, i)]) * explosives[exp]['damage_per_structure'][struct]
-                for exp in explosive_list
-            ]) <= structures[struct] + max_damage[struct], f"{struct}_{i+1}_upper"
-
-    # Solve the optimization problem
-    prob.solve()
-
-    # Breakdown by structure instance
-    structure_instance_usage = {}
-    for struct, qty in selected_structures.items():
-        structure_instance_usage[struct] = []
-        for i in range(qty):
-            instance_usage = {}
-            for exp in explosive_list:
-                used_owned = int(owned_vars[(exp, struct, i)].varValue) if owned_vars[(exp, struct, i)].varValue else 0
-                used_crafted = int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0
-                total_used = used_owned + used_crafted
-                if total_used > 0:
-                    instance_usage[exp] = {
-                        "total": total_used,
-                        "owned": used_owned,
-                        "crafted": used_crafted
-                    }
-            structure_instance_usage[struct].append(instance_usage)
-
-
-    # Per-structure summary (totals for each explosive per structure)
-    structure_breakdown = {}
-    structure_usage = {}
-    for struct, instances in structure_instance_usage.items():
-        structure_breakdown[struct] = len(instances)
-        usage = {}
-        for instance in instances:
-            for exp, detail in instance.items():
-                usage[exp] = usage.get(exp, 0) + detail["total"]
-        structure_usage[struct] = usage
-
-    # Totals for each explosive across all structures
-    explosive_totals = {}
-    explosive_owned_totals = {}
-    explosive_crafted_totals = {}
-    for (exp, struct, i) in owned_vars:
-        owned = int(owned_vars[(exp, struct, i)].varValue) if owned_vars[(exp, struct, i)].varValue else 0
-        crafted = int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0
-        explosive_totals[exp] = explosive_totals.get(exp, 0) + owned + crafted
-        explosive_owned_totals[exp] = explosive_owned_totals.get(exp, 0) + owned
-        explosive_crafted_totals[exp] = explosive_crafted_totals.get(exp, 0) + crafted
-
-    # Total resources (owned + crafted)
-    total_resources = {}
-    for (exp, struct, i) in owned_vars:
-        total = (int(owned_vars[(exp, struct, i)].varValue) if owned_vars[(exp, struct, i)].varValue else 0) + \
-                (int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0)
-        if total > 0:
-            resource = calculate_resources(exp, total)
-            for material, amount in resource.items():
-                total_resources[material] = total_resources.get(material, 0) + amount
-
-    # Total resources (crafted only)
-    crafted_resources = {}
-    for (exp, struct, i) in crafted_vars:
-        crafted = int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0
-        if crafted > 0:
-            resource = calculate_resources(exp, crafted)
-            for material, amount in resource.items():
-                crafted_resources[material] = crafted_resources.get(material, 0) + amount
-
-    return {
-        "structure_instance_usage": structure_instance_usage,
-        "explosive_totals": explosive_totals,
-        "explosive_owned_totals": explosive_owned_totals,
-        "explosive_crafted_totals": explosive_crafted_totals,
-        "sulfur_cost": int(value(prob.objective)),
-        "total_resources": total_resources,
-        "crafted_resources": crafted_resources,
-        "structure_breakdown": structure_breakdown,
-        "structure_usage": structure_usage,
-    }
+    key = raid_cache_key(selected_structures, explosive_dict, g.engine.version, mode=mode, solver=solver,
+                         quality=quality)
+    results = optimizer_cache.get(key)
+    if results is None:
+        results = optimizer_flights.do(
+            key, solve_and_cache, key, selected_structures, explosive_dict, mode, solver, optimizer,
+            (g.data_name, g.engine.version), quality
+        )
+    return results
+
+def solve_and_cache(key, selected_structures, explosive_dict, mode, solver, optimizer=None, data_version=None,
+                    quality="exact"):
+    try:
+        if quality != "exact":
+            # The greedy plan and a short improvement run don't need a worker process
+            results, timings, solve_info = solver_pool.run_local(
+                instrumented_raid_optimizer, selected_structures, explosive_dict, mode, solver,
+                data_version=data_version, quality=quality
+            )
+        elif optimizer is not None and optimizer.warm(selected_structures, explosive_dict):
+            results, timings, solve_info = solver_pool.run_local(
+                session_raid_optimizer, optimizer, selected_structures, explosive_dict
+            )
+        elif optimizer is not None:
+            # Nothing to reuse yet, so it solves on a worker like any other miss
+            results, timings, solve_info, state = solver_pool.run_with(
+                cold_session_raid_optimizer, selected_structures, explosive_dict, data_version=data_version
+            )
+            optimizer.restore(state)
+        else:
+            results, timings, solve_info = solver_pool.run(
+                selected_structures, explosive_dict, mode, solver, data_version=data_version
+            )
+    except SolverBusy:
+        record_solve({}, {}, "rejected")
+        raise
+    except SolverTimeout:
+        record_solve({}, {}, "timeout")
+        raise
+    except Exception:
+        record_solve({}, {}, "failed")
+        raise
+    record_solve(timings, solve_info, "optimal" if results["optimal"] else "time_limit")
+    # Plans cut short by the time limit are not worth reusing
+    if results["optimal"]:
+        optimizer_cache.set(key, results)
+    return results
+
+def record_solve(timings, solve_info, status):
+    """
+    Adds one optimizer run to the metrics: phase timings, model size gauges and the outcome
+    ("optimal", "time_limit", "failed", "timeout" or "rejected").
+    """
+    backend = solve_info.get("backend", "unknown")
+    for phase, seconds in timings.items():
+        metrics.observe("raid_optimizer_phase_seconds", seconds, phase=phase, backend=backend)
+    metrics.inc("raid_optimizer_solves_total", backend=backend, status=status)
+    if "instances" in solve_info:
+        metrics.set("raid_optimizer_instances", solve_info["instances"])
+    if "variables" in solve_info:
+        metrics.set("raid_optimizer_model_variables", solve_info["variables"], backend=backend)
+        metrics.set("raid_optimizer_model_constraints", solve_info["constraints"], backend=backend)
+
+def session_optimizer():
+    """
+    Returns (session id, IncrementalOptimizer) for the requesting user, starting a new
+    session when the cookie is missing or its session has expired. A session whose game data
+    is not the request's (another version, or reloaded since) starts over on the same id.
+    """
+    session_id = request.cookies.get(SESSION_COOKIE)
+    optimizer = optimizer_sessions.get(session_id) if session_id else None
+    if optimizer is None:
+        session_id = uuid.uuid4().hex
+    if optimizer is None or optimizer.engine is not g.engine:
+        optimizer = IncrementalOptimizer(g.engine)
+    # Storing it again restarts the session's time-to-live
+    optimizer_sessions.set(session_id, optimizer)
+    return session_id, optimizer
+
+def run_optimizer_job(engine, selected_structures, explosive_dict, on_incumbent=None):
+    """
+    Background job body: answers from the result cache when possible, otherwise solves
+    in the job thread with the job time limit so incumbents can be streamed. engine is
+    the game data version the job was submitted against.
+    """
+    key = raid_cache_key(selected_structures, explosive_dict, engine.version, mode="by_type", solver="auto",
+                         quality="exact")
+    results = optimizer_cache.get(key)
+    if results is None:
+        timings = {}
+        solve_info = {}
+        try:
+            results = engine.run_raid_optimizer(
+                selected_structures, explosive_dict, time_limit=job_time_limit, on_incumbent=on_incumbent,
+                timings=timings, solve_info=solve_info
+            )
+        except Exception:
+            record_solve(timings, solve_info, "failed")
+            raise
+        record_solve(timings, solve_info, "optimal" if results["optimal"] else "time_limit")
+        if results["optimal"]:
+            optimizer_cache.set(key, results)
+    elif on_incumbent is not None:
+        on_incumbent(results["sulfur_cost"])
+    return results
+
+# Optimizer solves run in a bounded process pool with a per-solve time limit
+solver_pool = SolverPool(
+    instrumented_raid_optimizer,
+    max_workers=int(os.environ["RAID_SOLVER_WORKERS"]) if "RAID_SOLVER_WORKERS" in os.environ else None,
+    max_queue=int(os.environ["RAID_SOLVER_QUEUE"]) if "RAID_SOLVER_QUEUE" in os.environ else None,
+    time_limit=float(os.environ.get("RAID_SOLVER_TIME_LIMIT", 30)),
+)
+
+# Large raids go through the job API; CBC runs as a subprocess so threads are enough here
+job_time_limit = float(os.environ.get("RAID_JOB_TIME_LIMIT", 300))
+batch_limit = int(os.environ.get("RAID_BATCH_LIMIT", 10000))
+max_alternatives = int(os.environ.get("RAID_MAX_ALTERNATIVES", 10))
+instance_page_limit = int(os.environ.get("RAID_INSTANCE_PAGE_LIMIT", 500))
+craft_limit = int(os.environ.get("RAID_CRAFT_LIMIT", 5000))
+optimizer_jobs = JobManager(
+    run_optimizer_job,
+    max_workers=int(os.environ.get("RAID_JOB_WORKERS", 2)),
+    max_finished=int(os.environ.get("RAID_JOB_RETENTION", 256)),
+)
+
+# Request, solver phase and model size metrics, served in Prometheus text format at /metrics
+metrics = MetricsRegistry()
+metrics.describe("raid_request_duration_seconds", "histogram", "Time spent handling web requests.")
+metrics.describe("raid_optimizer_phase_seconds", "histogram", "Time spent in each optimizer phase.")
+metrics.describe("raid_optimizer_solves_total", "counter", "Optimizer runs by backend and outcome.")
+metrics.describe("raid_optimizer_instances", "gauge", "Structure instances in the latest optimizer run.")
+metrics.describe("raid_optimizer_model_variables", "gauge", "Variables in the latest CBC model.")
+metrics.describe("raid_optimizer_model_constraints", "gauge", "Constraints in the latest CBC model.")
+
+def collect_service_stats():
+    cache = optimizer_cache.stats()
+    lookups = cache["hits"] + cache["misses"]
+    yield "raid_cache_hits_total", "counter", "Optimizer result cache hits.", {}, cache["hits"]
+    yield "raid_cache_misses_total", "counter", "Optimizer result cache misses.", {}, cache["misses"]
+    yield "raid_cache_evictions_total", "counter", "Optimizer results evicted from the cache.", {}, cache["evictions"]
+    yield "raid_cache_hit_ratio", "gauge", "Share of cache lookups that were hits.", {}, (
+        cache["hits"] / lookups if lookups else 0.0
+    )
+    yield "raid_cache_entries", "gauge", "Optimizer results held in memory.", {}, cache["size"]
+    yield "raid_cache_shared_hits_total", "counter", "Optimizer results found in the shared memory cache.", {}, (
+        cache["shared_hits"]
+    )
+    flights = optimizer_flights.stats()
+    yield "raid_singleflight_shared_total", "counter", "Requests that waited on an identical solve.", {}, (
+        flights["shared"]
+    )
+    pool = solver_pool.stats()
+    yield "raid_solver_pool_active", "gauge", "Solves running or waiting in the solver pool.", {}, pool["active"]
+    yield "raid_solver_pool_rejected_total", "counter", "Solves rejected because the pool was full.", {}, (
+        pool["rejected"]
+    )
+    yield "raid_optimizer_sessions", "gauge", "Users with an incremental optimizer session.", {}, (
+        optimizer_sessions.stats()["size"]
+    )
+    data = store.stats()
+    yield "raid_data_versions", "gauge", "Game data versions loaded.", {}, len(data["versions"])
+    yield "raid_data_swaps_total", "counter", "Game data versions replaced by a reload.", {}, data["swaps"]
+    yield "raid_data_rejected_total", "counter", "Game data reloads rejected by validation.", {}, data["rejected"]
+    for status, count in optimizer_jobs.stats().items():
+        yield "raid_jobs", "gauge", "Background optimization jobs by status.", {"status": status}, count
+
+metrics.add_collector(collect_service_stats)
+
+# ?profile=1 attaches a cProfile report of the request; only one request is profiled at a time
+profile_top = int(os.environ.get("RAID_PROFILE_TOP", 25))
+profile_lock = threading.Lock()
+
+@app.before_request
+def start_request():
+    g.request_started = perf_counter()
+    if request.args.get("profile") == "1" and profile_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+    # The engine is taken once, so a reload mid-request never mixes two versions of the data
+    g.data_name = request.args.get("data", CURRENT)
+    try:
+        g.engine = store.get(g.data_name)
+    except KeyError:
+        return jsonify({"error": f"Unknown game data version '{g.data_name}'."}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.after_request
+def finish_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.observe(
+        "raid_request_duration_seconds", perf_counter() - g.request_started,
+        endpoint=endpoint, method=request.method, status=str(response.status_code),
+    )
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        profile_lock.release()
+        attach_profile(response, profiler)
+    return response
+
+@app.teardown_request
+def stop_profiler(_error=None):
+    # Requests that raised never reach finish_request
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        profile_lock.release()
+
+def attach_profile(response, profiler):
+    """
+    Adds the top functions by cumulative time to the response: a "profile" key for JSON
+    objects, a <pre> block for HTML pages. Streamed responses are left alone.
+    """
+    if response.is_streamed:
+        return
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(profile_top)
+    if response.is_json:
+        data = response.get_json()
+        if isinstance(data, dict):
+            data["profile"] = report.getvalue()
+            response.set_data(json.dumps(data))
+    elif response.mimetype == "text/html":
+        body = response.get_data(as_text=True)
+        block = f'<pre class="profile">{escape(report.getvalue())}</pre>'
+        end = body.rfind("</body>")
+        response.set_data(body[:end] + block + body[end:] if end != -1 else body + block)
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/")
 def index():
@@ -153,45 +326,66 @@ def resources():
         explosive_type = request.form["explosive_type"]
         try:
             quantity = int(request.form["quantity"])
+        except ValueError:
+            result = {"Error": "Quantity must be an integer."}
+        else:
             if quantity <= 0:
                 result = {"Error": "Quantity must be positive."}
             else:
-                result = calculate_resources(explosive_type, quantity)
-        except ValueError:
-            result = {"Error": "Quantity must be an integer."}
-    return render_template("resources.html", explosives=explosives, result=result)
+                try:
+                    result = g.engine.calculate_resources(explosive_type, quantity)
+                except ValueError as e:
+                    result = {"Error": str(e)}
+    return render_template("resources.html", explosives=g.engine.explosives, result=result)
 
 @app.route("/damage", methods=["GET", "POST"])
 def damage_per_structure():
     damages = None
+    plans = None
+    error = None
+    status = 200
     selected_structure = None
     selected_explosives = []
     if request.method == "POST":
         selected_structure = request.form.get("structure")
         selected_explosives = request.form.getlist("explosives")
-        damages = specific_damage_values(selected_explosives, selected_structure)
+        try:
+            damages = g.engine.specific_damage_values(selected_explosives, selected_structure)
+            plans = g.engine.cheapest_plans(selected_structure, selected_explosives)
+        except ValueError as e:
+            # Unknown or missing structure, or explosives that can't destroy it
+            damages, plans = None, None
+            error, status = str(e), 400
     return render_template(
         "damage.html",
-        structures=structures,
-        explosives=explosives,
+        structures=g.engine.structures,
+        explosives=g.engine.explosives,
         damages=damages,
+        plans=plans,
+        error=error,
         selected_structure=selected_structure,
         selected_explosives=selected_explosives,
-    )
+    ), status
 
 @app.route("/optimizer", methods=["GET", "POST"])
 def optimizer():
     results = None
+    error = None
+    status, headers = 200, {}
     selected_structures = {}
     explosive_dict = {}
+    session_id = None
+    plan_id = None
+    alternatives = 1
+    quality = "exact"
     if request.method == "POST":
         # Get selected structures and their quantities
-        for struct in structures:
+        for struct in g.engine.structures:
             qty = request.form.get(f"qty_{struct}")
             if qty and qty.isdigit() and int(qty) > 0:
                 selected_structures[struct] = int(qty)
         # Get selected explosives and owned amounts
-        for exp in explosives:
+        for exp in g.engine.explosives:
             # Only include explosives that are checked/selected
             if request.form.get(f"use_{exp}"):
                 owned = request.form.get(f"owned_{exp}")
@@ -200,17 +394,226 @@ def optimizer():
                 except ValueError:
                     owned_amt = 0
                 explosive_dict[exp] = owned_amt
+        # How many distinct plans to list, the optimal one included
+        requested = request.form.get("alternatives", "")
+        if requested.isdigit():
+            alternatives = min(max(int(requested), 1), max_alternatives)
+        # "fast" and "balanced" trade a possibly pricier plan for a quicker answer
+        if request.form.get("quality") in QUALITY_LEVELS:
+            quality = request.form["quality"]
         # Only run if at least one structure and one explosive selected
         if selected_structures and explosive_dict:
-            results = run_raid_optimizer(selected_structures, explosive_dict)
-    return render_template(
+            session_id, optimizer = session_optimizer()
+            try:
+                results = cached_raid_optimizer(
+                    selected_structures, explosive_dict, optimizer=optimizer, quality=quality
+                )
+                if alternatives > 1:
+                    # Copied so the cached results stay as they were
+                    results = dict(results, alternatives=g.engine.plan_alternatives(
+                        selected_structures, explosive_dict, alternatives
+                    ))
+                # The page only renders the grouped breakdown; every instance is one fetch away
+                plan_id = raid_cache_key(selected_structures, explosive_dict, g.engine.version, quality=quality)
+                plan_pages.set(plan_id, results)
+            except SolverBusy as e:
+                error, status, headers = str(e), 503, {"Retry-After": str(e.retry_after)}
+            except SolverTimeout as e:
+                error, status = str(e), 504
+            except NoPlanFound as e:
+                # The time limit ran out before CBC found any plan
+                error, status = str(e), 504
+            except ValueError as e:
+                # Raised by the engine or a pool worker, e.g. explosives that can't destroy a structure
+                # or game data that changed while the request was solving
+                error, status = str(e), 400
+    response = make_response(render_template(
         "optimizer.html",
-        structures=structures,
-        explosives=explosives,
+        structures=g.engine.structures,
+        explosives=g.engine.explosives,
         results=results,
+        error=error,
         selected_structures=selected_structures,
         explosive_dict=explosive_dict,
+        alternatives=alternatives,
+        max_alternatives=max_alternatives,
+        quality=quality,
+        quality_levels=QUALITY_LEVELS,
+        plan_id=plan_id,
+    ), status, headers)
+    if session_id is not None:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=int(optimizer_sessions.ttl), httponly=True,
+                            samesite="Lax")
+    return response
+
+@app.route("/api/plans/<plan_id>/instances")
+def api_plan_instances(plan_id):
+    results = plan_pages.get(plan_id)
+    if results is None:
+        return jsonify({"error": "Plan not found or expired; submit the optimizer form again."}), 404
+    struct = request.args.get("structure")
+    instances = results["structure_instance_usage"].get(struct)
+    if instances is None:
+        return jsonify({"error": f"Structure '{struct}' is not part of this plan."}), 400
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers."}), 400
+    if offset < 0 or not 1 <= limit <= instance_page_limit:
+        return jsonify({"error": f"offset must be >= 0 and limit between 1 and {instance_page_limit}."}), 400
+    page = {
+        "plan_id": plan_id,
+        "structure": struct,
+        "total": len(instances),
+        "offset": offset,
+        "limit": limit,
+        "instances": [
+            {"number": number, "usage": usage}
+            for number, usage in enumerate(instances[offset:offset + limit], offset + 1)
+        ],
+    }
+    if offset + limit < len(instances):
+        page["next_url"] = url_for(
+            "api_plan_instances", plan_id=plan_id, structure=struct, offset=offset + limit, limit=limit
+        )
+    return jsonify(page)
+
+@app.route("/api/optimize", methods=["POST"])
+def api_optimize():
+    try:
+        selected_structures, explosive_dict = parse_raid_spec(
+            request.get_json(silent=True), g.engine.explosives, g.engine.structures
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    job_id = optimizer_jobs.submit(g.engine, selected_structures, explosive_dict)
+    status_url = url_for("api_job", job_id=job_id)
+    return jsonify({
+        "job_id": job_id,
+        "status_url": status_url,
+        "events_url": url_for("api_job_events", job_id=job_id),
+    }), 202, {"Location": status_url}
+
+@app.route("/api/jobs/<job_id>")
+def api_job(job_id):
+    job = optimizer_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job)
+
+@app.route("/api/jobs/<job_id>/events")
+def api_job_events(job_id):
+    if optimizer_jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found."}), 404
+
+    def stream():
+        for event in optimizer_jobs.events(job_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            elif event[0] == "incumbent":
+                yield f"event: incumbent\ndata: {json.dumps({'sulfur_cost': event[1]})}\n\n"
+            else:
+                yield f"event: done\ndata: {json.dumps(event[1])}\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
+@app.route("/api/batch", methods=["POST"])
+def api_batch():
+    payload = request.get_json(silent=True)
+    raids = payload.get("raids") if isinstance(payload, dict) else None
+    if not isinstance(raids, list):
+        return jsonify({"error": "Expected a JSON object with a \"raids\" list."}), 400
+    if len(raids) > batch_limit:
+        return jsonify({"error": f"At most {batch_limit} raids per batch."}), 413
+    try:
+        results = evaluate_raids(
+            raids, g.engine.explosives, g.engine.structures, g.engine.plan_table, pool=solver_pool,
+            time_limit=solver_pool.time_limit
+        )
+    except SolverBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except SolverTimeout as e:
+        return jsonify({"error": str(e)}), 504
+    return jsonify({"results": results})
+
+@app.route("/api/breach", methods=["POST"])
+def api_breach():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object with \"base\" and \"explosives\"."}), 400
+    try:
+        explosive_dict = parse_explosives(payload.get("explosives"), g.engine.explosives)
+        plans = g.engine.plan_breach(
+            payload.get("base"), explosive_dict, k=payload.get("k", 1), time_limit=solver_pool.time_limit
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(plans)
+
+@app.route("/api/allocate", methods=["POST"])
+def api_allocate():
+    payload = request.get_json(silent=True)
+    targets = payload.get("targets") if isinstance(payload, dict) else None
+    if not isinstance(targets, list):
+        return jsonify({"error": "Expected a JSON object with a \"targets\" list and \"explosives\"."}), 400
+    if len(targets) > batch_limit:
+        return jsonify({"error": f"At most {batch_limit} targets per allocation."}), 413
+    try:
+        explosive_dict = parse_explosives(payload.get("explosives"), g.engine.explosives)
+        selected = []
+        for target in targets:
+            if not isinstance(target, dict):
+                raise ValueError("Every target must be a JSON object.")
+            selected.append(parse_raid_spec(
+                {"structures": target.get("structures"), "explosives": explosive_dict}, g.engine.explosives,
+                g.engine.structures
+            )[0])
+        allocation = g.engine.allocate_inventory(selected, explosive_dict, time_limit=solver_pool.time_limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for target, summary in zip(targets, allocation["targets"]):
+        if "name" in target:
+            summary["name"] = target["name"]
+    return jsonify(allocation)
+
+@app.route("/api/sweep", methods=["POST"])
+def api_sweep():
+    try:
+        selected_structures, explosive_dict, sweep = parse_sweep(
+            request.get_json(silent=True), g.engine.explosives, g.engine.structures
+        )
+        result = g.engine.owned_sweep(selected_structures, explosive_dict, sweep, time_limit=solver_pool.time_limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if request.args.get("format") == "csv":
+        table = io.StringIO()
+        write_sweep_csv(result, table)
+        return Response(table.getvalue(), mimetype="text/csv",
+                        headers={"Content-Disposition": "attachment; filename=sweep.csv"})
+    return jsonify(result)
+
+@app.route("/api/craft", methods=["POST"])
+def api_craft():
+    payload = request.get_json(silent=True)
+    order = payload.get("order") if isinstance(payload, dict) else None
+    if not isinstance(order, dict) or not order:
+        return jsonify({"error": "Expected a JSON object with an \"order\" of {item: quantity}."}), 400
+    try:
+        if sum(quantity for quantity in order.values() if isinstance(quantity, int)) > craft_limit:
+            return jsonify({"error": f"At most {craft_limit} items per order."}), 413
+        plan = g.engine.crafting_schedule(order, payload.get("benches", 1))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(plan)
+
+@app.route("/api/data")
+def api_data():
+    return jsonify(store.stats())
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,160 @@
+######################################
+# Batch raid evaluation
+# Evaluates many raid specs in one call: specs are validated, identical
+# ones are solved once, raids without owned explosives are answered from
+# the plan table, and the rest are spread across the solver pool's
+# worker processes.
+######################################
+
+import copy
+import functools
+
+from matrices import get_matrices
+from solvers import solve_raid
+
+# Below this many specs that need a real solve, a process pool costs more than it saves
+PARALLEL_THRESHOLD = 16
+
+
+def parse_raid_spec(spec, explosives, structures):
+    """
+    Validates a raid spec of the form
+    {"structures": {name: quantity}, "explosives": {name: owned}} and returns
+    (selected_structures, explosive_dict). Raises ValueError on bad input.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Raid spec must be a JSON object.")
+    selected_structures = {}
+    for struct, qty in (spec.get("structures") or {}).items():
+        if struct not in structures:
+            raise ValueError(f"Structure '{struct}' not found.")
+        if not isinstance(qty, int) or isinstance(qty, bool) or qty <= 0:
+            raise ValueError("Quantity must be a positive integer.")
+        selected_structures[struct] = qty
+    explosive_dict = parse_explosives(spec.get("explosives"), explosives)
+    if not selected_structures or not explosive_dict:
+        raise ValueError("Select at least one structure and one explosive.")
+    return selected_structures, explosive_dict
+
+
+def parse_explosives(owned_counts, explosives):
+    """
+    Validates {explosive: owned} and returns it as an explosive_dict. Raises ValueError on bad input.
+    """
+    if owned_counts is not None and not isinstance(owned_counts, dict):
+        raise ValueError("Explosives must be a JSON object of owned amounts.")
+    explosive_dict = {}
+    for exp, owned in (owned_counts or {}).items():
+        if exp not in explosives:
+            raise ValueError(f"Explosive type '{exp}' not found.")
+        if not isinstance(owned, int) or isinstance(owned, bool) or owned < 0:
+            raise ValueError("Owned amount must be 0 or greater.")
+        explosive_dict[exp] = owned
+    return explosive_dict
+
+
+def summarize_solution(selected_structures, explosive_dict, solution, explosives, structures):
+    """
+    Builds explosive, structure and resource totals straight from a per-type solution,
+    without expanding it per instance.
+    """
+    explosive_totals = {exp: 0 for exp in explosive_dict}
+    structure_usage = {}
+    for struct in selected_structures:
+        usage = {}
+        for pattern, count in solution["pattern_counts"][struct]:
+            for exp, used in pattern.items():
+                usage[exp] = usage.get(exp, 0) + used * count
+                explosive_totals[exp] += used * count
+        structure_usage[struct] = usage
+    explosive_owned_totals = {exp: solution["owned_used"].get(exp, 0) for exp in explosive_dict}
+    explosive_crafted_totals = {exp: explosive_totals[exp] - explosive_owned_totals[exp] for exp in explosive_dict}
+
+    matrices = get_matrices(explosives, structures)
+    total_resources = matrices.resources_for(explosive_totals)
+    crafted_resources = matrices.resources_for(explosive_crafted_totals)
+
+    return {
+        "sulfur_cost": solution["sulfur_cost"],
+        "optimal": solution["optimal"],
+        "explosive_totals": explosive_totals,
+        "explosive_owned_totals": explosive_owned_totals,
+        "explosive_crafted_totals": explosive_crafted_totals,
+        "total_resources": total_resources,
+        "crafted_resources": crafted_resources,
+        "structure_breakdown": dict(selected_structures),
+        "structure_usage": structure_usage,
+    }
+
+
+def solve_summary(selected_structures, explosive_dict, explosives, structures, plan_table=None, time_limit=None):
+    """
+    Solves one raid with the "auto" backend and returns its summarize_solution totals.
+    Raises ValueError when the raid can't be solved.
+    """
+    solution = solve_raid(selected_structures, explosive_dict, explosives, structures, "auto", plan_table, time_limit)
+    return summarize_solution(selected_structures, explosive_dict, solution, explosives, structures)
+
+
+def evaluate_raid(selected_structures, explosive_dict, explosives, structures, plan_table=None, time_limit=None):
+    """
+    Solves one raid and returns its summary, or {"error": message} if it can't be solved.
+    """
+    try:
+        return solve_summary(selected_structures, explosive_dict, explosives, structures, plan_table, time_limit)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+def _evaluate_in_worker(explosives, structures, time_limit, raid):
+    return evaluate_raid(raid[0], raid[1], explosives, structures, time_limit=time_limit)
+
+
+def evaluate_raids(specs, explosives, structures, plan_table=None, pool=None, time_limit=None):
+    """
+    Evaluates a list of raid specs and returns one result per spec, in order.
+    Invalid specs get {"error": message}. Identical specs are solved once, raids without
+    owned explosives are looked up in plan_table, and the remaining raids are solved on the
+    worker processes of pool (a solver_pool.SolverPool) when there are enough of them,
+    otherwise in this thread. Raises solver_pool.SolverBusy when the pool is full and
+    solver_pool.SolverTimeout when the pooled raids overrun the pool's time limit.
+    """
+    results = [None] * len(specs)
+    unique = {}
+    for i, spec in enumerate(specs):
+        try:
+            selected_structures, explosive_dict = parse_raid_spec(spec, explosives, structures)
+        except ValueError as e:
+            results[i] = {"error": str(e)}
+            continue
+        key = (tuple(sorted(selected_structures.items())), tuple(sorted(explosive_dict.items())))
+        if key not in unique:
+            unique[key] = ((selected_structures, explosive_dict), [])
+        unique[key][1].append(i)
+
+    answers = {}
+    pending = []
+    for key, (raid, _) in unique.items():
+        if plan_table is not None and not any(raid[1].values()):
+            answers[key] = evaluate_raid(raid[0], raid[1], explosives, structures, plan_table)
+        else:
+            pending.append(key)
+
+    if pool is not None and len(pending) >= PARALLEL_THRESHOLD:
+        # The game data travels with each chunk, so the pool's long-lived workers need no setup
+        solved = pool.map(
+            functools.partial(_evaluate_in_worker, explosives, structures, time_limit),
+            [unique[key][0] for key in pending],
+        )
+        answers.update(zip(pending, solved))
+    else:
+        for key in pending:
+            raid = unique[key][0]
+            answers[key] = evaluate_raid(raid[0], raid[1], explosives, structures, plan_table, time_limit)
+
+    for key, (_, positions) in unique.items():
+        results[positions[0]] = answers[key]
+        # Repeated specs get their own copy, so changing one result never changes another
+        for i in positions[1:]:
+            results[i] = copy.deepcopy(answers[key])
+    return results
@@ -0,0 +1,369 @@
+######################################
+# Benchmark suite
+# Times run_raid_optimizer over a grid of raids (instance counts, number of
+# explosives, zero or large owned inventory), split into model building,
+# solving and result extraction, and measures request latency percentiles
+# of the web routes through Flask's test client. Results are written as
+# JSON and can be compared against a stored baseline to flag regressions.
+#
+# Usage:
+#   python benchmark.py                          run and compare with benchmark_baseline.json
+#   python benchmark.py --quick                  smaller grid, fewer requests
+#   python benchmark.py --save-baseline          store this run as the new baseline
+#   python benchmark.py --model-build 0          skip the per-instance model build comparison
+######################################
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "benchmark_results.json")
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "benchmark_baseline.json")
+
+INSTANCE_COUNTS = (1, 10, 100, 1000)
+EXPLOSIVE_COUNTS = (1, 3, 7)
+INVENTORIES = {"zero": 0, "large": 50}
+MODES = ("by_type", "cbc", "per_instance")
+# The per-instance model grows with every instance; past this it only measures CBC's time limit
+PER_INSTANCE_MAX = 100
+# Instances are spread over these structure types in turn
+STRUCTURE_CYCLE = ("stone_wall", "metal_wall", "garage_door")
+PHASES = ("build", "solve", "extract")
+# Instances of the per-instance model built (not solved) to compare builders
+MODEL_BUILD_INSTANCES = 10000
+MODEL_BUILD_EXPLOSIVES = ("rocket", "c4", "satchel_charge", "explosive_ammo")
+
+# A result is a regression when it is this many times slower than the baseline...
+REGRESSION_RATIO = 1.5
+# ...and at least this many seconds slower, so microsecond jitter is ignored
+REGRESSION_MIN_SECONDS = 0.002
+# Baseline sulfur costs no feasible plan reaches, by scenario: (baseline cost, why). They were
+# recorded from plans of CBC's integer preprocessing that leave a structure standing, so a higher
+# cost is reported as a known failure instead of a regression while the baseline holds that cost.
+UNREACHABLE_BASELINE = ("below the raid's proven lower bound; recorded from an infeasible plan of "
+                        "CBC's integer preprocessing")
+KNOWN_FAILURES = {
+    "by_type/100x7e/large": (232760, UNREACHABLE_BASELINE),
+    "cbc/100x7e/large": (232760, UNREACHABLE_BASELINE),
+    "per_instance/100x7e/large": (232760, UNREACHABLE_BASELINE),
+    "by_type/1000x7e/large": (3795770, UNREACHABLE_BASELINE),
+    "cbc/1000x7e/large": (3795770, UNREACHABLE_BASELINE),
+}
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(samples)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+def scenario_raid(instances, explosive_count, owned, explosive_names):
+    selected_structures = {}
+    for i in range(instances):
+        struct = STRUCTURE_CYCLE[i % len(STRUCTURE_CYCLE)]
+        selected_structures[struct] = selected_structures.get(struct, 0) + 1
+    explosive_dict = {exp: owned for exp in explosive_names[:explosive_count]}
+    return selected_structures, explosive_dict
+
+
+def scenario_grid(instance_counts, explosive_counts, inventories, modes):
+    for mode in modes:
+        for instances in instance_counts:
+            if mode == "per_instance" and instances > PER_INSTANCE_MAX:
+                continue
+            for explosive_count in explosive_counts:
+                for inventory in inventories:
+                    yield f"{mode}/{instances}x{explosive_count}e/{inventory}", mode, instances, explosive_count, inventory
+
+
+def bench_optimizer(engine, grid, repeat, time_limit, log, warm=False):
+    """
+    Runs every scenario `repeat` times and keeps the median of each phase.
+    Runs that hit the time limit are not repeated; their sulfur cost is what gets compared.
+    The kill-pattern search cache is cleared before each run unless warm is set.
+    """
+    from patterns import clear_cover_cache
+
+    explosive_names = list(engine.explosives.keys())
+    results = {}
+    for name, mode, instances, explosive_count, inventory in grid:
+        selected_structures, explosive_dict = scenario_raid(
+            instances, explosive_count, INVENTORIES[inventory], explosive_names
+        )
+        if mode == "cbc":
+            mode_args = {"mode": "by_type", "solver": "cbc"}
+        else:
+            mode_args = {"mode": mode}
+        runs = []
+        for _ in range(repeat):
+            if not warm:
+                clear_cover_cache()
+            timings = {}
+            started = time.perf_counter()
+            output = engine.run_raid_optimizer(
+                selected_structures, explosive_dict, time_limit=time_limit, timings=timings, **mode_args
+            )
+            timings["total"] = time.perf_counter() - started
+            runs.append((timings, output))
+            if not output["optimal"]:
+                break
+        results[name] = {
+            "mode": mode,
+            "instances": instances,
+            "explosives": explosive_count,
+            "inventory": inventory,
+            "runs": len(runs),
+            "sulfur_cost": runs[-1][1]["sulfur_cost"],
+            "optimal": runs[-1][1]["optimal"],
+        }
+        for phase in PHASES + ("total",):
+            results[name][phase] = statistics.median(timings.get(phase, 0.0) for timings, _ in runs)
+        log(f"{name:<36} {results[name]['total'] * 1000:10.2f} ms"
+            f"{'' if results[name]['optimal'] else '  (time limit)'}")
+    return results
+
+
+def pulp_per_instance_model(selected_structures, explosive_dict, explosives, structures):
+    """
+    The per-instance model as it was built with PuLP before model.ColumnarModel: one LpVariable
+    per count and separate lower and upper rows per instance. Kept as the reference builder.
+    """
+    from pulp import LpProblem, LpMinimize, LpVariable, lpSum
+
+    prob = LpProblem("Rust_Raid_Optimizer", LpMinimize)
+    owned_vars, crafted_vars = {}, {}
+    for struct, qty in selected_structures.items():
+        for i in range(qty):
+            for exp in explosive_dict:
+                owned_vars[(exp, struct, i)] = LpVariable(f"owned_{exp}_{struct}_{i+1}", 0, cat="Integer")
+                crafted_vars[(exp, struct, i)] = LpVariable(f"crafted_{exp}_{struct}_{i+1}", 0, cat="Integer")
+    for exp in explosive_dict:
+        prob += lpSum([owned_vars[(exp, struct, i)] for struct, qty in selected_structures.items()
+                       for i in range(qty)]) <= explosive_dict[exp]
+    prob += lpSum([crafted_vars[key] * explosives[key[0]]["raw_materials"]["sulfur"] for key in crafted_vars])
+    for struct, qty in selected_structures.items():
+        damage = {exp: explosives[exp]["damage_per_structure"][struct] for exp in explosive_dict}
+        hp = structures[struct]
+        max_damage = max(damage.values())
+        for i in range(qty):
+            dealt = lpSum([(owned_vars[(exp, struct, i)] + crafted_vars[(exp, struct, i)]) * damage[exp]
+                           for exp in explosive_dict])
+            prob += dealt >= hp, f"{struct}_{i+1}_lower"
+            prob += dealt <= hp + max_damage, f"{struct}_{i+1}_upper"
+    return prob
+
+
+def bench_model_build(engine, instances, log):
+    """
+    Builds the per-instance model of one large raid with the PuLP reference and with
+    model.ColumnarModel, and writes each as MPS. Reports seconds per step and the peak
+    traced memory of build plus write; nothing is solved.
+    """
+    from model import per_instance_model
+
+    selected = scenario_raid(instances, len(MODEL_BUILD_EXPLOSIVES), 0, MODEL_BUILD_EXPLOSIVES)[0]
+    explosive_dict = {exp: 50 for exp in MODEL_BUILD_EXPLOSIVES}
+    builders = {
+        "pulp": (
+            lambda: pulp_per_instance_model(selected, explosive_dict, engine.explosives, engine.structures),
+            lambda prob, path: prob.writeMPS(path),
+        ),
+        "columnar": (
+            lambda: per_instance_model(selected, explosive_dict, engine.explosives, engine.structures)[0],
+            lambda model, path: model.write_mps(path),
+        ),
+    }
+    results = {"instances": instances}
+    with tempfile.TemporaryDirectory(prefix="raid-bench-") as workdir:
+        for name, (build, write) in builders.items():
+            path = os.path.join(workdir, f"{name}.mps")
+            started = time.perf_counter()
+            built = build()
+            built_at = time.perf_counter()
+            write(built, path)
+            written_at = time.perf_counter()
+            del built
+            # Memory is traced in a second pass, tracing slows the first one down too much
+            tracemalloc.start()
+            write(build(), path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[name] = {
+                "build": built_at - started,
+                "write": written_at - built_at,
+                "peak_mb": peak / 2 ** 20,
+                "mps_mb": os.path.getsize(path) / 2 ** 20,
+            }
+            log(f"model build {name:8} {instances} instances: build {results[name]['build']:.2f}s "
+                f"write {results[name]['write']:.2f}s peak {results[name]['peak_mb']:.1f} MB")
+    return results
+
+
+def bench_endpoints(raid_app, requests, log):
+    """
+    Measures request latency of the web routes. The optimizer cache is cleared before every
+    /optimizer request so each one is a real solve rather than a cache hit.
+    """
+    client = raid_app.app.test_client()
+    explosive_names = list(raid_app.store.get().explosives.keys())
+    optimizer_form = {"qty_stone_wall": "4", "qty_metal_wall": "2", "qty_garage_door": "1"}
+    for exp in explosive_names[:3]:
+        optimizer_form[f"use_{exp}"] = "on"
+        optimizer_form[f"owned_{exp}"] = "3"
+    endpoints = {
+        "/resources": {"explosive_type": explosive_names[0], "quantity": "12"},
+        "/damage": {"structure": STRUCTURE_CYCLE[0], "explosives": explosive_names},
+        "/optimizer": optimizer_form,
+    }
+
+    results = {}
+    for path, form in endpoints.items():
+        # Warm-up request: starts the solver pool and fills template caches
+        client.post(path, data=form)
+        samples = []
+        for _ in range(requests):
+            if path == "/optimizer":
+                raid_app.optimizer_cache.clear()
+            started = time.perf_counter()
+            response = client.post(path, data=form)
+            samples.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} answered {response.status_code}")
+        results[path] = {
+            "requests": requests,
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+        }
+        log(f"{path:<36} p50 {results[path]['p50'] * 1000:8.2f} ms  p95 {results[path]['p95'] * 1000:8.2f} ms"
+            f"  p99 {results[path]['p99'] * 1000:8.2f} ms")
+    return results
+
+
+def compare_results(current, baseline, ratio=REGRESSION_RATIO, min_seconds=REGRESSION_MIN_SECONDS,
+                    known_failures=KNOWN_FAILURES):
+    """
+    Returns (regressions, known failures), human-readable lines comparing `current` with `baseline`.
+    Scenarios compare total time and sulfur cost, endpoints compare p95. A higher sulfur cost is a
+    known failure rather than a regression when known_failures lists the scenario's baseline cost.
+    """
+    regressions = []
+    known = []
+
+    def slower(new, old):
+        return new > old * ratio and new - old > min_seconds
+
+    for name, result in current.get("scenarios", {}).items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        if result["sulfur_cost"] > old["sulfur_cost"]:
+            line = f"{name}: sulfur cost {old['sulfur_cost']} -> {result['sulfur_cost']}"
+            cost, reason = known_failures.get(name, (None, None))
+            if cost == old["sulfur_cost"]:
+                known.append(f"{line} ({reason})")
+            else:
+                regressions.append(line)
+        if result["optimal"] and old["optimal"] and slower(result["total"], old["total"]):
+            regressions.append(f"{name}: {old['total'] * 1000:.2f} ms -> {result['total'] * 1000:.2f} ms")
+    for path, result in current.get("endpoints", {}).items():
+        old = baseline.get("endpoints", {}).get(path)
+        if old is not None and slower(result["p95"], old["p95"]):
+            regressions.append(f"{path}: p95 {old['p95'] * 1000:.2f} ms -> {result['p95'] * 1000:.2f} ms")
+    return regressions, known
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the raid optimizer and web routes.")
+    parser.add_argument("--quick", action="store_true", help="smaller grid and fewer requests")
+    parser.add_argument("--repeat", type=int, default=None, help="runs per scenario (median is kept)")
+    parser.add_argument("--requests", type=int, default=None, help="requests per endpoint")
+    parser.add_argument("--time-limit", type=float, default=5, help="solver time limit per run, in seconds")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated optimizer modes to run")
+    parser.add_argument("--warm", action="store_true", help="keep the kill-pattern cache between runs")
+    parser.add_argument("--skip-endpoints", action="store_true", help="only run the optimizer grid")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_RATIO,
+                        help="slowdown ratio that counts as a regression")
+    parser.add_argument("--model-build", type=int, default=None,
+                        help=f"instances in the model build comparison, 0 to skip "
+                             f"(default {MODEL_BUILD_INSTANCES}, 1000 with --quick)")
+    args = parser.parse_args(argv)
+
+    def log(line):
+        print(line, file=sys.stderr, flush=True)
+
+    sys.path.insert(0, BASE_DIR)
+    from engine import get_engine
+    import app as raid_app
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"unknown mode '{mode}'")
+    if args.quick:
+        grid = scenario_grid(INSTANCE_COUNTS[:3], EXPLOSIVE_COUNTS[:2], INVENTORIES, modes)
+        repeat, requests = args.repeat or 3, args.requests or 30
+        model_build = 1000 if args.model_build is None else args.model_build
+    else:
+        grid = scenario_grid(INSTANCE_COUNTS, EXPLOSIVE_COUNTS, INVENTORIES, modes)
+        repeat, requests = args.repeat or 3, args.requests or 200
+        model_build = MODEL_BUILD_INSTANCES if args.model_build is None else args.model_build
+
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "data_version": get_engine().version,
+            "repeat": repeat,
+            "time_limit": args.time_limit,
+            "warm": args.warm,
+        },
+        "scenarios": bench_optimizer(get_engine(), grid, repeat, args.time_limit, log, args.warm),
+        "endpoints": {} if args.skip_endpoints else bench_endpoints(raid_app, requests, log),
+        "model_build": bench_model_build(get_engine(), model_build, log) if model_build else {},
+    }
+    raid_app.solver_pool.shutdown()
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    log(f"Results written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        log(f"Baseline saved to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        log(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    if baseline["meta"].get("data_version") != results["meta"]["data_version"]:
+        log("Warning: the baseline was recorded with different game data.")
+    regressions, known = compare_results(results, baseline, ratio=args.threshold)
+    for line in known:
+        log(f"KNOWN FAILURE {line}")
+    for line in regressions:
+        log(f"REGRESSION {line}")
+    if not regressions:
+        log("No regressions against the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
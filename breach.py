@@ -0,0 +1,246 @@
+######################################
+# Breach path planner
+# A base is a graph: rooms are nodes and every edge is a structure (or a
+# stack of identical structures) that has to be destroyed to move between
+# two rooms. The planner finds the cheapest sulfur route from outside to a
+# target room, or the k cheapest. Owned explosives are shared by the whole
+# route, so a path's cost is not a plain sum of edge costs: paths are
+# enumerated in order of a lower bound that is a sum of edge costs at the
+# explosive prices of the pattern LP, and each candidate is priced exactly
+# with the raid solver until no cheaper path can remain.
+######################################
+
+import heapq
+import itertools
+import math
+import time
+
+from batch import solve_summary
+from matrices import get_matrices
+from patterns import generate_patterns, priced_cover, scaled_options
+
+# Paths enumerated before the search gives up and reports optimal=False
+MAX_CANDIDATES = 200
+
+
+def parse_base(base, structures):
+    """
+    Validates a base of the form
+    {"start": room, "target": room, "edges": [{"from": room, "to": room, "structure": name, "count": n}]}
+    and returns (start, target, edges) with every edge as (from, to, structure, count).
+    "start" defaults to "outside" and "count" to 1. Raises ValueError on bad input.
+    """
+    if not isinstance(base, dict):
+        raise ValueError("Base must be a JSON object.")
+    start = base.get("start", "outside")
+    target = base.get("target")
+    if not isinstance(start, str) or not isinstance(target, str):
+        raise ValueError("Base needs a \"target\" room name.")
+    if start == target:
+        raise ValueError("Start and target are the same room.")
+    edges = []
+    for edge in base.get("edges") or []:
+        if not isinstance(edge, dict):
+            raise ValueError("Every edge must be a JSON object.")
+        room_a, room_b, struct = edge.get("from"), edge.get("to"), edge.get("structure")
+        if not isinstance(room_a, str) or not isinstance(room_b, str):
+            raise ValueError("Every edge needs \"from\" and \"to\" room names.")
+        if struct not in structures:
+            raise ValueError(f"Structure '{struct}' not found.")
+        count = edge.get("count", 1)
+        if not isinstance(count, int) or isinstance(count, bool) or count <= 0:
+            raise ValueError("Edge count must be a positive integer.")
+        edges.append((room_a, room_b, struct, count))
+    if not edges:
+        raise ValueError("Base has no edges.")
+    return start, target, edges
+
+
+def edge_costs(edges, explosive_dict, explosives, structures, prices=None):
+    """
+    Cost per edge of its structures' cheapest kill patterns when every explosive costs its price
+    in prices (its crafting sulfur by default), memoized per structure type. Edges the explosives
+    cannot destroy get None.
+    """
+    matrices = get_matrices(explosives, structures)
+    explosive_list = list(explosive_dict)
+    if prices is None:
+        prices = {exp: int(matrices.sulfur[matrices.explosive_index[exp]]) for exp in explosive_list}
+    per_instance = {}
+    for struct in {edge[2] for edge in edges}:
+        options = scaled_options(struct, explosive_list, matrices)
+        per_instance[struct] = priced_cover(
+            int(matrices.scaled_hp[matrices.structure_index[struct]]), options, prices
+        )[0] if options else None
+    return [None if per_instance[struct] is None else per_instance[struct] * count for _, _, struct, count in edges]
+
+
+def distances_to(adjacency, weights, target):
+    """
+    Cheapest cost from every room to target (Dijkstra from the target; edges work both ways).
+    """
+    distance = {target: 0}
+    queue = [(0, target)]
+    while queue:
+        cost, room = heapq.heappop(queue)
+        if cost > distance[room]:
+            continue
+        for edge, neighbour in adjacency.get(room, ()):
+            new_cost = cost + weights[edge]
+            if new_cost < distance.get(neighbour, new_cost + 1):
+                distance[neighbour] = new_cost
+                heapq.heappush(queue, (new_cost, neighbour))
+    return distance
+
+
+def _shortest_path(adjacency, weights, source, target, banned_nodes, banned_edges, remaining):
+    # A* over edge ids, guided by the unrestricted distances to the target (banning rooms and
+    # edges only makes paths longer, so they never overestimate); returns (cost, rooms, edge ids) or None
+    if source not in remaining:
+        return None
+    queue = [(remaining[source], 0, 0, source)]
+    best = {source: 0}
+    parent = {source: None}
+    tie = itertools.count(1)
+    while queue:
+        _, _, cost, room = heapq.heappop(queue)
+        if room == target:
+            rooms, path_edges = [room], []
+            while parent[room] is not None:
+                room, edge = parent[room]
+                rooms.append(room)
+                path_edges.append(edge)
+            return cost, rooms[::-1], path_edges[::-1]
+        if cost > best[room]:
+            continue
+        for edge, neighbour in adjacency.get(room, ()):
+            if edge in banned_edges or neighbour in banned_nodes or neighbour not in remaining:
+                continue
+            new_cost = cost + weights[edge]
+            if new_cost < best.get(neighbour, new_cost + 1):
+                best[neighbour] = new_cost
+                parent[neighbour] = (room, edge)
+                heapq.heappush(queue, (new_cost + remaining[neighbour], next(tie), new_cost, neighbour))
+    return None
+
+
+def shortest_paths(adjacency, weights, source, target):
+    """
+    Yields simple paths from source to target as (cost, rooms, edge ids), cheapest first
+    (Yen's algorithm). Parallel edges between the same rooms are separate paths.
+    """
+    remaining = distances_to(adjacency, weights, target)
+    first = _shortest_path(adjacency, weights, source, target, set(), set(), remaining)
+    if first is None:
+        return
+    found = [first]
+    seen = {tuple(first[2])}
+    candidates = []
+    tie = itertools.count()
+    while True:
+        cost, rooms, path_edges = found[-1]
+        yield found[-1]
+        for i in range(len(path_edges)):
+            root_edges = path_edges[:i]
+            # Edges already taken from this root by earlier paths are off limits
+            banned_edges = {p[2][i] for p in found if p[2][:i] == root_edges and len(p[2]) > i}
+            spur = _shortest_path(adjacency, weights, rooms[i], target, set(rooms[:i]), banned_edges,
+                                  remaining)
+            if spur is None:
+                continue
+            edges_taken = root_edges + spur[2]
+            if tuple(edges_taken) in seen:
+                continue
+            seen.add(tuple(edges_taken))
+            root_cost = sum(weights[edge] for edge in root_edges)
+            heapq.heappush(candidates, (root_cost + spur[0], next(tie), rooms[:i] + spur[1], edges_taken))
+        if not candidates:
+            return
+        cost, _, rooms, path_edges = heapq.heappop(candidates)
+        found.append((cost, rooms, path_edges))
+
+
+def plan_breach(base, explosive_dict, explosives, structures, k=1, plan_table=None, time_limit=None,
+                max_candidates=MAX_CANDIDATES):
+    """
+    Finds the k cheapest breach paths from base["start"] to base["target"].
+    explosive_dict lists the allowed explosives with owned amounts, shared by the whole path.
+    Returns {"paths": [...], "optimal": bool}; each path has its "rooms", its "edges" and the
+    raid summary (sulfur cost, explosives, resources) for destroying every structure on it.
+    "optimal" is False when the search stopped after max_candidates paths or past time_limit.
+    """
+    if not isinstance(k, int) or isinstance(k, bool) or k <= 0:
+        raise ValueError("k must be a positive integer.")
+    for exp in explosive_dict:
+        if exp not in explosives:
+            raise ValueError(f"Explosive type '{exp}' not found.")
+    if not explosive_dict:
+        raise ValueError("Select at least one explosive.")
+    start, target, edges = parse_base(base, structures)
+
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    crafted = edge_costs(edges, explosive_dict, explosives, structures)
+    adjacency = {}
+    for edge, (room_a, room_b, _, _) in enumerate(edges):
+        if crafted[edge] is None:
+            continue
+        # Walls can be breached from either side
+        adjacency.setdefault(room_a, []).append((edge, room_b))
+        adjacency.setdefault(room_b, []).append((edge, room_a))
+
+    def path_structures(path_edges):
+        selected_structures = {}
+        for edge in path_edges:
+            struct, count = edges[edge][2], edges[edge][3]
+            selected_structures[struct] = selected_structures.get(struct, 0) + count
+        return selected_structures
+
+    # Whatever prices explosives get (up to their sulfur), a path costs at least its edges at
+    # those prices less the owned stock at those prices. The LP prices of the cheapest crafted
+    # path make that bound tight for paths like it; without owned explosives it is the sulfur.
+    weights, offset = crafted, 0
+    if any(explosive_dict.values()):
+        first = next(shortest_paths(adjacency, crafted, start, target), None)
+        if first is not None:
+            prices = generate_patterns(
+                path_structures(first[2]), explosive_dict, explosives, structures, deadline
+            )["prices"]
+            weights = edge_costs(edges, explosive_dict, explosives, structures, prices)
+            offset = sum(prices[exp] * owned for exp, owned in explosive_dict.items())
+
+    priced = {}
+    best = []
+    optimal = True
+    evaluated = 0
+    for cost, rooms, path_edges in shortest_paths(adjacency, weights, start, target):
+        # Paths come cheapest bound first and plans cost whole sulfur, so nothing later can beat this
+        if len(best) == k and math.ceil(cost - offset - 1e-6) >= best[-1][0]:
+            break
+        if evaluated == max_candidates or (deadline is not None and time.perf_counter() > deadline):
+            optimal = False
+            break
+        evaluated += 1
+        selected_structures = path_structures(path_edges)
+        key = tuple(sorted(selected_structures.items()))
+        if key not in priced:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 1)
+            priced[key] = solve_summary(selected_structures, explosive_dict, explosives, structures, plan_table,
+                                        remaining)
+        summary = priced[key]
+        optimal = optimal and summary["optimal"]
+        best.append((summary["sulfur_cost"], evaluated, rooms, path_edges, summary))
+        best.sort(key=lambda item: (item[0], item[1]))
+        del best[k:]
+
+    if not best:
+        raise ValueError(f"No breachable path from '{start}' to '{target}' with the selected explosives.")
+    return {
+        "paths": [
+            dict(summary, rooms=rooms, edges=[
+                {"from": a, "to": b, "structure": struct, "count": count}
+                for a, b, struct, count in (edges[edge] for edge in path_edges)
+            ])
+            for _, _, rooms, path_edges, summary in best
+        ],
+        "optimal": optimal,
+    }
@@ -0,0 +1,267 @@
+######################################
+# Versioned game-data store
+# Holds one RaidEngine per named version of the game data: "current" is
+# read from the JSON files next to the code, other versions (for example
+# "pre-patch") from data_versions/<name>/. A watcher polls the files;
+# changed data is validated, its plan table is prepared, and the new
+# engine is swapped in whole, so a request that already took an engine
+# keeps a consistent view. Listeners are told about every swap so caches
+# tied to the old content hash can be dropped.
+######################################
+
+import os
+import re
+import threading
+import time
+
+from engine import load_game_data, RaidEngine, DATA_DIR, EXPLOSIVES_FILE, STRUCTURES_FILE
+from plan_table import data_version
+from recipes import load_recipes, RecipeGraph, RECIPES_FILE
+
+CURRENT = "current"
+VERSIONS_DIR = os.path.join(DATA_DIR, "data_versions")
+# Seconds between file checks of the watcher
+WATCH_INTERVAL = 2.0
+
+_VERSION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_game_data(explosives, structures, recipes=None):
+    """
+    Checks that explosives and structures have the shape the calculator relies on:
+    every structure has a positive HP, every explosive a raw_materials recipe that
+    includes sulfur and a non-negative damage value for every structure. recipes, if
+    given, must form a DAG whose raw totals match raw_materials; its RecipeGraph is returned.
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(structures, dict) or not structures:
+        raise ValueError("Structures must be a non-empty JSON object.")
+    for struct, hp in structures.items():
+        if not _number(hp) or hp <= 0:
+            raise ValueError(f"Structure '{struct}' needs a positive HP.")
+    if not isinstance(explosives, dict) or not explosives:
+        raise ValueError("Explosives must be a non-empty JSON object.")
+    for exp, data in explosives.items():
+        materials = data.get("raw_materials") if isinstance(data, dict) else None
+        damage = data.get("damage_per_structure") if isinstance(data, dict) else None
+        if not isinstance(materials, dict) or "sulfur" not in materials:
+            raise ValueError(f"Explosive '{exp}' needs a raw_materials recipe with sulfur.")
+        for material, amount in materials.items():
+            if not isinstance(amount, int) or isinstance(amount, bool) or amount < 0:
+                raise ValueError(f"Explosive '{exp}' needs a non-negative whole amount of {material}.")
+        if not isinstance(damage, dict):
+            raise ValueError(f"Explosive '{exp}' needs damage_per_structure.")
+        for struct in structures:
+            if struct not in damage:
+                raise ValueError(f"Explosive '{exp}' has no damage value for '{struct}'.")
+        for struct, value in damage.items():
+            if struct not in structures:
+                raise ValueError(f"Explosive '{exp}' lists unknown structure '{struct}'.")
+            if not _number(value) or value < 0:
+                raise ValueError(f"Explosive '{exp}' needs a non-negative damage value for '{struct}'.")
+    if recipes is None:
+        return None
+    graph = RecipeGraph(recipes)
+    graph.check_explosives(explosives)
+    return graph
+
+
+def _file_stamps(data_dir):
+    # (mtime, size) of every data file, None for a missing file
+    stamps = []
+    for filename in (EXPLOSIVES_FILE, STRUCTURES_FILE, RECIPES_FILE):
+        try:
+            stat = os.stat(os.path.join(data_dir, filename))
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+class GameDataStore:
+    """
+    Named, hot-reloadable game data versions. get(name) returns that version's RaidEngine;
+    engines are never modified, a reload replaces the whole engine.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, versions_dir=VERSIONS_DIR):
+        self.data_dir = data_dir
+        self.versions_dir = versions_dir
+        self.lock = threading.Lock()
+        # name -> RaidEngine
+        self.engines = {}
+        # name -> file stamps the engine (or the last failed reload) was read from
+        self.stamps = {}
+        # name -> message of the last reload that failed validation
+        self.errors = {}
+        self.loaded_at = {}
+        self.listeners = []
+        self.counters = {"reloads": 0, "swaps": 0, "rejected": 0}
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def directory(self, name):
+        """
+        Directory holding the JSON files of a version. Raises KeyError for unknown names.
+        """
+        if name == CURRENT:
+            return self.data_dir
+        if not isinstance(name, str) or not _VERSION_NAME.match(name):
+            raise KeyError(name)
+        path = os.path.join(self.versions_dir, name)
+        if not os.path.isfile(os.path.join(path, EXPLOSIVES_FILE)):
+            raise KeyError(name)
+        return path
+
+    def names(self):
+        """
+        "current" followed by every version found under versions_dir, loaded or not.
+        """
+        names = [CURRENT]
+        try:
+            entries = sorted(os.listdir(self.versions_dir))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                self.directory(entry)
+            except KeyError:
+                continue
+            names.append(entry)
+        return names
+
+    def get(self, name=CURRENT, version=None):
+        """
+        Returns the engine of a named version, loading it on first use. When version (a content
+        hash) is given and differs from the loaded engine's, the files are read again first, which
+        is how processes without a watcher catch up. Raises KeyError for unknown names and
+        ValueError when the data on disk is invalid or no longer matches version.
+        """
+        engine = self.engines.get(name)
+        if engine is None or (version is not None and engine.version != version):
+            self.reload(name)
+            engine = self.engines[name]
+            if version is not None and engine.version != version:
+                raise ValueError(f"Game data version '{name}' has changed since the request started.")
+        return engine
+
+    def reload(self, name=CURRENT):
+        """
+        Reads a version from disk, validates it and swaps in a new engine if its content hash
+        changed. Returns True when the engine was replaced. Raises ValueError for invalid data,
+        in which case the loaded engine, if any, stays in use.
+        """
+        data_dir = self.directory(name)
+        with self.lock:
+            stamps = _file_stamps(data_dir)
+            self.counters["reloads"] += 1
+            try:
+                explosives, structures = load_game_data(data_dir)
+                recipes = load_recipes(data_dir)
+                graph = validate_game_data(explosives, structures, recipes)
+            except (OSError, ValueError) as e:
+                # Stamps are kept so a half-written file is retried once it changes again
+                self.stamps[name] = stamps
+                self.errors[name] = str(e)
+                self.counters["rejected"] += 1
+                raise ValueError(f"Game data version '{name}' was rejected: {e}") from e
+            self.stamps[name] = stamps
+            self.errors.pop(name, None)
+            old = self.engines.get(name)
+            if old is not None and old.version == data_version(explosives, structures) and (
+                (old.recipes.recipes if old.recipes is not None else None) == recipes
+            ):
+                return False
+            engine = RaidEngine(explosives, structures, data_dir=data_dir, recipes=graph)
+            # Built (or read from disk) before the swap, so no request waits on it
+            engine.plan_table
+            self.engines[name] = engine
+            self.loaded_at[name] = time.time()
+            if old is not None:
+                self.counters["swaps"] += 1
+            listeners = list(self.listeners)
+        if old is not None:
+            for listener in listeners:
+                listener(name, old, engine)
+        return True
+
+    def check_for_changes(self):
+        """
+        Reloads every loaded version whose files changed since they were read.
+        Returns the names whose engine was replaced; invalid data is recorded in errors.
+        """
+        swapped = []
+        for name in list(self.engines):
+            try:
+                if _file_stamps(self.directory(name)) == self.stamps.get(name):
+                    continue
+                if self.reload(name):
+                    swapped.append(name)
+            except (KeyError, ValueError):
+                # Removed version directories keep serving their last good data
+                continue
+        return swapped
+
+    def add_listener(self, fn):
+        """
+        Registers fn(name, old_engine, new_engine), called after a loaded version is replaced.
+        """
+        with self.lock:
+            self.listeners.append(fn)
+
+    def watch(self, interval=WATCH_INTERVAL):
+        """
+        Starts a daemon thread that calls check_for_changes every interval seconds.
+        """
+        with self.lock:
+            if self._watcher is not None:
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name="game-data-watcher",
+                                             daemon=True)
+            self._watcher.start()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            self.check_for_changes()
+
+    def stop(self):
+        with self.lock:
+            watcher, self._watcher = self._watcher, None
+        self._stop.set()
+        if watcher is not None:
+            watcher.join()
+
+    def stats(self):
+        """
+        Loaded versions with their content hash, load time and last rejected reload, plus counters.
+        """
+        with self.lock:
+            versions = {
+                name: {
+                    "version": engine.version,
+                    "loaded_at": self.loaded_at[name],
+                    "error": self.errors.get(name),
+                }
+                for name, engine in self.engines.items()
+            }
+            return {"versions": versions, "available": self.names(), **self.counters}
+
+
+def get_store():
+    """
+    Returns the process-wide store over the data next to this module.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = GameDataStore()
+    return _store
@@ -0,0 +1,358 @@
+######################################
+# Raid engine
+# The calculator core shared by the web app, the CLI and worker processes:
+# resource and damage lookups, cheapest plans and the sulfur optimizer.
+# Importing this module has no side effects. Game data is read lazily
+# through the process-wide datastore.GameDataStore, and PuLP is only
+# imported once an optimization actually builds a CBC model.
+######################################
+
+import json
+import os
+import threading
+from time import perf_counter
+
+from allocation import allocate_inventory
+from anytime import greedy_solution, optimality_gap, raid_lower_bound, QUALITY_TIME_LIMITS
+from batch import summarize_solution
+from breach import plan_breach
+from matrices import get_matrices
+from model import solve_per_instance
+from patterns import add_timing, expand_instances, group_instances, NoPlanFound, PatternLimitExceeded
+from plan_table import load_plan_table, data_version, TABLE_FILENAME
+from solvers import solve_dp_top_k, solve_raid, SolverNotApplicable
+from sweep import owned_sweep
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPLOSIVES_FILE = "explosives.json"
+STRUCTURES_FILE = "structures.json"
+
+def load_game_data(data_dir=DATA_DIR):
+    """
+    Reads explosives.json and structures.json from data_dir and returns (explosives, structures).
+    Raises FileNotFoundError if either file is missing.
+    """
+    with open(os.path.join(data_dir, EXPLOSIVES_FILE), "r") as file:
+        explosives = json.load(file)
+    with open(os.path.join(data_dir, STRUCTURES_FILE), "r") as file:
+        structures = json.load(file)
+    return explosives, structures
+
+
+class RaidEngine:
+    """
+    Calculator core for one set of game data. The plan table is loaded on first use, from
+    plan_table.bin in data_dir (the directory next to this module by default). recipes is the
+    recipes.RecipeGraph for crafting questions, or None when there is no recipe data.
+    """
+
+    def __init__(self, explosives, structures, plan_table=None, data_dir=DATA_DIR, recipes=None):
+        self.explosives = explosives
+        self.structures = structures
+        self.recipes = recipes
+        self.matrices = get_matrices(explosives, structures)
+        self.version = data_version(explosives, structures)
+        self.data_dir = data_dir
+        self._plan_table = plan_table
+        self._lock = threading.Lock()
+
+    @property
+    def plan_table(self):
+        if self._plan_table is None:
+            with self._lock:
+                if self._plan_table is None:
+                    self._plan_table = load_plan_table(
+                        self.explosives, self.structures, os.path.join(self.data_dir, TABLE_FILENAME)
+                    )
+        return self._plan_table
+
+    def calculate_resources(self, explosive_type, quantity):
+        """
+        Raw materials needed to craft `quantity` of one explosive, as {material: amount}.
+        """
+        if explosive_type not in self.explosives:
+            raise ValueError(f"Explosive type '{explosive_type}' not found.")
+        if not isinstance(quantity, int):
+            raise ValueError("Quantity must be an integer.")
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive integer.")
+        return self.matrices.recipe(explosive_type, quantity)
+
+    def specific_damage_values(self, explosive_list, structure):
+        """
+        Damage of each listed explosive against one structure, as {explosive: damage}.
+        """
+        if structure not in self.structures:
+            raise ValueError(f"Structure '{structure}' not found.")
+        for explosive in explosive_list:
+            if explosive not in self.explosives:
+                raise ValueError(f"Explosive type '{explosive}' not found.")
+        return self.matrices.damage_values(explosive_list, structure)
+
+    def expand_recipes(self, order):
+        """
+        Crafts, intermediates and raw materials for {item: quantity}; see recipes.RecipeGraph.expand.
+        """
+        if self.recipes is None:
+            raise ValueError("No recipe data is loaded for this game data.")
+        return self.recipes.expand(order)
+
+    def crafting_schedule(self, order, benches=1):
+        """
+        Crafting plan for {item: quantity} on parallel workbenches; see recipes.RecipeGraph.schedule.
+        """
+        if self.recipes is None:
+            raise ValueError("No recipe data is loaded for this game data.")
+        return self.recipes.schedule(order, benches)
+
+    def cheapest_plans(self, structure, explosive_list):
+        """
+        Up to five cheapest (sulfur, {explosive: count}) plans for one structure, from the plan table.
+        """
+        return self.plan_table.plans(structure, explosive_list)
+
+    def plan_breach(self, base, explosive_dict, k=1, time_limit=None):
+        """
+        The k cheapest breach paths through a base graph; see breach.plan_breach.
+        """
+        return plan_breach(base, explosive_dict, self.explosives, self.structures, k, self.plan_table, time_limit)
+
+    def allocate_inventory(self, targets, explosive_dict, time_limit=None):
+        """
+        Splits one owned inventory across several raids (a list of selected_structures dicts);
+        see allocation.allocate_inventory.
+        """
+        return allocate_inventory(
+            targets, explosive_dict, self.explosives, self.structures, self.plan_table, time_limit
+        )
+
+    def owned_sweep(self, selected_structures, explosive_dict, sweep, time_limit=None):
+        """
+        Crafted sulfur over a grid of owned counts for one or two explosives; see sweep.owned_sweep.
+        """
+        return owned_sweep(
+            selected_structures, explosive_dict, sweep, self.explosives, self.structures, self.plan_table, time_limit
+        )
+
+    def plan_alternatives(self, selected_structures, explosive_dict, k):
+        """
+        Up to k cheapest plans that differ in the explosives they use, cheapest first, each summarized
+        with its explosive totals and the resources to craft it (see solvers.solve_dp_top_k).
+        Returns an empty list when the owned inventory or raid is too large for the k-best DP.
+        """
+        if not isinstance(k, int) or isinstance(k, bool) or k <= 0:
+            raise ValueError("Number of alternatives must be a positive integer.")
+        try:
+            solutions = solve_dp_top_k(selected_structures, explosive_dict, self.explosives, self.structures, k)
+        except (SolverNotApplicable, PatternLimitExceeded):
+            return []
+        return [
+            summarize_solution(selected_structures, explosive_dict, solution, self.explosives, self.structures)
+            for solution in solutions
+        ]
+
+    def run_raid_optimizer(self, selected_structures, explosive_dict, mode="by_type", solver="auto", time_limit=None,
+                           on_incumbent=None, timings=None, solve_info=None, top_k=None, quality="exact"):
+        """
+        Runs the sulfur optimizer given selected structures and explosives (with owned amounts).
+        mode="by_type" solves one model per structure type using kill patterns, so its size does not
+        grow with quantities; mode="per_instance" builds the original model with variables per instance.
+        solver picks the by_type backend: "table" (precomputed, no owned explosives), "dp" (in-process),
+        "cbc" (PuLP) or "auto" (table, then DP, then CBC).
+        time_limit (seconds) is passed to CBC; results["optimal"] is False if it stopped at the limit.
+        quality="exact" runs the solver as above. "fast" returns the greedy plan of
+        anytime.greedy_solution in milliseconds; "balanced" then lets the exact solver improve it
+        for up to anytime.QUALITY_TIME_LIMITS["balanced"] seconds (or time_limit, if shorter).
+        on_incumbent(sulfur) is called whenever the solver finds a cheaper plan.
+        timings, if given, is a dict that gets the seconds spent building the model, writing it out,
+        solving it and extracting the results added under "build", "write", "solve" and "extract".
+        solve_info, if given, gets the backend used, the number of structure instances and, for CBC
+        models, the number of variables and constraints.
+        top_k, if given, adds "alternatives": the top_k cheapest distinct plans from plan_alternatives.
+        Returns a dict with detailed breakdowns for display, including "lower_bound" (sulfur no plan
+        can beat) and "gap" (how far above it the plan may be, as a fraction of its cost).
+        """
+        if quality not in QUALITY_TIME_LIMITS:
+            raise ValueError(f"Unknown quality level '{quality}'.")
+        if quality == "exact":
+            results = self.add_lower_bound(self._optimize(
+                selected_structures, explosive_dict, mode, solver, time_limit, on_incumbent, timings, solve_info
+            ), selected_structures, explosive_dict)
+        else:
+            results = self._optimize_anytime(
+                selected_structures, explosive_dict, mode, solver, quality, time_limit, on_incumbent, timings,
+                solve_info
+            )
+        if top_k:
+            results["alternatives"] = self.plan_alternatives(selected_structures, explosive_dict, top_k)
+        return results
+
+    def _optimize_anytime(self, selected_structures, explosive_dict, mode, solver, quality, time_limit,
+                          on_incumbent, timings, solve_info):
+        # Greedy plan and bound first, then the exact solver for whatever is left of the budget
+        if mode not in ("by_type", "per_instance"):
+            raise ValueError(f"Unknown optimizer mode '{mode}'.")
+        started = perf_counter()
+        solution = greedy_solution(selected_structures, explosive_dict, self.explosives, self.structures)
+        lower_bound = raid_lower_bound(selected_structures, explosive_dict, self.explosives, self.structures)
+        add_timing(timings, "solve", started)
+        if on_incumbent is not None:
+            on_incumbent(solution["sulfur_cost"])
+        solution["optimal"] = solution["sulfur_cost"] <= lower_bound
+
+        budget = QUALITY_TIME_LIMITS[quality]
+        if time_limit is not None:
+            budget = min(budget, time_limit)
+        budget -= perf_counter() - started
+        if not solution["optimal"] and budget > 0:
+            try:
+                results = self._optimize(
+                    selected_structures, explosive_dict, mode, solver, budget, on_incumbent, timings, solve_info
+                )
+            except NoPlanFound:
+                results = None
+            if results is not None and results["sulfur_cost"] <= solution["sulfur_cost"]:
+                return self.add_lower_bound(results, selected_structures, explosive_dict, lower_bound)
+
+        if solve_info is not None:
+            solve_info["instances"] = sum(selected_structures.values())
+            solve_info["backend"] = "greedy"
+        started = perf_counter()
+        results = self.summarize_solution(selected_structures, explosive_dict, solution)
+        add_timing(timings, "extract", started)
+        return self.add_lower_bound(results, selected_structures, explosive_dict, lower_bound)
+
+    def add_lower_bound(self, results, selected_structures, explosive_dict, lower_bound=None):
+        """
+        Sets "lower_bound" and "gap" on optimizer results: the plan's own cost when it is optimal,
+        otherwise lower_bound or anytime.raid_lower_bound. Returns results.
+        """
+        if results["optimal"]:
+            lower_bound = results["sulfur_cost"]
+        elif lower_bound is None:
+            lower_bound = raid_lower_bound(selected_structures, explosive_dict, self.explosives, self.structures)
+        results["lower_bound"] = lower_bound
+        results["gap"] = optimality_gap(results["sulfur_cost"], lower_bound)
+        return results
+
+    def _optimize(self, selected_structures, explosive_dict, mode, solver, time_limit, on_incumbent, timings,
+                  solve_info):
+        explosive_list = list(explosive_dict.keys())
+        if solve_info is not None:
+            solve_info["instances"] = sum(selected_structures.values())
+        if mode == "by_type":
+            solution = solve_raid(
+                selected_structures, explosive_dict, self.explosives, self.structures, solver, self.plan_table,
+                time_limit, on_incumbent, timings, solve_info
+            )
+            started = perf_counter()
+            results = self.summarize_solution(selected_structures, explosive_dict, solution)
+            add_timing(timings, "extract", started)
+            return results
+        elif mode != "per_instance":
+            raise ValueError(f"Unknown optimizer mode '{mode}'.")
+
+        if solve_info is not None:
+            solve_info["backend"] = "per_instance"
+        structure_instance_usage, sulfur_cost, optimal = solve_per_instance(
+            selected_structures, explosive_dict, self.explosives, self.structures, time_limit, on_incumbent,
+            timings, solve_info
+        )
+        started = perf_counter()
+        results = self.summarize_instance_usage(structure_instance_usage, explosive_list, sulfur_cost, optimal)
+        add_timing(timings, "extract", started)
+        return results
+
+    def summarize_solution(self, selected_structures, explosive_dict, solution):
+        """
+        Expands a per-type solution (as returned by solvers.solve_raid) into the display results.
+        """
+        explosive_list = list(explosive_dict.keys())
+        structure_instance_usage = expand_instances(selected_structures, explosive_list, solution)
+        return self.summarize_instance_usage(
+            structure_instance_usage, explosive_list, solution["sulfur_cost"], solution["optimal"]
+        )
+
+    def summarize_instance_usage(self, structure_instance_usage, explosive_list, sulfur_cost, optimal=True):
+        """
+        Builds the per-structure, per-explosive and resource totals from a per-instance breakdown,
+        and the breakdown with identical instances collapsed (see patterns.group_instances).
+        """
+        # Per-structure summary (totals for each explosive per structure)
+        structure_breakdown = {}
+        structure_usage = {}
+        for struct, instances in structure_instance_usage.items():
+            structure_breakdown[struct] = len(instances)
+            usage = {}
+            for instance in instances:
+                for exp, detail in instance.items():
+                    usage[exp] = usage.get(exp, 0) + detail["total"]
+            structure_usage[struct] = usage
+
+        # Totals for each explosive across all structures
+        explosive_totals = {exp: 0 for exp in explosive_list}
+        explosive_owned_totals = {exp: 0 for exp in explosive_list}
+        explosive_crafted_totals = {exp: 0 for exp in explosive_list}
+        for instances in structure_instance_usage.values():
+            for instance in instances:
+                for exp, detail in instance.items():
+                    explosive_totals[exp] += detail["total"]
+                    explosive_owned_totals[exp] += detail["owned"]
+                    explosive_crafted_totals[exp] += detail["crafted"]
+
+        # Total resources (owned + crafted) and crafted only, one matrix product each
+        total_resources = self.matrices.resources_for(explosive_totals)
+        crafted_resources = self.matrices.resources_for(explosive_crafted_totals)
+
+        return {
+            "structure_instance_usage": structure_instance_usage,
+            "structure_instance_groups": group_instances(structure_instance_usage),
+            "explosive_totals": explosive_totals,
+            "explosive_owned_totals": explosive_owned_totals,
+            "explosive_crafted_totals": explosive_crafted_totals,
+            "sulfur_cost": sulfur_cost,
+            "optimal": optimal,
+            "total_resources": total_resources,
+            "crafted_resources": crafted_resources,
+            "structure_breakdown": structure_breakdown,
+            "structure_usage": structure_usage,
+        }
+
+
+def get_engine(name="current", version=None):
+    """
+    Returns the process-wide engine for a named game data version ("current" by default),
+    loading the game data on first call. See datastore.GameDataStore.get for version.
+    """
+    # Imported here because the store itself builds RaidEngines
+    from datastore import get_store
+    return get_store().get(name, version)
+
+
+def run_raid_optimizer(selected_structures, explosive_dict, mode="by_type", solver="auto", time_limit=None,
+                       on_incumbent=None, timings=None, solve_info=None, top_k=None, quality="exact"):
+    """
+    RaidEngine.run_raid_optimizer on the process-wide engine.
+    """
+    return get_engine().run_raid_optimizer(
+        selected_structures, explosive_dict, mode, solver, time_limit, on_incumbent, timings, solve_info, top_k,
+        quality
+    )
+
+
+def instrumented_raid_optimizer(selected_structures, explosive_dict, mode="by_type", solver="auto", time_limit=None,
+                                data_version=None, quality="exact"):
+    """
+    run_raid_optimizer for worker pools: returns (results, timings, solve_info) so phase
+    timings and model sizes measured in a worker process reach the caller's metrics.
+    data_version, if given, is the (name, content hash) of the game data the caller used;
+    a worker holding older data reloads it first.
+    """
+    timings = {}
+    solve_info = {}
+    name, version = data_version or ("current", None)
+    results = get_engine(name, version).run_raid_optimizer(
+        selected_structures, explosive_dict, mode, solver, time_limit, timings=timings, solve_info=solve_info,
+        quality=quality
+    )
+    return results, timings, solve_info
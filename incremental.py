@@ -0,0 +1,314 @@
+######################################
+# Incremental optimizer
+# Keeps one user's kill-pattern tables, CBC model variables and last plan
+# between submissions. When only owned counts, structure quantities or a
+# few explosives change, the tables are filtered instead of rebuilt, the
+# model is re-declared from the variables it already has and CBC starts
+# from the previous plan, repaired to fit the new inputs. A session's first
+# solve runs on a worker process, and its tables and plan are restored here
+# for the edits that follow.
+######################################
+
+import threading
+import time
+
+from patterns import add_timing, kill_pattern_table, run_cbc, NoPlanFound, PatternLimitExceeded
+from solvers import solve_dp, solve_table, SolverNotApplicable
+
+
+def _fits(row, explosive_dict):
+    return all(count <= explosive_dict.get(exp, 0) for exp, count in row["owned"].items())
+
+
+class IncrementalOptimizer:
+    """
+    Session-scoped optimizer for one user on one engine. solve() gives the same plans as
+    solvers.solve_raid with the "auto" backend, but reuses work from the previous call.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        # structure -> (explosive names, owned limits the rows were built for, rows)
+        self.tables = {}
+        # (structure, owned usage of a row) -> LpVariable, kept while the explosive set is unchanged
+        self.pattern_vars = {}
+        self.owned_vars = {}
+        self.names = 0
+        self.counters = {"solves": 0, "tables_built": 0, "tables_reused": 0}
+
+    def pattern_table(self, struct, explosive_dict):
+        """
+        Kill pattern rows for one structure, cheapest first, exactly as kill_pattern_table
+        would build them. Owned usage never changes a row, so rows built for a larger
+        inventory of the same explosives are filtered instead of searched again.
+        """
+        names = tuple(explosive_dict)
+        cached = self.tables.get(struct)
+        if cached is not None and cached[0] == names and all(
+            explosive_dict[exp] <= cached[1][exp] for exp in names
+        ):
+            self.counters["tables_reused"] += 1
+            return [row for row in cached[2] if _fits(row, explosive_dict)]
+
+        limits = dict(explosive_dict)
+        if cached is not None and cached[0] == names:
+            # Cover both inventories so stepping back and forth between them stays a filter
+            limits = {exp: max(explosive_dict[exp], cached[1][exp]) for exp in names}
+        try:
+            rows = kill_pattern_table(struct, limits, self.engine.explosives, self.engine.structures)
+        except PatternLimitExceeded:
+            if limits == explosive_dict:
+                raise
+            limits = dict(explosive_dict)
+            rows = kill_pattern_table(struct, limits, self.engine.explosives, self.engine.structures)
+        if cached is None or cached[0] != names:
+            # The crafted fill of every row depends on the explosive set, so its variables are stale
+            for key in [key for key in self.pattern_vars if key[0] == struct]:
+                del self.pattern_vars[key]
+        self.tables[struct] = (names, limits, rows)
+        self.counters["tables_built"] += 1
+        return [row for row in rows if _fits(row, explosive_dict)]
+
+    def warm(self, selected_structures, explosive_dict):
+        """
+        True when solve() can filter tables this session already has for every structure: the
+        same explosives, no more owned than before and no new structure types. Anything else
+        would build tables from scratch and is better solved cold on a worker.
+        """
+        names = tuple(explosive_dict)
+        with self.lock:
+            for struct in selected_structures:
+                cached = self.tables.get(struct)
+                if cached is None or cached[0] != names or any(
+                    explosive_dict[exp] > cached[1][exp] for exp in names
+                ):
+                    return False
+            return True
+
+    def snapshot(self):
+        """
+        The session's tables and last plan as plain data, for restore() in another process.
+        """
+        with self.lock:
+            return {
+                "tables": dict(self.tables),
+                "patterns": {key: var.varValue for key, var in self.pattern_vars.items()},
+                "owned": {exp: var.varValue for exp, var in self.owned_vars.items()},
+            }
+
+    def restore(self, state):
+        """
+        Replaces the session's tables and plan with a snapshot() taken on the same game data.
+        """
+        from pulp import LpVariable
+
+        with self.lock:
+            self.tables = dict(state["tables"])
+            self.pattern_vars = {}
+            for key, start in state["patterns"].items():
+                self.names += 1
+                var = self.pattern_vars[key] = LpVariable(f"pattern_{self.names}", 0, cat='Integer')
+                var.varValue = start
+            self.owned_vars = {}
+            for exp, start in state["owned"].items():
+                var = self.owned_vars[exp] = LpVariable(f"owned_{exp}", 0, cat='Integer')
+                var.varValue = start
+
+    def solve(self, selected_structures, explosive_dict, time_limit=None, on_incumbent=None, timings=None,
+              solve_info=None):
+        """
+        Solves the per-type raid model like solvers.solve_raid(backend="auto") and returns the
+        same solution dict. Raises PatternLimitExceeded when the owned inventory is too large
+        for kill patterns, so the caller can generate the patterns instead.
+        """
+        with self.lock:
+            self.counters["solves"] += 1
+            if self.engine.plan_table is not None and not any(explosive_dict.values()):
+                if solve_info is not None:
+                    solve_info["backend"] = "table"
+                started = time.perf_counter()
+                solution = solve_table(selected_structures, explosive_dict, self.engine.plan_table)
+                add_timing(timings, "solve", started)
+            else:
+                started = time.perf_counter()
+                tables = {struct: self.pattern_table(struct, explosive_dict) for struct in selected_structures}
+                add_timing(timings, "build", started)
+                try:
+                    solution = solve_dp(selected_structures, explosive_dict, self.engine.explosives,
+                                        self.engine.structures, timings, tables)
+                    if solve_info is not None:
+                        solve_info["backend"] = "dp"
+                except SolverNotApplicable:
+                    if solve_info is not None:
+                        solve_info["backend"] = "cbc"
+                    return self.solve_cbc(
+                        selected_structures, explosive_dict, tables, time_limit, on_incumbent, timings, solve_info
+                    )
+            if on_incumbent is not None:
+                on_incumbent(solution["sulfur_cost"])
+            return solution
+
+    def solve_cbc(self, selected_structures, explosive_dict, tables, time_limit, on_incumbent, timings, solve_info):
+        """
+        patterns.solve_by_type on the session's own variables, warm-started from their last values.
+        """
+        from pulp import LpProblem, LpMinimize, LpVariable, LpStatusOptimal, LpSolutionOptimal, lpSum, value
+
+        started = time.perf_counter()
+        explosive_list = list(explosive_dict.keys())
+        defaults = {struct: next(p for p, row in enumerate(rows) if not row["owned"]) for struct, rows in tables.items()}
+        if on_incumbent is not None:
+            on_incumbent(sum(qty * tables[struct][defaults[struct]]["sulfur"]
+                             for struct, qty in selected_structures.items()))
+
+        prob = LpProblem("Rust_Raid_Optimizer_By_Type", LpMinimize)
+        columns = {}
+        for struct, qty in selected_structures.items():
+            columns[struct] = []
+            for row in tables[struct]:
+                key = (struct, tuple(sorted(row["owned"].items())))
+                var = self.pattern_vars.get(key)
+                if var is None:
+                    self.names += 1
+                    var = self.pattern_vars[key] = LpVariable(f"pattern_{self.names}", 0, cat='Integer')
+                    var.varValue = 0
+                var.upBound = qty
+                columns[struct].append(var)
+            prob += lpSum(columns[struct]) == qty, f"{struct}_count"
+
+        used = {}
+        for exp in explosive_list:
+            used[exp] = lpSum(
+                var * row["pattern"][exp]
+                for struct in selected_structures
+                for var, row in zip(columns[struct], tables[struct])
+                if exp in row["pattern"]
+            )
+            if exp not in self.owned_vars:
+                self.owned_vars[exp] = LpVariable(f"owned_{exp}", 0, cat='Integer')
+            self.owned_vars[exp].upBound = explosive_dict[exp]
+            prob += self.owned_vars[exp] <= used[exp], f"{exp}_owned_used"
+
+        prob += lpSum(
+            (used[exp] - self.owned_vars[exp]) * self.engine.explosives[exp]['raw_materials']['sulfur']
+            for exp in explosive_list
+        ), "Total_Sulfur_Cost"
+        self.repair_start(selected_structures, explosive_dict, tables, columns, defaults)
+        started = add_timing(timings, "build", started)
+
+        run_cbc(prob, time_limit, on_incumbent=on_incumbent, timings=timings, solve_info=solve_info, warm_start=True)
+        started = time.perf_counter()
+        if prob.status != LpStatusOptimal:
+            raise NoPlanFound("No feasible raid plan found for the selected explosives.")
+
+        pattern_counts = {}
+        for struct in selected_structures:
+            pattern_counts[struct] = []
+            for var, row in zip(columns[struct], tables[struct]):
+                count = int(round(var.varValue or 0))
+                if count > 0:
+                    pattern_counts[struct].append((row["pattern"], count))
+        solution = {
+            "pattern_counts": pattern_counts,
+            "owned_used": {exp: int(round(self.owned_vars[exp].varValue or 0)) for exp in explosive_list},
+            "sulfur_cost": int(round(value(prob.objective) or 0)),
+            "optimal": prob.sol_status == LpSolutionOptimal,
+        }
+        add_timing(timings, "extract", started)
+        return solution
+
+    def repair_start(self, selected_structures, explosive_dict, tables, columns, defaults):
+        """
+        Turns the previous plan into a feasible starting point for the new inputs: counts are
+        trimmed or topped up with the cheapest crafted-only pattern to match the quantities, and
+        instances move to that pattern until the owned explosives they spend are in stock.
+        """
+        counts = {}
+        for struct, qty in selected_structures.items():
+            counts[struct] = [max(0, int(round(var.varValue or 0))) for var in columns[struct]]
+            extra = sum(counts[struct]) - qty
+            # Drop the most expensive patterns first
+            for p in reversed(range(len(counts[struct]))):
+                if extra <= 0:
+                    break
+                taken = min(extra, counts[struct][p])
+                counts[struct][p] -= taken
+                extra -= taken
+            if extra < 0:
+                counts[struct][defaults[struct]] -= extra
+
+        for exp, limit in explosive_dict.items():
+            spent = sum(
+                count * row["owned"].get(exp, 0)
+                for struct in selected_structures
+                for count, row in zip(counts[struct], tables[struct])
+            )
+            for struct in selected_structures:
+                for p in reversed(range(len(counts[struct]))):
+                    per_instance = tables[struct][p]["owned"].get(exp, 0)
+                    while spent > limit and per_instance and counts[struct][p]:
+                        counts[struct][p] -= 1
+                        counts[struct][defaults[struct]] += 1
+                        spent -= per_instance
+
+        totals = dict.fromkeys(explosive_dict, 0)
+        for struct in selected_structures:
+            for var, count, row in zip(columns[struct], counts[struct], tables[struct]):
+                var.varValue = count
+                for exp, used in row["pattern"].items():
+                    totals[exp] += used * count
+        for exp, limit in explosive_dict.items():
+            self.owned_vars[exp].varValue = min(limit, totals[exp])
+
+    def run(self, selected_structures, explosive_dict, time_limit=None, on_incumbent=None, timings=None,
+            solve_info=None):
+        """
+        Same contract as RaidEngine.run_raid_optimizer in "by_type" mode, using the session's state.
+        """
+        if solve_info is not None:
+            solve_info["instances"] = sum(selected_structures.values())
+        try:
+            solution = self.solve(selected_structures, explosive_dict, time_limit, on_incumbent, timings, solve_info)
+        except PatternLimitExceeded:
+            # Session tables list every pattern; the engine generates them instead
+            return self.engine.run_raid_optimizer(
+                selected_structures, explosive_dict, time_limit=time_limit, on_incumbent=on_incumbent,
+                timings=timings, solve_info=solve_info
+            )
+        started = time.perf_counter()
+        results = self.engine.summarize_solution(selected_structures, explosive_dict, solution)
+        add_timing(timings, "extract", started)
+        return self.engine.add_lower_bound(results, selected_structures, explosive_dict)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+def session_raid_optimizer(optimizer, selected_structures, explosive_dict, time_limit=None):
+    """
+    IncrementalOptimizer.run for solver pools: returns (results, timings, solve_info)
+    like engine.instrumented_raid_optimizer.
+    """
+    timings = {}
+    solve_info = {}
+    results = optimizer.run(
+        selected_structures, explosive_dict, time_limit, timings=timings, solve_info=solve_info
+    )
+    return results, timings, solve_info
+
+
+def cold_session_raid_optimizer(selected_structures, explosive_dict, time_limit=None, data_version=None):
+    """
+    A session's cold solve for worker processes: session_raid_optimizer on a fresh optimizer for
+    the process-wide engine of data_version, returning (results, timings, solve_info, state) where
+    state is the optimizer's snapshot() for the session to restore.
+    """
+    # Imported here because the engine module imports the solvers this one builds on
+    from engine import get_engine
+
+    name, version = data_version or ("current", None)
+    optimizer = IncrementalOptimizer(get_engine(name, version))
+    results, timings, solve_info = session_raid_optimizer(optimizer, selected_structures, explosive_dict, time_limit)
+    return results, timings, solve_info, optimizer.snapshot()
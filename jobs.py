@@ -0,0 +1,142 @@
+######################################
+# Background optimization jobs
+# Long raids are submitted as jobs that run on a background executor.
+# Callers poll a job for its status and result, or follow the incumbent
+# sulfur costs as the solver improves them. Only a bounded number of
+# finished jobs are kept around.
+######################################
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.incumbents = []
+        self.result = None
+        self.error = None
+
+    def elapsed(self):
+        start = self.started_at or self.submitted_at
+        return (self.finished_at or time.time()) - start
+
+    def snapshot(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "elapsed": round(self.elapsed(), 3),
+            "incumbents": list(self.incumbents),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs fn(*args, on_incumbent=callback) for each submitted job on max_workers threads.
+    Keeps every queued or running job and the max_finished most recently finished ones.
+    """
+
+    def __init__(self, fn, max_workers=2, max_finished=256):
+        self.fn = fn
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.finished = OrderedDict()
+        self.changed = threading.Condition()
+        self.executor = None
+
+    def _executor(self):
+        with self.changed:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="raid-job")
+            return self.executor
+
+    def submit(self, *args, **kwargs):
+        """
+        Queues a job and returns its id.
+        """
+        job = Job(uuid.uuid4().hex)
+        with self.changed:
+            self.jobs[job.id] = job
+        self._executor().submit(self._run, job, args, kwargs)
+        return job.id
+
+    def _run(self, job, args, kwargs):
+        with self.changed:
+            job.status = "running"
+            job.started_at = time.time()
+            self.changed.notify_all()
+
+        def on_incumbent(sulfur):
+            with self.changed:
+                # Solvers can report the same cost more than once; only keep improvements
+                if not job.incumbents or sulfur < job.incumbents[-1]:
+                    job.incumbents.append(sulfur)
+                    self.changed.notify_all()
+
+        try:
+            result = self.fn(*args, on_incumbent=on_incumbent, **kwargs)
+        except Exception as e:
+            with self.changed:
+                job.status = "failed"
+                job.error = str(e)
+        else:
+            with self.changed:
+                job.status = "done"
+                job.result = result
+        with self.changed:
+            job.finished_at = time.time()
+            self.finished[job.id] = job
+            while len(self.finished) > self.max_finished:
+                old_id, _ = self.finished.popitem(last=False)
+                del self.jobs[old_id]
+            self.changed.notify_all()
+
+    def get(self, job_id):
+        """
+        Returns a snapshot dict of the job, or None if it is unknown or no longer retained.
+        """
+        with self.changed:
+            job = self.jobs.get(job_id)
+            return job.snapshot() if job is not None else None
+
+    def events(self, job_id, keepalive=15):
+        """
+        Yields ("incumbent", sulfur) for every improvement, None as a keep-alive while nothing
+        changes, and finally ("done", snapshot) once the job has finished.
+        """
+        sent = 0
+        while True:
+            with self.changed:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    return
+                if sent == len(job.incumbents) and job.finished_at is None:
+                    self.changed.wait(keepalive)
+                new = job.incumbents[sent:]
+                sent += len(new)
+                finished = job.finished_at is not None
+                snapshot = job.snapshot() if finished else None
+            for sulfur in new:
+                yield "incumbent", sulfur
+            if finished:
+                yield "done", snapshot
+                return
+            if not new:
+                yield None
+
+    def stats(self):
+        with self.changed:
+            stats = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self.jobs.values():
+                stats[job.status] += 1
+        return stats
@@ -0,0 +1,436 @@
+######################################
+# Load test
+# Drives the web routes of a local app instance with many concurrent
+# users and reports, per concurrency level and endpoint, the throughput,
+# error rate and latency percentiles. Requests are mixed raids generated
+# from structures.json and explosives.json with a fixed seed. The app is
+# started as a subprocess on a free localhost port unless --url points at
+# an instance that is already running (for example behind several
+# workers); only loopback addresses are accepted. With --workers the
+# sweep is repeated against serve.py for each worker count, recording
+# requests per second and the memory each worker adds.
+#
+# Usage:
+#   python loadtest.py                               sweep 1, 2, 4, 8, 16 users, 10 s each
+#   python loadtest.py --concurrency 1,4,32 --duration 30
+#   python loadtest.py --url http://127.0.0.1:8000   test a running instance
+#   python loadtest.py --endpoints /optimizer,/api/batch --slo 250
+#   python loadtest.py --workers 1,2,4                run serve.py with 1, 2 and 4 workers
+######################################
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "loadtest_results.json")
+DEFAULT_REPORT = os.path.join(BASE_DIR, "loadtest_report.md")
+
+CONCURRENCY = (1, 2, 4, 8, 16)
+# Share of requests sent to each route; /api/batch with one raid is the JSON equivalent of /optimizer
+ENDPOINT_WEIGHTS = {"/optimizer": 4, "/api/batch": 2, "/resources": 2, "/damage": 2}
+# Structure quantities drawn for a raid, small raids being the most common
+QUANTITIES = (1, 1, 1, 2, 2, 3, 4, 6, 8, 12, 20)
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+STARTUP_TIMEOUT = 60
+REQUEST_TIMEOUT = 120
+
+
+def random_raid(rng, explosives, structures):
+    """
+    A raid like a player would enter: one to three structure types and one to four
+    explosives, about half of them with some already owned.
+    """
+    selected_structures = {
+        struct: rng.choice(QUANTITIES) for struct in rng.sample(list(structures), rng.randint(1, 3))
+    }
+    explosive_dict = {
+        exp: rng.randint(1, 10) if rng.random() < 0.5 else 0
+        for exp in rng.sample(list(explosives), rng.randint(1, min(4, len(explosives))))
+    }
+    return selected_structures, explosive_dict
+
+
+def build_request(endpoint, rng, explosives, structures):
+    """
+    Returns (path, body bytes, content type) for one request to endpoint.
+    """
+    if endpoint == "/resources":
+        form = {"explosive_type": rng.choice(list(explosives)), "quantity": str(rng.randint(1, 50))}
+    elif endpoint == "/damage":
+        form = {
+            "structure": rng.choice(list(structures)),
+            "explosives": rng.sample(list(explosives), rng.randint(1, len(explosives))),
+        }
+    elif endpoint == "/optimizer":
+        selected_structures, explosive_dict = random_raid(rng, explosives, structures)
+        form = {f"qty_{struct}": str(qty) for struct, qty in selected_structures.items()}
+        for exp, owned in explosive_dict.items():
+            form[f"use_{exp}"] = "on"
+            form[f"owned_{exp}"] = str(owned)
+    elif endpoint == "/api/batch":
+        selected_structures, explosive_dict = random_raid(rng, explosives, structures)
+        body = json.dumps({"raids": [{"structures": selected_structures, "explosives": explosive_dict}]})
+        return endpoint, body.encode("utf-8"), "application/json"
+    else:
+        raise ValueError(f"Unknown endpoint '{endpoint}'.")
+    return endpoint, urllib.parse.urlencode(form, doseq=True).encode("utf-8"), "application/x-www-form-urlencoded"
+
+
+def send(base_url, path, body, content_type):
+    """
+    POSTs one request and returns (seconds, HTTP status); connection failures report status 0.
+    """
+    request = urllib.request.Request(base_url + path, data=body, headers={"Content-Type": content_type})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return time.perf_counter() - started, status
+
+
+def run_level(base_url, concurrency, duration, endpoints, explosives, structures, seed):
+    """
+    Runs `concurrency` users back to back for `duration` seconds.
+    Returns {endpoint: [(seconds, status), ...]} and the wall time of the level.
+    """
+    samples = {endpoint: [] for endpoint in endpoints}
+    lock = threading.Lock()
+    weights = [ENDPOINT_WEIGHTS.get(endpoint, 1) for endpoint in endpoints]
+    deadline = time.perf_counter() + duration
+
+    def user(index):
+        rng = random.Random(f"{seed}-{concurrency}-{index}")
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            seconds, status = send(base_url, *build_request(endpoint, rng, explosives, structures))
+            with lock:
+                samples[endpoint].append((seconds, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(user, range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall):
+    """
+    Throughput, error rate and latency percentiles of one endpoint's samples.
+    Any status other than 200 counts as an error, including 503 from a full solver pool.
+    """
+    from benchmark import percentile
+
+    latencies = [seconds for seconds, _ in samples]
+    errors = sum(1 for _, status in samples if status != 200)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput": len(samples) / wall if wall else 0.0,
+        "p50": percentile(latencies, 50) if latencies else None,
+        "p95": percentile(latencies, 95) if latencies else None,
+        "p99": percentile(latencies, 99) if latencies else None,
+        "statuses": statuses,
+    }
+
+
+def capacity(levels, slo, max_error_rate):
+    """
+    Highest concurrency at which every endpoint kept its p95 within slo seconds and its
+    error rate within max_error_rate, or None if even the lowest level did not.
+    """
+    best = None
+    for level in levels:
+        within = all(
+            result["requests"] and result["p95"] <= slo and result["error_rate"] <= max_error_rate
+            for result in level["endpoints"].values()
+        )
+        if not within:
+            break
+        best = level["concurrency"]
+    return best
+
+
+def scaling_table(runs):
+    """
+    Markdown rows comparing the serve.py runs: best throughput over the concurrency levels,
+    speedup over the first run and memory per worker (unique and proportional set size).
+    """
+    mb = 1024 * 1024
+    lines = [
+        "| Workers | Req/s | Speedup | Capacity | Worker USS MB | Worker PSS MB | Shared MB | Master RSS MB |",
+        "|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    base = runs[0]["throughput"]
+    for run in runs:
+        memory = run["memory"]
+        workers = memory["workers"]
+        if workers:
+            uss, pss, shared = (sum(worker[field] for worker in workers) / len(workers) / mb
+                                for field in ("uss", "pss", "shared"))
+            memory_cells = f"{uss:.1f} | {pss:.1f} | {shared:.1f} | " + (
+                f"{memory['master']['rss'] / mb:.1f}" if memory["master"] else "-"
+            )
+        else:
+            memory_cells = "- | - | - | -"
+        lines.append(
+            f"| {run['workers']} | {run['throughput']:.1f} | {run['throughput'] / base if base else 0:.2f}x "
+            f"| {run['capacity'] or '-'} | {memory_cells} |"
+        )
+    return lines
+
+
+def markdown_report(results):
+    """
+    Renders the results as a markdown report: one table per concurrency level, preceded by
+    a scaling table when serve.py was run with several worker counts.
+    """
+    meta = results["meta"]
+    lines = [
+        "# Load test report",
+        "",
+        f"- Target: {meta['target']}",
+        f"- Created: {meta['created']}, {meta['duration']} s per level, seed {meta['seed']}, "
+        f"{meta['cpu_count']} CPUs",
+    ]
+    runs = results.get("workers")
+    if runs:
+        lines += ["", "## Worker scaling", ""] + scaling_table(runs)
+    else:
+        runs = [{"workers": None, "levels": results["levels"], "capacity": results["capacity"]}]
+    for run in runs:
+        prefix = f"{run['workers']} workers, " if run["workers"] is not None else ""
+        lines += [
+            "",
+            f"- {prefix}capacity (p95 <= {meta['slo'] * 1000:.0f} ms, errors <= {meta['max_error_rate']:.1%}): "
+            + (f"{run['capacity']} concurrent users" if run["capacity"] else "not met at any level"),
+        ]
+        lines += level_tables(run["levels"], prefix)
+    return "\n".join(lines) + "\n"
+
+
+def level_tables(levels, prefix=""):
+    lines = []
+    for level in levels:
+        lines += [
+            "",
+            f"## {prefix}{level['concurrency']} concurrent users ({level['throughput']:.1f} req/s overall)",
+            "",
+            "| Endpoint | Requests | Req/s | Errors | p50 ms | p95 ms | p99 ms |",
+            "|---|---:|---:|---:|---:|---:|---:|",
+        ]
+        for endpoint, result in level["endpoints"].items():
+            if not result["requests"]:
+                lines.append(f"| {endpoint} | 0 | 0.0 | - | - | - | - |")
+                continue
+            lines.append(
+                f"| {endpoint} | {result['requests']} | {result['throughput']:.1f} | {result['error_rate']:.1%} "
+                f"| {result['p50'] * 1000:.1f} | {result['p95'] * 1000:.1f} | {result['p99'] * 1000:.1f} |"
+            )
+    return lines
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, log, workers=None):
+    """
+    Starts the app in a subprocess on 127.0.0.1:port and waits until it answers.
+    With workers, the subprocess is serve.py with that many preforked workers.
+    """
+    if workers is None:
+        command = [sys.executable, os.path.abspath(__file__), "--serve", str(port)]
+    else:
+        command = [sys.executable, os.path.join(BASE_DIR, "serve.py"), "--workers", str(workers), "--port", str(port)]
+    process = subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The app exited while starting.")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1):
+                log(f"App started on 127.0.0.1:{port} (pid {process.pid})")
+                return process
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"The app did not answer within {STARTUP_TIMEOUT} s.")
+
+
+def serve(port):
+    # Threaded, like a single production worker; the solver pool still runs solves in processes
+    from werkzeug.serving import make_server
+
+    sys.path.insert(0, BASE_DIR)
+    import app as raid_app
+
+    make_server("127.0.0.1", port, raid_app.app, threaded=True).serve_forever()
+
+
+def sweep(base_url, levels, duration, endpoints, explosives, structures, seed, log):
+    """
+    Runs every concurrency level against base_url and returns their summaries.
+    """
+    results_levels = []
+    for concurrency in levels:
+        samples, wall = run_level(base_url, concurrency, duration, endpoints, explosives, structures, seed)
+        level = {
+            "concurrency": concurrency,
+            "wall": wall,
+            "throughput": sum(len(s) for s in samples.values()) / wall,
+            "endpoints": {endpoint: summarize(samples[endpoint], wall) for endpoint in endpoints},
+        }
+        results_levels.append(level)
+        log(f"{concurrency:>4} users  {level['throughput']:8.1f} req/s  " + "  ".join(
+            f"{endpoint} p95 {result['p95'] * 1000:.0f} ms" if result["requests"] else f"{endpoint} -"
+            for endpoint, result in level["endpoints"].items()
+        ))
+    return results_levels
+
+
+def server_memory(process):
+    """
+    Memory of a serve.py master (process) and of each of its workers, measured after the load.
+    """
+    from serve import child_pids, memory_usage
+
+    workers = [memory_usage(pid) for pid in child_pids(process.pid)]
+    return {"master": memory_usage(process.pid), "workers": [worker for worker in workers if worker]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the raid calculator web routes on localhost.")
+    parser.add_argument("--url", help="test an already running local instance instead of starting one")
+    parser.add_argument("--concurrency", default=",".join(map(str, CONCURRENCY)),
+                        help="comma-separated numbers of concurrent users to sweep")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINT_WEIGHTS), help="comma-separated routes to drive")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated raids")
+    parser.add_argument("--slo", type=float, default=500, help="p95 latency target in milliseconds")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="error rate allowed within capacity")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help="where to write the markdown report")
+    parser.add_argument("--workers", help="comma-separated serve.py worker counts to compare, e.g. 1,2,4")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve is not None:
+        serve(args.serve)
+        return 0
+
+    def log(line):
+        print(line, file=sys.stderr, flush=True)
+
+    sys.path.insert(0, BASE_DIR)
+    from engine import load_game_data
+
+    try:
+        levels = [int(level) for level in args.concurrency.split(",") if level]
+    except ValueError:
+        parser.error("--concurrency must be comma-separated integers")
+    if not levels or min(levels) <= 0:
+        parser.error("--concurrency needs positive levels")
+    endpoints = [endpoint for endpoint in args.endpoints.split(",") if endpoint]
+    for endpoint in endpoints:
+        if endpoint not in ENDPOINT_WEIGHTS:
+            parser.error(f"unknown endpoint '{endpoint}'")
+    if args.url and urllib.parse.urlsplit(args.url).hostname not in LOOPBACK_HOSTS:
+        parser.error("--url must point at localhost")
+    worker_counts = []
+    if args.workers:
+        if args.url:
+            parser.error("--workers starts its own servers and can't be combined with --url")
+        try:
+            worker_counts = [int(count) for count in args.workers.split(",") if count]
+        except ValueError:
+            parser.error("--workers must be comma-separated integers")
+        if not worker_counts or min(worker_counts) <= 0:
+            parser.error("--workers needs positive counts")
+    explosives, structures = load_game_data(BASE_DIR)
+    meta = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": args.url.rstrip("/") if args.url else "local subprocess",
+        "duration": args.duration,
+        "seed": args.seed,
+        "slo": args.slo / 1000,
+        "max_error_rate": args.max_error_rate,
+        "cpu_count": os.cpu_count(),
+    }
+
+    if worker_counts:
+        meta["target"] = "serve.py subprocess"
+        runs = []
+        for count in worker_counts:
+            port = free_port()
+            process = start_server(port, log, workers=count)
+            try:
+                log(f"{count} workers:")
+                run_levels = sweep(f"http://127.0.0.1:{port}", levels, args.duration, endpoints,
+                                   explosives, structures, args.seed, log)
+                memory = server_memory(process)
+            finally:
+                process.terminate()
+                process.wait()
+            runs.append({
+                "workers": count,
+                "levels": run_levels,
+                "throughput": max(level["throughput"] for level in run_levels),
+                "capacity": capacity(run_levels, meta["slo"], args.max_error_rate),
+                "memory": memory,
+            })
+        # The top-level levels and capacity are those of the largest worker count
+        results = {"meta": meta, "levels": runs[-1]["levels"], "capacity": runs[-1]["capacity"], "workers": runs}
+        return write_results(results, args, log)
+
+    process = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        port = free_port()
+        process = start_server(port, log)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        results_levels = sweep(base_url, levels, args.duration, endpoints, explosives, structures, args.seed, log)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    results = {"meta": meta, "levels": results_levels}
+    results["capacity"] = capacity(results_levels, meta["slo"], args.max_error_rate)
+    return write_results(results, args, log)
+
+
+def write_results(results, args, log):
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    with open(args.report, "w") as file:
+        file.write(markdown_report(results))
+    log(f"Results written to {args.output} and {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+######################################
+# Game data matrices
+# Compiles explosives.json and structures.json once into dense NumPy arrays:
+# an explosive x structure damage matrix (plus an exact integer copy scaled
+# by damage_scale), an explosive x material cost matrix and an HP vector,
+# with name <-> index maps. Totals for a whole vector of explosive counts
+# are then a single matrix product instead of nested dict walks.
+######################################
+
+from decimal import Decimal
+
+import numpy as np
+
+_compiled = []
+
+
+def damage_scale(explosives, structures):
+    """
+    Returns the power of ten that turns every damage and HP value into an integer,
+    so pattern arithmetic is exact (e.g. rocket's 137.575 against a metal wall).
+    """
+    places = 0
+    values = list(structures.values())
+    for explosive in explosives.values():
+        values.extend(explosive["damage_per_structure"].values())
+    for number in values:
+        exponent = Decimal(str(number)).normalize().as_tuple().exponent
+        places = max(places, -exponent)
+    return 10 ** places
+
+
+def _plain(number):
+    # Keep the JSON's own look: 440 stays 440, 137.575 stays 137.575
+    number = float(number)
+    return int(number) if number.is_integer() else number
+
+
+class GameMatrices:
+    def __init__(self, explosives, structures):
+        self.explosives = explosives
+        self.structures = structures
+        self.explosive_names = list(explosives.keys())
+        self.structure_names = list(structures.keys())
+        self.material_names = []
+        for explosive in explosives.values():
+            for material in explosive["raw_materials"]:
+                if material not in self.material_names:
+                    self.material_names.append(material)
+        self.explosive_index = {name: i for i, name in enumerate(self.explosive_names)}
+        self.structure_index = {name: i for i, name in enumerate(self.structure_names)}
+        self.material_index = {name: i for i, name in enumerate(self.material_names)}
+
+        self.hp = np.array([structures[s] for s in self.structure_names], dtype=np.float64)
+        self.damage = np.array([
+            [explosives[e]["damage_per_structure"][s] for s in self.structure_names]
+            for e in self.explosive_names
+        ], dtype=np.float64)
+        self.materials = np.array([
+            [explosives[e]["raw_materials"].get(m, 0) for m in self.material_names]
+            for e in self.explosive_names
+        ], dtype=np.int64)
+        # Which materials appear in each recipe, so per-explosive dicts keep their own keys
+        self.recipe_mask = np.array([
+            [m in explosives[e]["raw_materials"] for m in self.material_names]
+            for e in self.explosive_names
+        ], dtype=bool)
+        self.sulfur = self.materials[:, self.material_index["sulfur"]]
+
+        self.scale = damage_scale(explosives, structures)
+        self.scaled_damage = np.array([
+            [int(Decimal(str(explosives[e]["damage_per_structure"][s])) * self.scale) for s in self.structure_names]
+            for e in self.explosive_names
+        ], dtype=np.int64)
+        self.scaled_hp = np.array(
+            [int(Decimal(str(structures[s])) * self.scale) for s in self.structure_names], dtype=np.int64
+        )
+
+    def counts_vector(self, counts):
+        """
+        Turns {explosive: count} into a dense count vector over all explosives.
+        """
+        vector = np.zeros(len(self.explosive_names), dtype=np.int64)
+        for exp, count in counts.items():
+            vector[self.explosive_index[exp]] = count
+        return vector
+
+    def resources_for(self, counts):
+        """
+        Total raw materials for {explosive: count} (or a count vector) in one matrix product.
+        Returns {material: amount} for the materials the used explosives need.
+        """
+        vector = counts if isinstance(counts, np.ndarray) else self.counts_vector(counts)
+        totals = vector @ self.materials
+        needed = (vector > 0) @ self.recipe_mask
+        return {self.material_names[m]: int(totals[m]) for m in np.flatnonzero(needed)}
+
+    def recipe(self, explosive_type, quantity):
+        """
+        Raw materials for `quantity` of one explosive, keyed like its recipe in explosives.json.
+        """
+        row = self.explosive_index[explosive_type]
+        amounts = self.materials[row] * quantity
+        return {
+            material: int(amounts[self.material_index[material]])
+            for material in self.explosives[explosive_type]["raw_materials"]
+        }
+
+    def damage_values(self, explosive_list, structure):
+        """
+        Damage of each listed explosive against one structure as {explosive: damage}.
+        """
+        rows = [self.explosive_index[exp] for exp in explosive_list]
+        column = self.damage[rows, self.structure_index[structure]]
+        return {exp: _plain(damage) for exp, damage in zip(explosive_list, column)}
+
+
+def get_matrices(explosives, structures):
+    """
+    Returns the compiled matrices for these data dicts, compiling them on first use.
+    Game data is treated as immutable: a reload swaps in new dicts, which get new matrices.
+    """
+    for compiled in _compiled:
+        if compiled.explosives is explosives and compiled.structures is structures:
+            return compiled
+    compiled = GameMatrices(explosives, structures)
+    _compiled.append(compiled)
+    # Keep the last few data sets only (current data plus any older versions still in use)
+    del _compiled[:-4]
+    return compiled
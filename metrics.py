@@ -0,0 +1,127 @@
+######################################
+# Metrics
+# A small in-process registry of counters, gauges and histograms that
+# renders the Prometheus text exposition format, so /metrics can be
+# scraped without extra dependencies. Collectors are called at render
+# time for values that already live elsewhere (cache and pool counters).
+######################################
+
+import math
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe metric store. Metrics are declared once with describe() and then updated
+    with inc(), set() or observe(), passing labels as keyword arguments.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.values = {}
+        self.collectors = []
+
+    def describe(self, name, kind, help_text, buckets=DEFAULT_BUCKETS):
+        """
+        Declares a metric of kind "counter", "gauge" or "histogram".
+        """
+        if kind not in ("counter", "gauge", "histogram"):
+            raise ValueError(f"Unknown metric kind '{kind}'.")
+        with self.lock:
+            self.metrics[name] = (kind, help_text, tuple(buckets))
+            self.values.setdefault(name, {})
+
+    def _series(self, name, kind, labels):
+        if name not in self.metrics:
+            raise ValueError(f"Metric '{name}' has not been described.")
+        if self.metrics[name][0] != kind:
+            raise ValueError(f"Metric '{name}' is not a {kind}.")
+        return self.values[name], tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            series, key = self._series(name, "counter", labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            series, key = self._series(name, "gauge", labels)
+            series[key] = value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            series, key = self._series(name, "histogram", labels)
+            buckets = self.metrics[name][2]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = {"counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def add_collector(self, collector):
+        """
+        Registers collector(), called on every render. It returns an iterable of
+        (name, kind, help_text, labels dict, value) for counters and gauges.
+        """
+        with self.lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        with self.lock:
+            metrics = dict(self.metrics)
+            values = {
+                name: {key: (dict(state, counts=list(state["counts"])) if isinstance(state, dict) else state)
+                       for key, state in series.items()}
+                for name, series in self.values.items()
+            }
+            collectors = list(self.collectors)
+
+        for name, (kind, help_text, buckets) in metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, state in values[name].items():
+                if kind != "histogram":
+                    lines.append(f"{name}{_label_text(key)} {_number(state)}")
+                    continue
+                for bound, count in zip(buckets + (math.inf,), state["counts"] + [state["count"]]):
+                    lines.append(f"{name}_bucket{_label_text(key + (('le', _number(float(bound))),))} {count}")
+                lines.append(f"{name}_sum{_label_text(key)} {_number(state['sum'])}")
+                lines.append(f"{name}_count{_label_text(key)} {state['count']}")
+
+        described = set()
+        for collector in collectors:
+            for name, kind, help_text, labels, value in collector():
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_label_text(tuple(sorted(labels.items())))} {_number(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,327 @@
+######################################
+# Columnar model builder
+# Builds integer programs straight into NumPy arrays: column bounds and
+# costs, row senses and right-hand sides, and the constraint matrix as
+# (row, column, value) triplets with integer indices. The MPS file is
+# written from those arrays in one go and CBC's solution is read back
+# into a value array in one pass, so large per-instance models never
+# create a PuLP object, a name string or an lpSum per variable.
+######################################
+
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from anytime import greedy_solution
+from matrices import get_matrices
+from patterns import add_timing, expand_instances, follow_cbc_log, NoPlanFound
+
+# CBC's first solution line, mapped to (status, whether the plan is proven optimal)
+CBC_STATUS = {
+    "Optimal": ("optimal", True),
+    "Stopped": ("stopped", False),
+    "Infeasible": ("infeasible", False),
+    "Integer": ("infeasible", False),
+    "Unbounded": ("unbounded", False),
+}
+
+
+class ColumnarModel:
+    """
+    Minimization integer program held as arrays. Columns and rows are added in blocks and
+    referred to by the integer indices the add_* methods return.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.num_columns = 0
+        self.num_rows = 0
+        self._columns = []
+        self._rows = []
+        self._entries = []
+
+    def add_columns(self, count, cost=0.0, lower=0.0, upper=np.inf, integer=True):
+        """
+        Adds count columns; cost, lower and upper are scalars or arrays of length count.
+        Returns the new column indices.
+        """
+        index = np.arange(self.num_columns, self.num_columns + count)
+        self._columns.append((
+            np.broadcast_to(np.asarray(cost, dtype=np.float64), (count,)),
+            np.broadcast_to(np.asarray(lower, dtype=np.float64), (count,)),
+            np.broadcast_to(np.asarray(upper, dtype=np.float64), (count,)),
+            np.full(count, integer),
+        ))
+        self.num_columns += count
+        return index
+
+    def add_rows(self, sense, rhs, ranges=None):
+        """
+        Adds one row per rhs value. sense is "L" (<=), "G" (>=) or "E" (=). ranges, if given,
+        makes each row two-sided: a "G" row with range r keeps its activity in [rhs, rhs + r].
+        Returns the new row indices.
+        """
+        rhs = np.asarray(rhs, dtype=np.float64).ravel()
+        index = np.arange(self.num_rows, self.num_rows + len(rhs))
+        self._rows.append((
+            np.full(len(rhs), sense),
+            rhs,
+            np.full(len(rhs), np.nan) if ranges is None else np.broadcast_to(
+                np.asarray(ranges, dtype=np.float64), rhs.shape
+            ),
+        ))
+        self.num_rows += len(rhs)
+        return index
+
+    def add_entries(self, rows, columns, values):
+        """
+        Sets matrix coefficients; rows, columns and values broadcast against each other.
+        Zero coefficients are dropped.
+        """
+        rows, columns, values = (np.ravel(a) for a in np.broadcast_arrays(rows, columns, values))
+        keep = values != 0
+        self._entries.append((rows[keep], columns[keep], values[keep].astype(np.float64)))
+
+    def columns(self):
+        """
+        (cost, lower, upper, integer) arrays over all columns.
+        """
+        return tuple(np.concatenate([block[i] for block in self._columns]) for i in range(4))
+
+    def rows(self):
+        """
+        (sense, rhs, ranges) arrays over all rows; ranges is NaN for one-sided rows.
+        """
+        return tuple(np.concatenate([block[i] for block in self._rows]) for i in range(3))
+
+    def write_mps(self, path):
+        """
+        Writes the model as an MPS file. Columns are named X0000000 and up, rows C0000000 and up.
+        """
+        cost, lower, upper, integer = self.columns()
+        sense, rhs, ranges = self.rows()
+        rows = np.concatenate([entries[0] for entries in self._entries])
+        columns = np.concatenate([entries[1] for entries in self._entries])
+        values = np.concatenate([entries[2] for entries in self._entries])
+        # The objective is row -1; columns with no coefficient at all still have to be declared
+        in_objective = (cost != 0) | (np.bincount(columns, minlength=self.num_columns) == 0)
+        objective = np.flatnonzero(in_objective)
+        rows = np.concatenate([rows, np.full(len(objective), -1)])
+        columns = np.concatenate([columns, objective])
+        values = np.concatenate([values, cost[objective]])
+        order = np.lexsort((rows, columns))
+        rows, columns, values = rows[order].tolist(), columns[order].tolist(), values[order].tolist()
+
+        column_names = [f"X{j:07d}" for j in range(self.num_columns)]
+        row_names = [f"C{i:07d}" for i in range(self.num_rows)] + ["OBJ"]
+        with open(path, "w") as file:
+            file.write(f"*SENSE:Minimize\nNAME          MODEL\nROWS\n N  OBJ\n")
+            file.writelines(f" {s}  {name}\n" for s, name in zip(sense.tolist(), row_names))
+            file.write("COLUMNS\n")
+            # Integer columns are wrapped in markers, one pair per run of integer columns
+            flags = integer[columns].tolist()
+            start = 0
+            while start < len(columns):
+                end = start
+                while end < len(columns) and flags[end] == flags[start]:
+                    end += 1
+                if flags[start]:
+                    file.write("    MARK      'MARKER'                 'INTORG'\n")
+                file.writelines(
+                    f"    {column_names[c]}  {row_names[r]:<8}  {v: .12e}\n"
+                    for c, r, v in zip(columns[start:end], rows[start:end], values[start:end])
+                )
+                if flags[start]:
+                    file.write("    MARK      'MARKER'                 'INTEND'\n")
+                start = end
+            file.write("RHS\n")
+            nonzero = np.flatnonzero(rhs)
+            file.writelines(f"    RHS       {row_names[i]}  {rhs[i]: .12e}\n" for i in nonzero.tolist())
+            ranged = np.flatnonzero(~np.isnan(ranges))
+            if len(ranged):
+                file.write("RANGES\n")
+                file.writelines(f"    RNG       {row_names[i]}  {ranges[i]: .12e}\n" for i in ranged.tolist())
+            file.write("BOUNDS\n")
+            fixed = lower == upper
+            for kind, bound, index in (
+                ("FX", lower, np.flatnonzero(fixed)),
+                ("LO", lower, np.flatnonzero(~fixed)),
+                ("UP", upper, np.flatnonzero(~fixed & ~np.isinf(upper))),
+            ):
+                file.writelines(
+                    f" {kind} BND       {column_names[j]}  {value: .12e}\n"
+                    for j, value in zip(index.tolist(), bound[index].tolist())
+                )
+            file.write("ENDATA\n")
+
+    def read_solution(self, path):
+        """
+        Reads a CBC solution file in one pass. Returns (status, proven optimal, objective, values).
+        """
+        values = np.zeros(self.num_columns)
+        with open(path) as file:
+            header = file.readline().split()
+            for line in file:
+                parts = line.split()
+                if len(parts) < 3:
+                    break
+                if parts[0] == "**":
+                    # Infeasible rows are flagged; the layout is otherwise the same
+                    parts = parts[1:]
+                if parts[1][0] == "X":
+                    values[int(parts[1][1:])] = float(parts[2])
+        status, optimal = CBC_STATUS.get(header[0] if header else "", ("unknown", False))
+        # "Stopped on time - objective value X" carries a plan; other stopped lines do not
+        if status == "stopped" and (len(header) < 6 or header[4] != "objective"):
+            status = "not_solved"
+        objective = float(header[-1]) if status in ("optimal", "stopped") else None
+        return status, optimal, objective, values
+
+    def write_start(self, path, values):
+        """
+        Writes a value for every column in the solution file layout CBC reads back with -mips.
+        """
+        with open(path, "w") as file:
+            file.write("Stopped on time - objective value 0\n")
+            file.writelines(f"{j:>7} X{j:07d} {value:>15} 0\n" for j, value in enumerate(values.tolist()))
+
+    def solve(self, time_limit=None, msg=False, on_incumbent=None, timings=None, solve_info=None,
+              preprocess=True, start=None):
+        """
+        Solves the model with the CBC binary that ships with PuLP. preprocess=False turns CBC's
+        integer preprocessing off; start, an array of column values, is a feasible plan for CBC to
+        start from. Returns
+        {"status", "optimal", "objective", "values"}; status is "optimal", "stopped" (time limit
+        hit with a plan found), "not_solved", "infeasible" or "unbounded". on_incumbent, timings
+        ("write" and "solve") and solve_info ("variables", "constraints") work as in patterns.run_cbc.
+        """
+        from pulp import PULP_CBC_CMD
+
+        if solve_info is not None:
+            solve_info["variables"] = self.num_columns
+            solve_info["constraints"] = self.num_rows
+        workdir = tempfile.mkdtemp(prefix="raid-model-")
+        mps_path = os.path.join(workdir, "model.mps")
+        solution_path = os.path.join(workdir, "model.sol")
+        start_path = os.path.join(workdir, "start.sol")
+        try:
+            started = time.perf_counter()
+            self.write_mps(mps_path)
+            started = add_timing(timings, "write", started)
+            args = [PULP_CBC_CMD().path, mps_path]
+            if time_limit is not None:
+                # Wall-clock seconds, like every other time limit here, rather than CBC's default CPU time
+                args += ["-timeMode", "elapsed", "-sec", str(time_limit)]
+            if not preprocess:
+                args += ["-preprocess", "off"]
+            if start is not None:
+                self.write_start(start_path, start)
+                args += ["-mips", start_path]
+            args += ["-solve", "-printingOptions", "all", "-solution", solution_path]
+            if on_incumbent is not None:
+                with follow_cbc_log(on_incumbent) as log_path:
+                    with open(log_path, "w") as log:
+                        returncode = subprocess.call(args, stdout=log, stderr=log, stdin=subprocess.DEVNULL)
+            else:
+                output = None if msg else subprocess.DEVNULL
+                returncode = subprocess.call(args, stdout=output, stderr=output, stdin=subprocess.DEVNULL)
+            if returncode != 0 or not os.path.exists(solution_path):
+                raise RuntimeError("CBC failed to solve the model.")
+            status, optimal, objective, values = self.read_solution(solution_path)
+            add_timing(timings, "solve", started)
+        finally:
+            for path in (mps_path, solution_path, start_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            os.rmdir(workdir)
+        return {"status": status, "optimal": optimal, "objective": objective, "values": values}
+
+
+def per_instance_model(selected_structures, explosive_dict, explosives, structures):
+    """
+    The per-instance raid model: owned and crafted counts of every explosive on every structure
+    instance, at most the owned amount of each explosive used in total, and every instance dealt
+    between its HP and its HP plus the largest single hit.
+    Returns (model, owned columns, crafted columns, start), the column arrays shaped
+    (instances, explosives) with instances in the order of selected_structures, and start the greedy
+    plan of anytime.greedy_solution as column values.
+    """
+    matrices = get_matrices(explosives, structures)
+    explosive_list = list(explosive_dict.keys())
+    struct_list = list(selected_structures)
+    rows = [matrices.explosive_index[exp] for exp in explosive_list]
+    struct_columns = [matrices.structure_index[struct] for struct in struct_list]
+    # Structure of every instance, then per-instance damage of every explosive
+    instance_struct = np.repeat(np.arange(len(struct_list)), [selected_structures[s] for s in struct_list])
+    damage = matrices.damage[np.ix_(rows, struct_columns)].T[instance_struct]
+    instances, count = damage.shape
+
+    sulfur = matrices.sulfur[rows].astype(np.float64)
+
+    model = ColumnarModel("Rust_Raid_Optimizer")
+    owned = model.add_columns(instances * count).reshape(instances, count)
+    crafted = model.add_columns(instances * count, cost=np.tile(sulfur, instances)).reshape(instances, count)
+    limits = model.add_rows("L", [explosive_dict[exp] for exp in explosive_list])
+    model.add_entries(limits[np.newaxis, :], owned, 1.0)
+    # Separate lower and upper rows: CBC takes about 2.5x as long on the same bounds as one ranged row
+    hp = matrices.hp[struct_columns][instance_struct]
+    for sense, rhs in (("G", hp), ("L", hp + damage.max(axis=1))):
+        kill = model.add_rows(sense, rhs)[:, np.newaxis]
+        model.add_entries(kill, owned, damage)
+        model.add_entries(kill, crafted, damage)
+
+    # anytime.greedy_solution's plan, instance by instance: its kill patterns never overshoot by a whole hit
+    solution = greedy_solution(selected_structures, explosive_dict, explosives, structures)
+    instance_usage = expand_instances(selected_structures, explosive_list, solution)
+    start = np.zeros(model.num_columns, dtype=np.int64)
+    i = 0
+    for struct in struct_list:
+        for usage in instance_usage[struct]:
+            for j, exp in enumerate(explosive_list):
+                if exp in usage:
+                    start[owned[i, j]] = usage[exp]["owned"]
+                    start[crafted[i, j]] = usage[exp]["crafted"]
+            i += 1
+    return model, owned, crafted, start
+
+
+def solve_per_instance(selected_structures, explosive_dict, explosives, structures, time_limit=None,
+                       on_incumbent=None, timings=None, solve_info=None):
+    """
+    Builds and solves per_instance_model. Returns (structure_instance_usage, sulfur_cost, optimal)
+    with the per-instance breakdown RaidEngine.summarize_instance_usage expects.
+    Raises patterns.NoPlanFound when CBC finds no plan.
+    """
+    started = time.perf_counter()
+    model, owned, crafted, start = per_instance_model(selected_structures, explosive_dict, explosives, structures)
+    add_timing(timings, "build", started)
+
+    # CBC's integer preprocessing mishandles the kill rows with fractional damage: it has called
+    # feasible raids infeasible (750 HP at 15.0075 per hit) and returned 3 rockets as "optimal" for
+    # 3 chain-link fences that 6 satchels destroy for less. No -preprocess mode avoids this, so it is
+    # off, and the greedy start plan keeps CBC from running out of time with no plan, or a poor one.
+    result = model.solve(time_limit, on_incumbent=on_incumbent, timings=timings, solve_info=solve_info,
+                         preprocess=False, start=start)
+    started = time.perf_counter()
+    if result["status"] not in ("optimal", "stopped"):
+        raise NoPlanFound("No feasible raid plan found for the selected explosives.")
+    values = np.rint(result["values"]).astype(np.int64)
+    owned_used, crafted_used = values[owned].tolist(), values[crafted].tolist()
+
+    explosive_list = list(explosive_dict.keys())
+    structure_instance_usage = {}
+    k = 0
+    for struct, qty in selected_structures.items():
+        structure_instance_usage[struct] = []
+        for _ in range(qty):
+            structure_instance_usage[struct].append({
+                exp: {"total": owned_k + crafted_k, "owned": owned_k, "crafted": crafted_k}
+                for exp, owned_k, crafted_k in zip(explosive_list, owned_used[k], crafted_used[k])
+                if owned_k + crafted_k > 0
+            })
+            k += 1
+    add_timing(timings, "extract", started)
+    return structure_instance_usage, int(round(result["objective"])), result["optimal"]
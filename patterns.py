@@ -0,0 +1,726 @@
+######################################
+# Kill patterns
+# A kill pattern is a combination of explosives that destroys a single
+# structure. Every instance of a structure type is identical, so the
+# optimizer only needs to decide how many times each pattern is used per
+# type instead of modelling every instance separately.
+######################################
+
+import contextlib
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from matrices import get_matrices
+
+# Hard cap on owned-explosive combinations explored for one structure type.
+# Beyond this the patterns are generated from prices instead (solve_by_type_generated).
+PATTERN_LIMIT = 20000
+# Pricing rounds of solve_by_type_generated before it settles for the patterns it has
+GENERATION_ROUNDS = 200
+
+
+# CBC log line printed every time it finds a better integer solution
+INCUMBENT_LINE = re.compile(r"Integer solution of (\S+) found")
+
+
+class PatternLimitExceeded(ValueError):
+    pass
+
+
+class NoPlanFound(ValueError):
+    """
+    CBC found no plan: the raid is infeasible or the time limit ran out first.
+    """
+
+
+def add_timing(timings, phase, started):
+    """
+    Adds the seconds since `started` (a time.perf_counter() value) to timings[phase] when
+    timings is a dict, and returns the current perf_counter so phases can be chained.
+    """
+    now = time.perf_counter()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + now - started
+    return now
+
+
+def scaled_options(structure, explosive_list, matrices):
+    """
+    Returns (name, scaled_damage, sulfur) for every explosive that can damage the structure,
+    ordered from the best to the worst sulfur-per-damage ratio.
+    """
+    column = matrices.structure_index[structure]
+    options = []
+    for exp in explosive_list:
+        row = matrices.explosive_index[exp]
+        damage = int(matrices.scaled_damage[row, column])
+        if damage > 0:
+            options.append((exp, damage, int(matrices.sulfur[row])))
+    options.sort(key=lambda option: option[2] / option[1])
+    return options
+
+
+def cheapest_cover(residual, options):
+    """
+    Branch and bound search for the cheapest crafted combination dealing at least
+    `residual` scaled damage. Returns (sulfur, {explosive: count}).
+    Results are memoized, so the returned dict must not be modified.
+    """
+    return _cheapest_cover(residual, tuple(options))
+
+
+@lru_cache(maxsize=65536)
+def _cheapest_cover(residual, options):
+    if residual <= 0:
+        return 0, {}
+    best = [None, None]
+    counts = [0] * len(options)
+
+    def search(j, remaining, cost):
+        if remaining <= 0:
+            if best[0] is None or cost < best[0]:
+                best[0] = cost
+                best[1] = {options[k][0]: counts[k] for k in range(len(options)) if counts[k]}
+            return
+        if j == len(options):
+            return
+        _, damage, sulfur = options[j]
+        # Options are sorted by ratio, so the current one bounds everything left
+        if best[0] is not None and cost * damage + remaining * sulfur >= best[0] * damage:
+            return
+        most = -(-remaining // damage)
+        if j == len(options) - 1:
+            counts[j] = most
+            search(j + 1, remaining - most * damage, cost + most * sulfur)
+            counts[j] = 0
+            return
+        for k in range(most, -1, -1):
+            counts[j] = k
+            search(j + 1, remaining - k * damage, cost + k * sulfur)
+        counts[j] = 0
+
+    search(0, residual, 0)
+    if best[0] is None:
+        raise ValueError("Selected explosives cannot destroy this structure.")
+    return best[0], best[1]
+
+
+def clear_cover_cache():
+    """
+    Drops the memoized cheapest_cover results, e.g. to time cold solves.
+    """
+    _cheapest_cover.cache_clear()
+
+
+def cheapest_covers(residual, options, k):
+    """
+    Like cheapest_cover, but returns up to k distinct minimal combinations as a list of
+    (sulfur, {explosive: count}) sorted from cheapest to most expensive.
+    """
+    if residual <= 0:
+        return [(0, {})]
+    found = []
+    counts = [0] * len(options)
+
+    def record(cost, dealt):
+        # Only keep minimal combinations: dropping any single explosive must leave the structure standing
+        if any(counts[j] and dealt - options[j][1] >= residual for j in range(len(options))):
+            return
+        found.append((cost, {options[j][0]: counts[j] for j in range(len(options)) if counts[j]}))
+        found.sort(key=lambda item: item[0])
+        del found[k:]
+
+    def search(j, remaining, cost):
+        if remaining <= 0:
+            record(cost, residual - remaining)
+            return
+        if j == len(options):
+            return
+        _, damage, sulfur = options[j]
+        if len(found) == k and cost * damage + remaining * sulfur >= found[-1][0] * damage:
+            return
+        most = -(-remaining // damage)
+        if j == len(options) - 1:
+            counts[j] = most
+            search(j + 1, remaining - most * damage, cost + most * sulfur)
+            counts[j] = 0
+            return
+        for n in range(most, -1, -1):
+            counts[j] = n
+            search(j + 1, remaining - n * damage, cost + n * sulfur)
+        counts[j] = 0
+
+    search(0, residual, 0)
+    return found
+
+
+def priced_cover(residual, options, prices):
+    """
+    Like cheapest_cover, but every explosive costs prices[explosive] instead of its sulfur.
+    Not memoized, since the prices change on every call.
+    """
+    priced = sorted(((exp, damage, prices[exp]) for exp, damage, _ in options), key=lambda o: o[2] / o[1])
+    cost, pattern = _cheapest_cover.__wrapped__(residual, tuple(priced))
+    return cost, dict(pattern)
+
+
+def priced_covers(residual, options, prices, threshold, limit):
+    """
+    Every minimal combination dealing at least `residual` scaled damage that costs at most
+    threshold at prices ({explosive: price}), as {explosive: count} dicts. Returns None when
+    there are more than limit of them.
+    """
+    priced = sorted(((exp, damage, prices[exp]) for exp, damage, _ in options), key=lambda o: o[2] / o[1])
+    found = []
+    counts = [0] * len(priced)
+
+    def search(j, remaining, cost):
+        # Returns False once the limit is passed, to stop the whole search
+        if remaining <= 0:
+            dealt = residual - remaining
+            if not any(counts[i] and dealt - priced[i][1] >= residual for i in range(len(priced))):
+                found.append({priced[i][0]: counts[i] for i in range(len(priced)) if counts[i]})
+            return len(found) <= limit
+        if j == len(priced):
+            return True
+        _, damage, price = priced[j]
+        if cost * damage + remaining * price > threshold * damage:
+            return True
+        most = -(-remaining // damage)
+        for n in ([most] if j == len(priced) - 1 else range(most, -1, -1)):
+            counts[j] = n
+            if not search(j + 1, remaining - n * damage, cost + n * price):
+                return False
+        counts[j] = 0
+        return True
+
+    return found if search(0, residual, 0.0) else None
+
+
+def kill_pattern_table(structure, explosive_dict, explosives, structures, limit=PATTERN_LIMIT):
+    """
+    Builds the kill patterns for one structure type.
+    Each pattern spends some owned explosives and fills the remaining HP with the
+    cheapest crafted combination. Patterns that use more owned explosives without
+    saving sulfur are dropped. Returns a list of dicts, cheapest first, with the
+    whole "pattern", the "owned" explosives it spends and the crafted "sulfur" cost.
+    """
+    matrices = get_matrices(explosives, structures)
+    hp = int(matrices.scaled_hp[matrices.structure_index[structure]])
+    options = scaled_options(structure, list(explosive_dict.keys()), matrices)
+    if not options:
+        raise ValueError(f"Selected explosives cannot destroy '{structure}'.")
+    owned = [(exp, damage) for exp, damage, _ in options if explosive_dict.get(exp, 0) > 0]
+
+    combinations = 1
+    for exp, damage in owned:
+        combinations *= min(explosive_dict[exp], -(-hp // damage)) + 1
+    if combinations > limit:
+        raise PatternLimitExceeded(f"Too many owned-explosive combinations for '{structure}'.")
+
+    # Enumerate owned usage vectors, keeping only minimal ones when they destroy the structure alone
+    candidates = []
+    used = [0] * len(owned)
+
+    def enumerate_owned(j, dealt):
+        if dealt >= hp or j == len(owned):
+            if dealt >= hp and any(used[k] and dealt - owned[k][1] >= hp for k in range(len(owned))):
+                return
+            candidates.append((tuple(used), dealt))
+            return
+        exp, damage = owned[j]
+        most = min(explosive_dict[exp], -(-(hp - dealt) // damage))
+        for k in range(most + 1):
+            used[j] = k
+            enumerate_owned(j + 1, dealt + k * damage)
+        used[j] = 0
+
+    enumerate_owned(0, 0)
+
+    cover_cache = {}
+    sulfur_by_vector = {}
+    for vector, dealt in candidates:
+        residual = hp - dealt
+        if residual not in cover_cache:
+            cover_cache[residual] = cheapest_cover(residual, options)
+        sulfur_by_vector[vector] = cover_cache[residual][0]
+
+    # Sulfur never rises as more owned explosives are spent, so a pattern is dominated exactly
+    # when dropping one owned explosive from it costs no extra sulfur
+    kept = []
+    for vector, dealt in candidates:
+        sulfur = sulfur_by_vector[vector]
+        dominated = False
+        for k in range(len(owned)):
+            if vector[k]:
+                smaller = vector[:k] + (vector[k] - 1,) + vector[k + 1:]
+                if sulfur_by_vector.get(smaller, sulfur + 1) <= sulfur:
+                    dominated = True
+                    break
+        if not dominated:
+            kept.append((sulfur, sum(vector), vector, cover_cache[hp - dealt][1]))
+    kept.sort(key=lambda item: (item[0], item[1]))
+
+    table = []
+    for sulfur, _, vector, crafted in kept:
+        pattern = dict(crafted)
+        spent = {}
+        for (exp, _), count in zip(owned, vector):
+            if count:
+                pattern[exp] = pattern.get(exp, 0) + count
+                spent[exp] = count
+        table.append({
+            "pattern": {exp: pattern[exp] for exp in explosive_dict if pattern.get(exp)},
+            "owned": spent,
+            "sulfur": sulfur,
+        })
+    return table
+
+
+def kill_pattern_alternatives(structure, explosive_dict, explosives, structures, k, limit=PATTERN_LIMIT):
+    """
+    Like kill_pattern_table, but every owned-explosive combination is completed with up to k
+    different minimal crafted combinations (cheapest_covers) instead of only the cheapest one,
+    so plans that avoid an explosive are available. Rows are sorted cheapest first.
+    """
+    matrices = get_matrices(explosives, structures)
+    column = matrices.structure_index[structure]
+    hp = int(matrices.scaled_hp[column])
+    options = scaled_options(structure, list(explosive_dict.keys()), matrices)
+    covers = {}
+    rows = []
+    for row in kill_pattern_table(structure, explosive_dict, explosives, structures, limit):
+        dealt = sum(
+            count * int(matrices.scaled_damage[matrices.explosive_index[exp], column])
+            for exp, count in row["owned"].items()
+        )
+        residual = hp - dealt
+        if residual not in covers:
+            covers[residual] = cheapest_covers(residual, options, k)
+        for sulfur, crafted in covers[residual]:
+            pattern = dict(crafted)
+            for exp, count in row["owned"].items():
+                pattern[exp] = pattern.get(exp, 0) + count
+            rows.append({
+                "pattern": {exp: pattern[exp] for exp in explosive_dict if pattern.get(exp)},
+                "owned": row["owned"],
+                "sulfur": sulfur,
+            })
+    rows.sort(key=lambda row: (row["sulfur"], sum(row["pattern"].values())))
+    return rows
+
+
+def kill_patterns(structure, explosive_dict, explosives, structures, limit=PATTERN_LIMIT):
+    """
+    Returns the kill patterns for one structure type as {explosive: count} dicts, cheapest first.
+    """
+    table = kill_pattern_table(structure, explosive_dict, explosives, structures, limit)
+    return [row["pattern"] for row in table]
+
+
+def run_cbc(prob, time_limit=None, msg=False, on_incumbent=None, timings=None, solve_info=None, warm_start=False):
+    """
+    Solves prob with CBC. When on_incumbent is given, CBC logs to a temporary file that is
+    followed while it runs, and on_incumbent(sulfur) is called for every improved solution.
+    timings, if given, gets the seconds spent writing the MPS file under "write" and the rest
+    of the solve (CBC subprocess and reading its solution) under "solve". solve_info, if given,
+    gets the model's "variables" and "constraints" counts. warm_start passes the variables'
+    current values to CBC as its starting solution.
+    """
+    if solve_info is not None:
+        solve_info["variables"] = prob.numVariables()
+        solve_info["constraints"] = prob.numConstraints()
+    started = time.perf_counter()
+    if timings is not None:
+        write_mps = prob.writeMPS
+
+        def timed_write_mps(*args, **kwargs):
+            write_started = time.perf_counter()
+            try:
+                return write_mps(*args, **kwargs)
+            finally:
+                add_timing(timings, "write", write_started)
+
+        prob.writeMPS = timed_write_mps
+        write_before = timings.get("write", 0.0)
+    try:
+        _solve_cbc(prob, time_limit, msg, on_incumbent, warm_start)
+    finally:
+        if timings is not None:
+            del prob.writeMPS
+            written = timings.get("write", 0.0) - write_before
+            timings["solve"] = timings.get("solve", 0.0) + time.perf_counter() - started - written
+
+
+def _solve_cbc(prob, time_limit, msg, on_incumbent, warm_start):
+    from pulp import PULP_CBC_CMD
+
+    if on_incumbent is None:
+        prob.solve(PULP_CBC_CMD(msg=msg, timeLimit=time_limit, warmStart=warm_start))
+        return
+
+    with follow_cbc_log(on_incumbent) as log_path:
+        prob.solve(PULP_CBC_CMD(msg=False, timeLimit=time_limit, logPath=log_path, warmStart=warm_start))
+
+
+@contextlib.contextmanager
+def follow_cbc_log(on_incumbent):
+    """
+    Yields a temporary path for CBC's log. The log is followed while the block runs and
+    on_incumbent(sulfur) is called for every improved solution CBC reports in it.
+    """
+    handle, log_path = tempfile.mkstemp(suffix="-cbc.log")
+    os.close(handle)
+    finished = threading.Event()
+
+    def follow_log():
+        with open(log_path) as log:
+            while True:
+                line = log.readline()
+                if line:
+                    match = INCUMBENT_LINE.search(line)
+                    if match:
+                        on_incumbent(int(round(float(match.group(1)))))
+                elif finished.is_set():
+                    return
+                else:
+                    time.sleep(0.05)
+
+    follower = threading.Thread(target=follow_log, daemon=True)
+    follower.start()
+    try:
+        yield log_path
+    finally:
+        finished.set()
+        follower.join()
+        os.remove(log_path)
+
+
+def solve_by_type(selected_structures, explosive_dict, explosives, structures, time_limit=None, on_incumbent=None,
+                  timings=None, solve_info=None):
+    """
+    Solves the raid with one integer variable per (structure type, kill pattern).
+    Model size depends on the structure types and owned inventory, not on quantities.
+    time_limit (seconds) is passed to CBC; "optimal" in the result is False when CBC stopped
+    at the limit with only the best plan found so far. on_incumbent(sulfur) is called with the
+    crafted-only cost first and then with every better solution CBC finds.
+    timings, if given, gets the seconds spent building, writing, solving and reading back the
+    model added under "build", "write", "solve" and "extract"; solve_info gets the model size.
+    Returns a dict with the pattern counts per structure, owned explosives used and sulfur cost.
+    """
+    # Deferred so that callers that never reach CBC (table and DP backends) never load PuLP
+    from pulp import LpProblem, LpMinimize, LpVariable, LpStatusOptimal, LpSolutionOptimal, lpSum, value
+
+    started = time.perf_counter()
+    explosive_list = list(explosive_dict.keys())
+    try:
+        tables = {
+            struct: kill_pattern_table(struct, explosive_dict, explosives, structures)
+            for struct in selected_structures
+        }
+    except PatternLimitExceeded:
+        return solve_by_type_generated(
+            selected_structures, explosive_dict, explosives, structures, time_limit, on_incumbent, timings, solve_info
+        )
+    patterns = {struct: [row["pattern"] for row in table] for struct, table in tables.items()}
+    if on_incumbent is not None:
+        # Crafting everything with the cheapest crafted-only pattern is always a valid plan
+        on_incumbent(sum(
+            qty * next(row["sulfur"] for row in tables[struct] if not row["owned"])
+            for struct, qty in selected_structures.items()
+        ))
+
+    prob = LpProblem("Rust_Raid_Optimizer_By_Type", LpMinimize)
+    pattern_vars = {}
+    for struct, qty in selected_structures.items():
+        for p in range(len(patterns[struct])):
+            pattern_vars[(struct, p)] = LpVariable(f"pattern_{struct}_{p}", 0, qty, cat='Integer')
+        # Every instance is destroyed by exactly one pattern
+        prob += lpSum(pattern_vars[(struct, p)] for p in range(len(patterns[struct]))) == qty, f"{struct}_count"
+
+    used = {}
+    owned_vars = {}
+    for exp in explosive_list:
+        used[exp] = lpSum(
+            pattern_vars[(struct, p)] * pattern[exp]
+            for struct in selected_structures
+            for p, pattern in enumerate(patterns[struct])
+            if exp in pattern
+        )
+        owned_vars[exp] = LpVariable(f"owned_{exp}", 0, explosive_dict[exp], cat='Integer')
+        prob += owned_vars[exp] <= used[exp], f"{exp}_owned_used"
+
+    # Objective: minimize sulfur cost (only crafted explosives cost sulfur)
+    prob += lpSum(
+        (used[exp] - owned_vars[exp]) * explosives[exp]['raw_materials']['sulfur']
+        for exp in explosive_list
+    ), "Total_Sulfur_Cost"
+    started = add_timing(timings, "build", started)
+
+    run_cbc(prob, time_limit, on_incumbent=on_incumbent, timings=timings, solve_info=solve_info)
+    started = time.perf_counter()
+    if prob.status != LpStatusOptimal:
+        raise NoPlanFound("No feasible raid plan found for the selected explosives.")
+
+    pattern_counts = {}
+    for struct in selected_structures:
+        pattern_counts[struct] = []
+        for p, pattern in enumerate(patterns[struct]):
+            count = int(round(pattern_vars[(struct, p)].varValue or 0))
+            if count > 0:
+                pattern_counts[struct].append((pattern, count))
+    owned_used = {exp: int(round(owned_vars[exp].varValue or 0)) for exp in explosive_list}
+    solution = {
+        "pattern_counts": pattern_counts,
+        "owned_used": owned_used,
+        "sulfur_cost": int(round(value(prob.objective) or 0)),
+        "optimal": prob.sol_status == LpSolutionOptimal,
+    }
+    add_timing(timings, "extract", started)
+    return solution
+
+
+def pattern_model(selected_structures, explosive_dict, columns, sulfur, category):
+    """
+    The solve_by_type model over the given patterns ({struct: [{explosive: count}]}), with
+    "Integer" or "Continuous" pattern counts. Returns (prob, pattern_vars, owned_vars, rows), rows
+    holding the constraints by name for reading their duals.
+    """
+    from pulp import LpProblem, LpMinimize, LpVariable, lpSum
+
+    prob = LpProblem("Rust_Raid_Optimizer_Generated", LpMinimize)
+    pattern_vars = {}
+    rows = {}
+    for struct, qty in selected_structures.items():
+        for p in range(len(columns[struct])):
+            pattern_vars[(struct, p)] = LpVariable(f"pattern_{struct}_{p}", 0, qty, cat=category)
+        rows[f"{struct}_count"] = lpSum(pattern_vars[(struct, p)] for p in range(len(columns[struct]))) == qty
+    used = {}
+    owned_vars = {}
+    for exp in explosive_dict:
+        used[exp] = lpSum(
+            pattern_vars[(struct, p)] * pattern[exp]
+            for struct in selected_structures
+            for p, pattern in enumerate(columns[struct])
+            if exp in pattern
+        )
+        owned_vars[exp] = LpVariable(f"owned_{exp}", 0, explosive_dict[exp])
+        rows[f"{exp}_owned_used"] = owned_vars[exp] - used[exp] <= 0
+    for name, row in rows.items():
+        prob += row, name
+    prob += lpSum((used[exp] - owned_vars[exp]) * sulfur[exp] for exp in explosive_dict), "Total_Sulfur_Cost"
+    return prob, pattern_vars, owned_vars, rows
+
+
+def generate_patterns(selected_structures, explosive_dict, explosives, structures, deadline=None, timings=None,
+                      solve_info=None):
+    """
+    Column generation for the pattern LP: starting from the cheapest crafted pattern and each
+    explosive on its own, the LP over the patterns found so far puts a price on every explosive,
+    and the pattern that is cheapest at those prices (priced_cover) joins while it is cheaper than
+    what the LP pays for an instance of its structure. Stops at GENERATION_ROUNDS or the
+    perf_counter deadline. Returns a dict with the "columns" per structure, the last LP's
+    "lower_bound", explosive "prices", per-structure "instance_prices" and pattern "counts"
+    ({(struct, pattern index): value}), whether it "converged", and the "hp", "options" and
+    "sulfur" the patterns were priced with.
+    Any explosive prices in [0, sulfur] give a lower bound for a raid with these owned explosives:
+    the cheapest patterns at those prices, one per instance, less the price of the owned stock.
+    """
+    from pulp import LpStatusOptimal, value
+
+    started = time.perf_counter()
+    matrices = get_matrices(explosives, structures)
+    explosive_list = list(explosive_dict.keys())
+    sulfur = {exp: int(matrices.sulfur[matrices.explosive_index[exp]]) for exp in explosive_list}
+    hp = {}
+    options = {}
+    columns = {}
+    for struct in selected_structures:
+        hp[struct] = int(matrices.scaled_hp[matrices.structure_index[struct]])
+        options[struct] = scaled_options(struct, explosive_list, matrices)
+        if not options[struct]:
+            raise ValueError(f"Selected explosives cannot destroy '{struct}'.")
+        # The cheapest crafted pattern, and each explosive on its own so every owned stock can be priced
+        columns[struct] = [priced_cover(hp[struct], options[struct], sulfur)[1]]
+        for exp, damage, _ in options[struct]:
+            single = {exp: -(-hp[struct] // damage)}
+            if single not in columns[struct]:
+                columns[struct].append(single)
+
+    lower_bound = 0
+    prices = dict(sulfur)
+    instance_prices = {}
+    counts = {}
+    converged = False
+    for _ in range(GENERATION_ROUNDS):
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        prob, pattern_vars, _, rows = pattern_model(selected_structures, explosive_dict, columns, sulfur, "Continuous")
+        started = add_timing(timings, "build", started)
+        run_cbc(prob, timings=timings, solve_info=solve_info)
+        started = time.perf_counter()
+        if prob.status != LpStatusOptimal:
+            raise NoPlanFound("No feasible raid plan found for the selected explosives.")
+        lower_bound = value(prob.objective)
+        counts = {key: var.varValue or 0 for key, var in pattern_vars.items()}
+        prices = {
+            exp: min(max(sulfur[exp] + rows[f"{exp}_owned_used"].pi, 0.0), sulfur[exp])
+            for exp in explosive_list
+        }
+        instance_prices = {struct: rows[f"{struct}_count"].pi for struct in selected_structures}
+        added = False
+        for struct in selected_structures:
+            cost, pattern = priced_cover(hp[struct], options[struct], prices)
+            if cost < instance_prices[struct] - 1e-6 and pattern not in columns[struct]:
+                columns[struct].append(pattern)
+                added = True
+        if not added:
+            converged = True
+            break
+    add_timing(timings, "build", started)
+    return {
+        "columns": columns,
+        "lower_bound": lower_bound,
+        "prices": prices,
+        "instance_prices": instance_prices,
+        "counts": counts,
+        "converged": converged,
+        "hp": hp,
+        "options": options,
+        "sulfur": sulfur,
+    }
+
+
+def solve_by_type_generated(selected_structures, explosive_dict, explosives, structures, time_limit=None,
+                            on_incumbent=None, timings=None, solve_info=None):
+    """
+    solve_by_type for owned inventories with too many combinations to list as kill patterns.
+    The patterns are generated instead (generate_patterns) and the integer model over them gives
+    a plan; then every pattern whose reduced cost is within the plan's distance from the LP bound
+    joins too, and no better plan can use any other pattern, so the second integer solve is exact.
+    If there are more than PATTERN_LIMIT of them the first plan is kept, optimal only when it
+    meets the LP bound. A converged LP with whole pattern counts is the plan, with no integer
+    solve at all. Returns the same dict as solve_by_type.
+    """
+    from pulp import LpStatusOptimal, LpSolutionOptimal, value
+
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    explosive_list = list(explosive_dict.keys())
+    generated = generate_patterns(
+        selected_structures, explosive_dict, explosives, structures, deadline, timings, solve_info
+    )
+    columns, sulfur = generated["columns"], generated["sulfur"]
+    hp, options = generated["hp"], generated["options"]
+    lower_bound, converged = generated["lower_bound"], generated["converged"]
+    prices, instance_prices = generated["prices"], generated["instance_prices"]
+    started = time.perf_counter()
+
+    def solve_integer():
+        nonlocal started
+        prob, pattern_vars, _, _ = pattern_model(selected_structures, explosive_dict, columns, sulfur, "Integer")
+        started = add_timing(timings, "build", started)
+        remaining = None if deadline is None else max(deadline - time.perf_counter(), 1)
+        run_cbc(prob, remaining, timings=timings, solve_info=solve_info)
+        started = time.perf_counter()
+        if prob.status != LpStatusOptimal:
+            raise NoPlanFound("No feasible raid plan found for the selected explosives.")
+        if on_incumbent is not None:
+            on_incumbent(int(round(value(prob.objective) or 0)))
+        return prob, pattern_vars
+
+    counts = generated["counts"]
+    if converged and all(abs(count - round(count)) < 1e-6 for count in counts.values()):
+        if on_incumbent is not None:
+            on_incumbent(int(round(lower_bound)))
+        optimal = True
+    else:
+        prob, pattern_vars = solve_integer()
+        sulfur_cost = value(prob.objective) or 0
+        optimal = prob.sol_status == LpSolutionOptimal and converged and sulfur_cost <= math.ceil(lower_bound - 1e-6)
+        if converged and not optimal and prob.sol_status == LpSolutionOptimal:
+            gap = sulfur_cost - lower_bound
+            near = {
+                struct: priced_covers(hp[struct], options[struct], prices, instance_prices[struct] + gap + 1e-6,
+                                      PATTERN_LIMIT)
+                for struct in selected_structures
+            }
+            if all(found is not None for found in near.values()) and \
+                    sum(len(found) for found in near.values()) <= PATTERN_LIMIT:
+                for struct, found in near.items():
+                    columns[struct] += [pattern for pattern in found if pattern not in columns[struct]]
+                prob, pattern_vars = solve_integer()
+                optimal = prob.sol_status == LpSolutionOptimal
+        counts = {key: var.varValue or 0 for key, var in pattern_vars.items()}
+
+    pattern_counts = {}
+    for struct in selected_structures:
+        pattern_counts[struct] = []
+        for p, pattern in enumerate(columns[struct]):
+            count = int(round(counts[(struct, p)]))
+            if count > 0:
+                pattern_counts[struct].append(({exp: pattern[exp] for exp in explosive_list if exp in pattern}, count))
+    totals = {exp: 0 for exp in explosive_list}
+    for struct in selected_structures:
+        for pattern, count in pattern_counts[struct]:
+            for exp, n in pattern.items():
+                totals[exp] += n * count
+    owned_used = {exp: min(explosive_dict[exp], totals[exp]) for exp in explosive_list}
+    solution = {
+        "pattern_counts": pattern_counts,
+        "owned_used": owned_used,
+        "sulfur_cost": sum((totals[exp] - owned_used[exp]) * sulfur[exp] for exp in explosive_list),
+        "optimal": optimal,
+    }
+    add_timing(timings, "extract", started)
+    return solution
+
+
+def expand_instances(selected_structures, explosive_list, solution):
+    """
+    Expands pattern counts into the per-instance breakdown used for display.
+    Owned explosives are handed out to instances in order before anything is crafted.
+    """
+    remaining_owned = dict(solution["owned_used"])
+    structure_instance_usage = {}
+    for struct in selected_structures:
+        instances = []
+        for pattern, count in solution["pattern_counts"][struct]:
+            for _ in range(count):
+                instance_usage = {}
+                for exp in explosive_list:
+                    total_used = pattern.get(exp, 0)
+                    if total_used > 0:
+                        used_owned = min(remaining_owned.get(exp, 0), total_used)
+                        remaining_owned[exp] = remaining_owned.get(exp, 0) - used_owned
+                        instance_usage[exp] = {
+                            "total": total_used,
+                            "owned": used_owned,
+                            "crafted": total_used - used_owned
+                        }
+                instances.append(instance_usage)
+        structure_instance_usage[struct] = instances
+    return structure_instance_usage
+
+
+def group_instances(structure_instance_usage):
+    """
+    Collapses identical per-instance plans, in order of first appearance, into
+    {struct: [{"count": n, "first": number of the first such instance (from 1), "usage": {...}}]}.
+    The groups stay few however many instances there are, so they are what pages render.
+    """
+    groups = {}
+    for struct, instances in structure_instance_usage.items():
+        groups[struct] = []
+        seen = {}
+        for number, usage in enumerate(instances, 1):
+            key = tuple((exp, detail["total"], detail["owned"]) for exp, detail in usage.items())
+            group = seen.get(key)
+            if group is None:
+                group = seen[key] = {"count": 0, "first": number, "usage": usage}
+                groups[struct].append(group)
+            group["count"] += 1
+    return groups
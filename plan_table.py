@@ -0,0 +1,141 @@
+######################################
+# Precomputed plan table
+# For every structure and every subset of explosives, stores the cheapest
+# crafted plans (no owned inventory) in a compact binary file next to the
+# JSON data. The file is keyed by a hash of the game data and rebuilt when
+# the data changes, so lookups never re-run the search.
+######################################
+
+import hashlib
+import json
+import os
+import struct
+from matrices import get_matrices
+from patterns import scaled_options, cheapest_covers
+
+TOP_K = 5
+TABLE_MAGIC = b"RRPT"
+TABLE_FORMAT_VERSION = 1
+TABLE_FILENAME = "plan_table.bin"
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# magic, format version, top-k, length of the JSON header that follows
+_PREAMBLE = struct.Struct("<4sHHI")
+
+
+def data_version(explosives, structures):
+    """
+    Returns a content hash of the game data, used to tell stale tables and caches apart.
+    """
+    payload = json.dumps([explosives, structures], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlanTable:
+    """
+    Read-only view over a packed plan table.
+    Each (structure, explosive subset) record is a plan count followed by TOP_K slots of
+    (sulfur, count per explosive), so a lookup is one offset computation and one unpack.
+    """
+
+    def __init__(self, blob):
+        magic, format_version, k, header_size = _PREAMBLE.unpack_from(blob, 0)
+        if magic != TABLE_MAGIC or format_version != TABLE_FORMAT_VERSION:
+            raise ValueError("Not a plan table file.")
+        header = json.loads(blob[_PREAMBLE.size:_PREAMBLE.size + header_size].decode("utf-8"))
+        self.blob = blob
+        self.k = k
+        self.version = header["version"]
+        self.explosive_names = header["explosives"]
+        self.structure_names = header["structures"]
+        self.explosive_index = {name: i for i, name in enumerate(self.explosive_names)}
+        self.structure_index = {name: i for i, name in enumerate(self.structure_names)}
+        self.plan_format = struct.Struct(f"<I{len(self.explosive_names)}H")
+        self.record_size = 1 + k * self.plan_format.size
+        self.records_start = _PREAMBLE.size + header_size
+
+    def plans(self, structure, explosive_list):
+        """
+        Returns up to TOP_K (sulfur, {explosive: count}) plans for destroying one structure
+        with the given explosives, cheapest first.
+        """
+        if structure not in self.structure_index:
+            raise ValueError(f"Structure '{structure}' not found.")
+        mask = 0
+        for exp in explosive_list:
+            if exp not in self.explosive_index:
+                raise ValueError(f"Explosive type '{exp}' not found.")
+            mask |= 1 << self.explosive_index[exp]
+        subsets = 1 << len(self.explosive_names)
+        offset = self.records_start + (self.structure_index[structure] * subsets + mask) * self.record_size
+        found = []
+        for i in range(self.blob[offset]):
+            sulfur, *counts = self.plan_format.unpack_from(self.blob, offset + 1 + i * self.plan_format.size)
+            found.append((sulfur, {
+                name: count for name, count in zip(self.explosive_names, counts) if count
+            }))
+        return found
+
+    def best(self, structure, explosive_list):
+        """
+        Returns the cheapest (sulfur, {explosive: count}) plan, or None if the explosives can't destroy it.
+        """
+        found = self.plans(structure, explosive_list)
+        return found[0] if found else None
+
+
+def build_plan_table(explosives, structures, k=TOP_K):
+    """
+    Runs the top-k search for every structure and explosive subset and packs the results.
+    """
+    explosive_names = list(explosives.keys())
+    structure_names = list(structures.keys())
+    header = json.dumps({
+        "version": data_version(explosives, structures),
+        "explosives": explosive_names,
+        "structures": structure_names,
+    }).encode("utf-8")
+    plan_format = struct.Struct(f"<I{len(explosive_names)}H")
+    empty_plan = bytes(plan_format.size)
+    matrices = get_matrices(explosives, structures)
+
+    chunks = [_PREAMBLE.pack(TABLE_MAGIC, TABLE_FORMAT_VERSION, k, len(header)), header]
+    for structure in structure_names:
+        hp = int(matrices.scaled_hp[matrices.structure_index[structure]])
+        for mask in range(1 << len(explosive_names)):
+            subset = [name for i, name in enumerate(explosive_names) if mask >> i & 1]
+            options = scaled_options(structure, subset, matrices)
+            found = cheapest_covers(hp, options, k) if options else []
+            chunks.append(bytes([len(found)]))
+            for sulfur, plan in found:
+                chunks.append(plan_format.pack(sulfur, *(plan.get(name, 0) for name in explosive_names)))
+            chunks.append(empty_plan * (k - len(found)))
+    return b"".join(chunks)
+
+
+def load_plan_table(explosives, structures, path=None):
+    """
+    Loads the plan table from disk, rebuilding and saving it when it is missing or was built
+    from different game data.
+    """
+    if path is None:
+        path = os.path.join(DATA_DIR, TABLE_FILENAME)
+    version = data_version(explosives, structures)
+    try:
+        with open(path, "rb") as file:
+            table = PlanTable(file.read())
+        if table.version == version and table.k == TOP_K:
+            return table
+    except (OSError, ValueError, struct.error):
+        pass
+
+    blob = build_plan_table(explosives, structures)
+    try:
+        # Write to a temporary file first so other processes never read a half-written table
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(blob)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+    return PlanTable(blob)
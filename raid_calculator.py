@@ -4,10 +4,20 @@
 # This script calculates the resources required to craft explosives
 # and the damage they deal to various structures in Rust.
 # Uses optmization techjiques to minimize sulfur usage.
+# The calculations live in engine.py; this file is the interactive menu.
 ######################################
 
+import argparse
 import json
-from pulp import *
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from anytime import QUALITY_LEVELS
+from engine import get_engine
+from batch import evaluate_raid, parse_raid_spec
+from sweep import parse_sweep, write_sweep_csv
+
+MENU = "Select an option:\n 1. Calculate resources for explosives\n 2. Provide Damage given a structure\n 3. Sulfur Optimizer\n 0. Exit\n"
 
 ###########################
 # Function to calculate resources required
@@ -15,17 +25,7 @@ from pulp import *
 # Outputs: total_resources (dict)
 ###########################
 def calculate_resources(explosive_type, quantity):
-    if explosive_type not in explosives:
-        raise ValueError(f"Explosive type '{explosive_type}' not found.")
-    if quantity <= 0:
-        raise ValueError("Quantity must be a positive integer.")
-    if not isinstance(quantity, int):
-        raise ValueError("Quantity must be an integer.")
-
-    explosive = explosives[explosive_type]
-    raw_materials = explosive['raw_materials']
-    total_resources = {material: amount * quantity for material, amount in raw_materials.items()}
-    return total_resources
+    return get_engine().calculate_resources(explosive_type, quantity)
 
 ############################
 # Function to get specific damage values for a structure
@@ -33,133 +33,367 @@ def calculate_resources(explosive_type, quantity):
 # Outputs: damage_values (dict)
 ############################
 def specific_damage_values(explosive_list, structure):
-    if structure not in structures:
-        raise ValueError(f"Structure '{structure}' not found.")
-    
-    damage_values = {}
-    for explosive in explosive_list:
-        if explosive not in explosives:
-            raise ValueError(f"Explosive type '{explosive}' not found.")
-        damage_values[explosive] = explosives[explosive]["damage_per_structure"][structure]
-    return damage_values
-
-# Load the explosives data from a JSON file
-# The JSON file should contain the explosive types, raw materials, and damage values.
-try:
-    with open('explosives.json', 'r') as file:
-        explosives = json.load(file)
-    file.close()
-except FileNotFoundError:
-    print("Error: 'explosives.json' file not found. Please ensure the file exists in the same directory as this script.")
-    exit(1)
-
-#Load the structure data from a JSON file
-#The JSON file should contain the structure types and their hp values.
-try:
-    with open('structures.json', 'r') as file:
-        structures = json.load(file)
-    file.close()
-except FileNotFoundError:
-    print("Error: 'structures.json' file not found. Please ensure the file exists in the same directory as this script.")
-    exit(1)
-
-print("Welcome to the Rust Raid Calculator!")
-user_selection = input("Select an option:\n 1. Calculate resources for explosives\n 2. Provide Damage given a structure\n 3. Sulfur Optimizer\n 0. Exit\n")
-while user_selection != '0':
-    
-    #Resoource Calculation
-    if user_selection == '1':
-        try:
-            resources = {}
-            explosives_count = {}
-            while True:
-                # Prompt for explosive types and quantities
-                print("Available explosives:")
-                for explosive in explosives.keys():
-                    print(f"- {explosive}")
+    return get_engine().specific_damage_values(explosive_list, structure)
+
+############################
+# Batch mode operations, one per menu option
+# Inputs: spec (dict) parsed from one JSON line
+# Outputs: result (dict)
+############################
+def batch_resources(engine, spec):
+    # {"op": "resources", "explosives": {"c4": 2, "rocket": 4}}
+    counts = spec.get("explosives")
+    if not isinstance(counts, dict) or not counts:
+        raise ValueError("Expected \"explosives\" as {explosive: quantity}.")
+    resources = {}
+    for explosive_type, quantity in counts.items():
+        if isinstance(quantity, bool):
+            raise ValueError("Quantity must be an integer.")
+        for material, amount in engine.calculate_resources(explosive_type, quantity).items():
+            resources[material] = resources.get(material, 0) + amount
+    return {"explosives": counts, "resources": resources}
+
+def batch_damage(engine, spec):
+    # {"op": "damage", "structure": "stone_wall", "explosives": ["c4", "rocket"]}
+    structure = spec.get("structure")
+    explosive_list = spec.get("explosives") or list(engine.explosives.keys())
+    if not isinstance(explosive_list, list):
+        raise ValueError("Expected \"explosives\" as a list of explosive names.")
+    damages = engine.specific_damage_values(explosive_list, structure)
+    return {
+        "structure": structure,
+        "hp": engine.structures[structure],
+        "damage": damages,
+        "plans": [{"sulfur": sulfur, "explosives": plan} for sulfur, plan in engine.cheapest_plans(structure, explosive_list)],
+    }
+
+def batch_optimize(engine, spec):
+    # {"op": "optimize", "structures": {"stone_wall": 4}, "explosives": {"rocket": 2, "c4": 0}}
+    # Add "alternatives": k to also list the k cheapest distinct plans
+    selected_structures, explosive_dict = parse_raid_spec(spec, engine.explosives, engine.structures)
+    result = evaluate_raid(selected_structures, explosive_dict, engine.explosives, engine.structures, engine.plan_table)
+    if "alternatives" in spec and "error" not in result:
+        result["alternatives"] = engine.plan_alternatives(selected_structures, explosive_dict, spec["alternatives"])
+    return result
+
+BATCH_OPERATIONS = {
+    "resources": batch_resources,
+    "damage": batch_damage,
+    "optimize": batch_optimize,
+    "1": batch_resources,
+    "2": batch_damage,
+    "3": batch_optimize,
+}
+
+def batch_line(line):
+    """
+    Evaluates one JSON-lines raid spec and returns the JSON result line (without newline).
+    "op" picks the operation (default "optimize"); an "id" in the spec is echoed back.
+    """
+    spec = None
+    try:
+        spec = json.loads(line)
+        if not isinstance(spec, dict):
+            raise ValueError("Each line must be a JSON object.")
+        operation = BATCH_OPERATIONS.get(str(spec.get("op", "optimize")))
+        if operation is None:
+            raise ValueError(f"Unknown operation '{spec.get('op')}'.")
+        result = operation(get_engine(), spec)
+    except (ValueError, TypeError) as e:
+        # json.JSONDecodeError is a ValueError; TypeError covers wrongly shaped fields
+        result = {"error": str(e)}
+    if isinstance(spec, dict) and "id" in spec:
+        result = {"id": spec["id"], **result}
+    return json.dumps(result)
+
+def run_batch(lines, out, workers=1):
+    """
+    Streams one result line to `out` per non-blank input line, in input order.
+    With workers > 1 lines are solved in a process pool; at most a few lines per worker are
+    in flight at once, so memory stays bounded however long the input is.
+    """
+    lines = (line for line in lines if line.strip())
+    if workers <= 1:
+        for line in lines:
+            out.write(batch_line(line) + "\n")
+            out.flush()
+        return
+
+    window = workers * 4
+    with ProcessPoolExecutor(max_workers=workers, initializer=get_engine) as pool:
+        pending = deque()
+        for line in lines:
+            pending.append(pool.submit(batch_line, line))
+            while len(pending) >= window or (pending and pending[0].done()):
+                out.write(pending.popleft().result() + "\n")
+                out.flush()
+        while pending:
+            out.write(pending.popleft().result() + "\n")
+            out.flush()
+
+def run_sweep(engine, path, out):
+    """
+    Reads one sweep spec (see sweep.parse_sweep) from path, or stdin for "-", and writes the
+    crafted sulfur for every grid point to `out` as CSV.
+    """
+    try:
+        if path == "-":
+            spec = json.load(sys.stdin)
+        else:
+            with open(path, "r") as file:
+                spec = json.load(file)
+        selected_structures, explosive_dict, sweep = parse_sweep(spec, engine.explosives, engine.structures)
+        result = engine.owned_sweep(selected_structures, explosive_dict, sweep)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    write_sweep_csv(result, out)
+    return 0
 
-                explosive_type = input("Enter the explosive type (or 'done' to finish): \n")
-                if explosive_type.lower() == 'done':
-                    break
-                if explosive_type not in explosives:
-                    print(f"Explosive type '{explosive_type}' not found. Please try again.")
-                    continue
+############################
+# Entry point
+# Loads the game data (explosive types, raw materials and damage values,
+# structure types and HP) from the JSON files next to this script, then
+# runs the interactive menu or, with --batch, the JSON-lines batch mode.
+############################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rust Raid Calculator")
+    parser.add_argument(
+        "--batch", nargs="?", const="-", metavar="FILE",
+        help="read one JSON raid spec per line from FILE (or stdin) and write one JSON result per line",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for --batch (default 1)")
+    parser.add_argument(
+        "--sweep", metavar="FILE",
+        help="read a JSON sweep spec from FILE (or - for stdin) and write the sulfur table as CSV",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        engine = get_engine()
+    except FileNotFoundError as e:
+        print(f"Error: '{e.filename}' file not found. Please ensure the file exists in the same directory as this script.",
+              file=sys.stderr if args.batch or args.sweep else sys.stdout)
+        return 1
+
+    if args.sweep:
+        return run_sweep(engine, args.sweep, sys.stdout)
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, args.workers)
+        else:
+            with open(args.batch, "r") as file:
+                run_batch(file, sys.stdout, args.workers)
+        return 0
+    return interactive_menu(engine)
 
-                # Prompt for quantity and validate input
+############################
+# Interactive menu
+############################
+def interactive_menu(engine):
+    explosives = engine.explosives
+    structures = engine.structures
+
+    print("Welcome to the Rust Raid Calculator!")
+    user_selection = input(MENU)
+    while user_selection != '0':
+
+        #Resoource Calculation
+        if user_selection == '1':
+            try:
+                resources = {}
+                explosives_count = {}
                 while True:
-                    quantity_input = input(f"Enter the quantity of {explosive_type}: \n")
-                    try:
-                        quantity = int(quantity_input)
-                        if quantity <= 0:
-                            print("Quantity must be a positive integer. Please try again.")
-                            continue
+                    # Prompt for explosive types and quantities
+                    print("Available explosives:")
+                    for explosive in explosives.keys():
+                        print(f"- {explosive}")
+
+                    explosive_type = input("Enter the explosive type (or 'done' to finish): \n")
+                    if explosive_type.lower() == 'done':
                         break
-                    except ValueError:
-                        print("Quantity must be an integer. Please try again.")
+                    if explosive_type not in explosives:
+                        print(f"Explosive type '{explosive_type}' not found. Please try again.")
                         continue
 
-                # Calculate resources and update counts
-                if explosive_type in explosives_count:
-                    explosives_count[explosive_type] += quantity
-                else:
-                    explosives_count[explosive_type] = quantity
-                    
-                resource = calculate_resources(explosive_type, quantity)
-                for material, amount in resource.items():
-                    if material in resources:
-                        resources[material] += amount
+                    # Prompt for quantity and validate input
+                    while True:
+                        quantity_input = input(f"Enter the quantity of {explosive_type}: \n")
+                        try:
+                            quantity = int(quantity_input)
+                            if quantity <= 0:
+                                print("Quantity must be a positive integer. Please try again.")
+                                continue
+                            break
+                        except ValueError:
+                            print("Quantity must be an integer. Please try again.")
+                            continue
+
+                    # Calculate resources and update counts
+                    if explosive_type in explosives_count:
+                        explosives_count[explosive_type] += quantity
                     else:
-                        resources[material] = amount
-                print("Current explosive count:")
+                        explosives_count[explosive_type] = quantity
+                    
+                    resource = calculate_resources(explosive_type, quantity)
+                    for material, amount in resource.items():
+                        if material in resources:
+                            resources[material] += amount
+                        else:
+                            resources[material] = amount
+                    print("Current explosive count:")
+                    for exp, count in explosives_count.items():
+                        print(f"{exp}: {count}")
+            
+                 # Display totals for all explosives and resources
+                print("Total explosives crafted:")
                 for exp, count in explosives_count.items():
                     print(f"{exp}: {count}")
+                print("Total resources required:")
+                for material, amount in resources.items():
+                    print(f"{material}: {amount}")
+
+            except ValueError as e:
+                print(e)
+
+        #Damage per structure display
+        elif user_selection == '2':
+            try:
+                while True:
+                    # Prompt for structure type
+                    print("Available structures:")
+                    for structure in structures.keys():
+                        print(f"- {structure}")
+
+                    structure = input("Enter the structure type (or type 'done' to exit): \n")
+                    if structure.lower() == 'done':
+                        break
+                    if structure not in structures:
+                        print(f"Structure '{structure}' not found. Please try again.")
+                        continue
+
+                    #Prompt user for specific explosive types
+                    print("Available explosives:")
+                    for explosive in explosives.keys():
+                        print(f"- {explosive}")
+                    explosive_set = set()
+                    while True:
+                        # Display current selection and prompt for explosive input
+                        print(f"Current selection: {', '.join(explosive_set) if explosive_set else '(none)'}")
+                        explosive_input = input(
+                            "Enter an explosive to add/remove "
+                            "(or 'done' to finish, 'all' for all explosives, 'list' to show all explosives): \n"
+                        ).strip().lower()
+                        if explosive_input == 'done':
+                            if not explosive_set:
+                                print("You must select at least one explosive before continuing.")
+                                continue
+                            break
+                        elif explosive_input == 'all':
+                            explosive_set = set(explosives.keys())
+                            print("All explosives added.")
+                            continue
+                        elif explosive_input == 'list':
+                            print("Available explosives:")
+                            for explosive in explosives.keys():
+                                print(f"- {explosive}")
+                            continue
+                        elif explosive_input not in (exp.lower() for exp in explosives.keys()):
+                            print(f"Explosive type '{explosive_input}' not found. Please try again.")
+                            continue
+
+                        # Find the actual case-sensitive explosive name
+                        actual_exp = next(exp for exp in explosives.keys() if exp.lower() == explosive_input)
+                        if actual_exp in explosive_set:
+                            explosive_set.remove(actual_exp)
+                            print(f"Removed '{actual_exp}' from selection.")
+                        else:
+                            explosive_set.add(actual_exp)
+                            print(f"Added '{actual_exp}' to selection.")
+
+                    # Convert the set to a list for further processing
+                    explosive_list = list(explosive_set)
             
-             # Display totals for all explosives and resources
-            print("Total explosives crafted:")
-            for exp, count in explosives_count.items():
-                print(f"{exp}: {count}")
-            print("Total resources required:")
-            for material, amount in resources.items():
-                print(f"{material}: {amount}")
-
-        except ValueError as e:
-            print(e)
-
-    #Damage per structure display
-    elif user_selection == '2':
-        try:
-            while True:
-                # Prompt for structure type
-                print("Available structures:")
-                for structure in structures.keys():
-                    print(f"- {structure}")
-
-                structure = input("Enter the structure type (or type 'done' to exit): \n")
-                if structure.lower() == 'done':
-                    break
-                if structure not in structures:
-                    print(f"Structure '{structure}' not found. Please try again.")
-                    continue
-
-                #Prompt user for specific explosive types
+                    # Calculate and display damage values
+                    damages = specific_damage_values(explosive_list, structure)
+                    print(f"Damage values for {structure} that has {structures[structure]} HP:")
+                    for explosive, damage in damages.items():
+                        print(f"{explosive}: {damage} HP")
+                    print("Cheapest ways to destroy it:")
+                    for sulfur, plan in engine.cheapest_plans(structure, explosive_list):
+                        print(f"  {', '.join(f'{exp} x{count}' for exp, count in plan.items())} ({sulfur} sulfur)")
+            except ValueError as e:
+                print(e)
+
+        elif user_selection == '3':
+            try:
+                # Prompt for structure types and quantities (user can select multiple)
+                selected_structures = {}
+                while True:
+                    print("Available structures:")
+                    for structure in structures.keys():
+                        print(f"- {structure}")
+                    print(f"Current selection: {', '.join([f'{s} (x{q})' for s, q in selected_structures.items()]) if selected_structures else '(none)'}")
+                    structure_input = input("Enter a structure to add/remove (or 'done' to finish, 'list' to show all structures): \n").strip().lower()
+                    if structure_input == 'done':
+                        if not selected_structures:
+                            print("You must select at least one structure before continuing.")
+                            continue
+                        break
+                    elif structure_input == 'list':
+                        print("Available structures:")
+                        for structure in structures.keys():
+                            print(f"- {structure}")
+                        continue
+                    elif structure_input not in (s.lower() for s in structures.keys()):
+                        print(f"Structure '{structure_input}' not found. Please try again.")
+                        continue
+
+                    # Find the actual case-sensitive structure name
+                    actual_structure = next(s for s in structures.keys() if s.lower() == structure_input)
+                    if actual_structure in selected_structures:
+                        del selected_structures[actual_structure]
+                        print(f"Removed '{actual_structure}' from selection.")
+                    else:
+                        while True:
+                            qty_input = input(f"Enter the quantity for {actual_structure}: \n")
+                            try:
+                                qty = int(qty_input)
+                                if qty <= 0:
+                                    print("Quantity must be a positive integer. Please try again.")
+                                    continue
+                                selected_structures[actual_structure] = qty
+                                print(f"Added '{actual_structure}' (x{qty}) to selection.")
+                                break
+                            except ValueError:
+                                print("Quantity must be an integer. Please try again.")
+
+                # selected_structures is now a dict: {structure_name: quantity, ...}
+                print("Final structure selection:")
+                for s, q in selected_structures.items():
+                    print(f"{s}: {q}")
+
+                # Prompt user for specific explosive types to use in the optimizer
                 print("Available explosives:")
                 for explosive in explosives.keys():
                     print(f"- {explosive}")
-                explosive_set = set()
+                explosive_dict = dict()
                 while True:
-                    # Display current selection and prompt for explosive input
-                    print(f"Current selection: {', '.join(explosive_set) if explosive_set else '(none)'}")
+                    print(f"Current selection: {', '.join(f'{key}:{value}' for key, value in explosive_dict.items()) if explosive_dict else '(none)'}")
                     explosive_input = input(
                         "Enter an explosive to add/remove "
                         "(or 'done' to finish, 'all' for all explosives, 'list' to show all explosives): \n"
                     ).strip().lower()
                     if explosive_input == 'done':
-                        if not explosive_set:
+                        if not explosive_dict:
                             print("You must select at least one explosive before continuing.")
                             continue
                         break
                     elif explosive_input == 'all':
-                        explosive_set = set(explosives.keys())
+                        for exp in explosives.keys():
+                            if exp not in explosive_dict:
+                                explosive_dict[exp] = 0
                         print("All explosives added.")
                         continue
                     elif explosive_input == 'list':
@@ -173,260 +407,105 @@ while user_selection != '0':
 
                     # Find the actual case-sensitive explosive name
                     actual_exp = next(exp for exp in explosives.keys() if exp.lower() == explosive_input)
-                    if actual_exp in explosive_set:
-                        explosive_set.remove(actual_exp)
+                    if actual_exp in explosive_dict:
+                        explosive_dict.pop(actual_exp)
                         print(f"Removed '{actual_exp}' from selection.")
                     else:
-                        explosive_set.add(actual_exp)
-                        print(f"Added '{actual_exp}' to selection.")
-
-                # Convert the set to a list for further processing
-                explosive_list = list(explosive_set)
-            
-                # Calculate and display damage values
-                damages = specific_damage_values(explosive_list, structure)
-                print(f"Damage values for {structure} that has {structures[structure]} HP:")
-                for explosive, damage in damages.items():
-                    print(f"{explosive}: {damage} HP")
-        except ValueError as e:
-            print(e)
-
-    elif user_selection == '3':
-        try:
-            # Prompt for structure types and quantities (user can select multiple)
-            selected_structures = {}
-            while True:
-                print("Available structures:")
-                for structure in structures.keys():
-                    print(f"- {structure}")
-                print(f"Current selection: {', '.join([f'{s} (x{q})' for s, q in selected_structures.items()]) if selected_structures else '(none)'}")
-                structure_input = input("Enter a structure to add/remove (or 'done' to finish, 'list' to show all structures): \n").strip().lower()
-                if structure_input == 'done':
-                    if not selected_structures:
-                        print("You must select at least one structure before continuing.")
-                        continue
-                    break
-                elif structure_input == 'list':
-                    print("Available structures:")
-                    for structure in structures.keys():
-                        print(f"- {structure}")
-                    continue
-                elif structure_input not in (s.lower() for s in structures.keys()):
-                    print(f"Structure '{structure_input}' not found. Please try again.")
-                    continue
-
-                # Find the actual case-sensitive structure name
-                actual_structure = next(s for s in structures.keys() if s.lower() == structure_input)
-                if actual_structure in selected_structures:
-                    del selected_structures[actual_structure]
-                    print(f"Removed '{actual_structure}' from selection.")
-                else:
-                    while True:
-                        qty_input = input(f"Enter the quantity for {actual_structure}: \n")
-                        try:
-                            qty = int(qty_input)
-                            if qty <= 0:
-                                print("Quantity must be a positive integer. Please try again.")
-                                continue
-                            selected_structures[actual_structure] = qty
-                            print(f"Added '{actual_structure}' (x{qty}) to selection.")
-                            break
-                        except ValueError:
-                            print("Quantity must be an integer. Please try again.")
-
-            # selected_structures is now a dict: {structure_name: quantity, ...}
-            print("Final structure selection:")
-            for s, q in selected_structures.items():
-                print(f"{s}: {q}")
-
-            # Prompt user for specific explosive types to use in the optimizer
-            print("Available explosives:")
-            for explosive in explosives.keys():
-                print(f"- {explosive}")
-            explosive_dict = dict()
-            while True:
-                print(f"Current selection: {', '.join((f"{key}:{value}") for key, value in explosive_dict.items()) if explosive_dict else '(none)'}")
-                explosive_input = input(
-                    "Enter an explosive to add/remove "
-                    "(or 'done' to finish, 'all' for all explosives, 'list' to show all explosives): \n"
-                ).strip().lower()
-                if explosive_input == 'done':
-                    if not explosive_dict:
-                        print("You must select at least one explosive before continuing.")
-                        continue
-                    break
-                elif explosive_input == 'all':
-                    for exp in explosives.keys():
-                        if exp not in explosive_dict:
-                            explosive_dict[exp] = 0
-                    print("All explosives added.")
-                    continue
-                elif explosive_input == 'list':
-                    print("Available explosives:")
-                    for explosive in explosives.keys():
-                        print(f"- {explosive}")
-                    continue
-                elif explosive_input not in (exp.lower() for exp in explosives.keys()):
-                    print(f"Explosive type '{explosive_input}' not found. Please try again.")
-                    continue
-
-                # Find the actual case-sensitive explosive name
-                actual_exp = next(exp for exp in explosives.keys() if exp.lower() == explosive_input)
-                if actual_exp in explosive_dict:
-                    explosive_dict.pop(actual_exp)
-                    print(f"Removed '{actual_exp}' from selection.")
-                else:
-                    while True:
-                        qty_input = input(f"Enter the quantity for {actual_exp}: \n")
-                        try:
-                            qty = int(qty_input)
-                            if qty < 0:
-                                print("Quantity must 0 or greater. Please try again.")
-                                continue
-                            explosive_dict[actual_exp] = qty
-                            print(f"Added '{actual_exp}' (x{qty}) to selection.")
-                            break
-                        except ValueError:
-                            print("Quantity must be an integer. Please try again.")
-
-            explosive_list = list(explosive_dict.keys())
-
-            # --- Begin Linear Programming Model Setup ---
-            prob = LpProblem("Rust_Raid_Optimizer", LpMinimize)
-
-            # Create a decision variable for each (explosive, structure, instance) pair
-            # This allows the optimizer to decide how many of each explosive to use on each structure instance
-            explosive_vars = {}
-            for struct, qty in selected_structures.items():
-                for i in range(qty):
-                    for exp in explosive_list:
-                        explosive_vars[(exp, struct, i)] = LpVariable(f"{exp}_{struct}_{i+1}", explosive_dict[exp], cat='Integer')
-
-            owned_vars = {}
-            crafted_vars = {}
+                        while True:
+                            qty_input = input(f"Enter the quantity for {actual_exp}: \n")
+                            try:
+                                qty = int(qty_input)
+                                if qty < 0:
+                                    print("Quantity must 0 or greater. Please try again.")
+                                    continue
+                                explosive_dict[actual_exp] = qty
+                                print(f"Added '{actual_exp}' (x{qty}) to selection.")
+                                break
+                            except ValueError:
+                                print("Quantity must be an integer. Please try again.")
+
+                explosive_list = list(explosive_dict.keys())
+
+                # How long to search: a quick greedy plan, a short exact search or the cheapest plan
+                while True:
+                    quality = input(
+                        f"Enter the plan quality ({', '.join(QUALITY_LEVELS)}) or press Enter for exact: \n"
+                    ).strip().lower() or "exact"
+                    if quality in QUALITY_LEVELS:
+                        break
+                    print(f"Plan quality '{quality}' not found. Please try again.")
 
-            for struct, qty in selected_structures.items():
-                for i in range(qty):
-                    for exp in explosive_list:
-                        owned_vars[(exp, struct, i)] = LpVariable(f"owned_{exp}_{struct}_{i+1}", 0, cat='Integer')
-                        crafted_vars[(exp, struct, i)] = LpVariable(f"crafted_{exp}_{struct}_{i+1}", 0, cat='Integer')
-
-            # Constraint: total owned used ≤ owned amount
-            for exp in explosive_list:
-                prob += lpSum([owned_vars[(exp, struct, i)] for struct, qty in selected_structures.items() for i in range(qty)]) <= explosive_dict[exp]
-
-            # Objective: minimize sulfur cost (only crafted explosives cost sulfur)
-            prob += lpSum([
-                crafted_vars[(exp, struct, i)] * explosives[exp]['raw_materials']['sulfur']
-                for (exp, struct, i) in crafted_vars
-            ]), "Total_Sulfur_Cost"
-
-            # Calculate max single-hit damage for each structure
-            max_damage = {struct: max(explosives[exp]['damage_per_structure'][struct] for exp in explosive_list) for struct in selected_structures}
-
-            # Damage constraints: both owned and crafted count toward damage
-            for struct, qty in selected_structures.items():
-                for i in range(qty):
-                    # Lower bound: must destroy the structure
-                    prob += lpSum([
-                        (owned_vars[(exp, struct, i)] + crafted_vars[(exp, struct, i)]) * explosives[exp]['damage_per_structure'][struct]
-                        for exp in explosive_list
-                    ]) >= structures[struct], f"{struct}_{i+1}_lower"
-                    # Upper bound: don't use way more than needed
-                    prob += lpSum([
-                        (owned_vars[(exp, struct, i)] + crafted_vars[(exp, struct, i)]) * explosives[exp]['damage_per_structure'][struct]
-                        for exp in explosive_list
-                    ]) <= structures[struct] + max_damage[struct], f"{struct}_{i+1}_upper"
-            
-            # Solve the optimization problem using PuLP's default solver
-            prob.solve()
+                # Solve per structure type with kill patterns; the engine falls back to the
+                # per-instance model on its own when the owned inventory is too large
+                results = engine.run_raid_optimizer(selected_structures, explosive_dict, quality=quality)
+                structure_instance_usage = results["structure_instance_usage"]
+                sulfur_cost = results["sulfur_cost"]
 
-            print("Optimization Results:")
+                print("Optimization Results:")
 
-            # Breakdown by structure: how much of each explosive is used on each structure, split by owned/crafted
-            for struct, qty in selected_structures.items():
-                print(f"\n{struct} (x{qty}):")
-                for exp in explosive_list:
-                    used_owned = sum(
-                        int(owned_vars[(exp, struct, i)].varValue)
-                        for i in range(qty)
-                        if owned_vars[(exp, struct, i)].varValue and owned_vars[(exp, struct, i)].varValue > 0
-                    )
-                    used_crafted = sum(
-                        int(crafted_vars[(exp, struct, i)].varValue)
-                        for i in range(qty)
-                        if crafted_vars[(exp, struct, i)].varValue and crafted_vars[(exp, struct, i)].varValue > 0
-                    )
-                    total_used = used_owned + used_crafted
-                    if total_used > 0:
-                        print(f"  {exp}: {total_used} (owned: {used_owned}, crafted: {used_crafted})")
-
-            # Breakdown by structure instance: how much of each explosive is used on each individual structure, split by owned/crafted
-            for struct, qty in selected_structures.items():
-                for i in range(qty):
-                    print(f"\n{struct} #{i+1}:")
+                # Breakdown by structure: how much of each explosive is used on each structure, split by owned/crafted
+                for struct, qty in selected_structures.items():
+                    print(f"\n{struct} (x{qty}):")
                     for exp in explosive_list:
-                        used_owned = int(owned_vars[(exp, struct, i)].varValue) if owned_vars[(exp, struct, i)].varValue else 0
-                        used_crafted = int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0
+                        used_owned = sum(instance[exp]["owned"] for instance in structure_instance_usage[struct] if exp in instance)
+                        used_crafted = sum(instance[exp]["crafted"] for instance in structure_instance_usage[struct] if exp in instance)
                         total_used = used_owned + used_crafted
                         if total_used > 0:
                             print(f"  {exp}: {total_used} (owned: {used_owned}, crafted: {used_crafted})")
 
-            # Totals for each explosive across all structures
-            explosive_totals = {}
-            explosive_owned_totals = {}
-            explosive_crafted_totals = {}
-            for (exp, struct, i) in explosive_vars:
-                owned = int(owned_vars[(exp, struct, i)].varValue) if owned_vars[(exp, struct, i)].varValue else 0
-                crafted = int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0
-                explosive_totals[exp] = explosive_totals.get(exp, 0) + owned + crafted
-                explosive_owned_totals[exp] = explosive_owned_totals.get(exp, 0) + owned
-                explosive_crafted_totals[exp] = explosive_crafted_totals.get(exp, 0) + crafted
-
-            print("\nTotal Explosives Used:")
-            for exp in explosive_list:
-                print(f"{exp}: {explosive_totals.get(exp,0)} (owned: {explosive_owned_totals.get(exp,0)}, crafted: {explosive_crafted_totals.get(exp,0)})")
-
-            # Print total sulfur cost for the solution
-            print(f"\nTotal Sulfur Cost (crafted only): {int(value(prob.objective))}")
-
-            # Aggregate and display total resources required for the solution (owned + crafted)
-            print("\nTotal Resources Required (owned + crafted):")
-            total_resources = {}
-            for (exp, struct, i) in explosive_vars:
-                total = (int(owned_vars[(exp, struct, i)].varValue) if owned_vars[(exp, struct, i)].varValue else 0) + \
-                        (int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0)
-                if total > 0:
-                    resource = calculate_resources(exp, total)
-                    for material, amount in resource.items():
-                        total_resources[material] = total_resources.get(material, 0) + amount
-            for material, amount in total_resources.items():
-                print(f"{material}: {amount}")
-
-            # Aggregate and display total resources required for the crafted explosives only
-            print("\nTotal Resources Required (crafted only):")
-            crafted_resources = {}
-            for (exp, struct, i) in crafted_vars:
-                crafted = int(crafted_vars[(exp, struct, i)].varValue) if crafted_vars[(exp, struct, i)].varValue else 0
-                if crafted > 0:
-                    resource = calculate_resources(exp, crafted)
-                    for material, amount in resource.items():
-                        crafted_resources[material] = crafted_resources.get(material, 0) + amount
-
-            if crafted_resources:
-                for material, amount in crafted_resources.items():
+                # Breakdown by structure instance, identical instances printed once: how much of each
+                # explosive is used on each individual structure, split by owned/crafted
+                for struct, groups in results["structure_instance_groups"].items():
+                    for group in groups:
+                        if group["count"] == 1:
+                            print(f"\n{struct} #{group['first']}:")
+                        else:
+                            print(f"\n{struct} x{group['count']} (from #{group['first']}):")
+                        for exp, detail in group["usage"].items():
+                            print(f"  {exp}: {detail['total']} (owned: {detail['owned']}, crafted: {detail['crafted']})")
+
+                # Totals for each explosive across all structures
+                explosive_totals = results["explosive_totals"]
+                explosive_owned_totals = results["explosive_owned_totals"]
+                explosive_crafted_totals = results["explosive_crafted_totals"]
+
+                print("\nTotal Explosives Used:")
+                for exp in explosive_list:
+                    print(f"{exp}: {explosive_totals.get(exp,0)} (owned: {explosive_owned_totals.get(exp,0)}, crafted: {explosive_crafted_totals.get(exp,0)})")
+
+                # Print total sulfur cost for the solution
+                print(f"\nTotal Sulfur Cost (crafted only): {sulfur_cost}")
+                if not results["optimal"]:
+                    print(f"Not proven cheapest: no plan costs less than {results['lower_bound']} sulfur "
+                          f"(gap {results['gap']:.1%}).")
+
+                # Aggregate and display total resources required for the solution (owned + crafted)
+                print("\nTotal Resources Required (owned + crafted):")
+                total_resources = results["total_resources"]
+                for material, amount in total_resources.items():
                     print(f"{material}: {amount}")
-            else:
-                print("No crafted resources required. All explosives can be owned.")
+
+                # Aggregate and display total resources required for the crafted explosives only
+                print("\nTotal Resources Required (crafted only):")
+                crafted_resources = results["crafted_resources"]
+
+                if crafted_resources:
+                    for material, amount in crafted_resources.items():
+                        print(f"{material}: {amount}")
+                else:
+                    print("No crafted resources required. All explosives can be owned.")
 
           
-        except ValueError as e:
-            print(e)
+            except ValueError as e:
+                print(e)
+
+        else:
+            print("Invalid selection. Please try again.")
 
-    else:
-        print("Invalid selection. Please try again.")
-    
-    # Prompt for next action at the end of each loop
-    user_selection = input("Select an option:\n 1. Calculate resources for explosives\n 2. Provide Damage given a structure\n 3. Sulfur Optimizer\n 0. Exit\n")
+        # Prompt for next action at the end of each loop
+        user_selection = input(MENU)
+    return 0
 
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+######################################
+# Recipe graph and crafting schedule
+# recipes.json describes how every explosive is crafted from intermediates
+# (gunpowder, explosives) and raw materials, with a craft time and the
+# workbench level it needs. The recipes form a DAG that is sorted once;
+# an order then expands to crafts, intermediates and raw materials in a
+# single pass, and a list scheduler spreads the crafts over N workbenches.
+######################################
+
+import heapq
+import itertools
+import json
+import os
+from fractions import Fraction
+
+RECIPES_FILE = "recipes.json"
+# Workbench level assumed when benches are given as a count
+DEFAULT_WORKBENCH = 3
+MAX_WORKBENCH = 3
+# Workbenches one schedule may use
+MAX_BENCHES = 64
+
+
+def load_recipes(data_dir):
+    """
+    Reads recipes.json from data_dir. Returns None when the file does not exist.
+    """
+    try:
+        with open(os.path.join(data_dir, RECIPES_FILE), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _count(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class RecipeGraph:
+    """
+    Validated recipe DAG. Anything used as an ingredient without a recipe of its own is a
+    raw material. Raises ValueError for malformed recipes or cycles.
+    """
+
+    def __init__(self, recipes):
+        if not isinstance(recipes, dict) or not recipes:
+            raise ValueError("Recipes must be a non-empty JSON object.")
+        for item, recipe in recipes.items():
+            if not isinstance(recipe, dict) or not isinstance(recipe.get("ingredients"), dict):
+                raise ValueError(f"Recipe '{item}' needs an ingredients object.")
+            if not _count(recipe.get("output", 1)) or recipe.get("output", 1) <= 0:
+                raise ValueError(f"Recipe '{item}' needs a positive whole output.")
+            craft_time = recipe.get("craft_time", 0)
+            if not isinstance(craft_time, (int, float)) or isinstance(craft_time, bool) or craft_time < 0:
+                raise ValueError(f"Recipe '{item}' needs a non-negative craft_time.")
+            workbench = recipe.get("workbench", 0)
+            if not _count(workbench) or not 0 <= workbench <= MAX_WORKBENCH:
+                raise ValueError(f"Recipe '{item}' needs a workbench level from 0 to {MAX_WORKBENCH}.")
+            for ingredient, amount in recipe["ingredients"].items():
+                if not _count(amount) or amount <= 0:
+                    raise ValueError(f"Recipe '{item}' needs a positive whole amount of {ingredient}.")
+        self.recipes = recipes
+        self.order = self._topological_order()
+        self._unit_raw = {}
+
+    def _topological_order(self):
+        # Products before their ingredients, so demand flows down the list in one pass
+        visiting, done, postorder = set(), set(), []
+
+        def visit(item):
+            if item in done or item not in self.recipes:
+                return
+            if item in visiting:
+                raise ValueError(f"Recipes contain a cycle through '{item}'.")
+            visiting.add(item)
+            for ingredient in self.recipes[item]["ingredients"]:
+                visit(ingredient)
+            visiting.discard(item)
+            done.add(item)
+            postorder.append(item)
+
+        for item in self.recipes:
+            visit(item)
+        return postorder[::-1]
+
+    def output(self, item):
+        return self.recipes[item].get("output", 1)
+
+    def craft_time(self, item):
+        return self.recipes[item].get("craft_time", 0)
+
+    def workbench(self, item):
+        return self.recipes[item].get("workbench", 0)
+
+    def unit_raw(self, item):
+        """
+        Raw materials behind one unit of item as {material: Fraction}, memoized per item.
+        Batch outputs are spread evenly, so this is the flat cost that explosives.json lists.
+        """
+        if item not in self.recipes:
+            return {item: Fraction(1)}
+        if item not in self._unit_raw:
+            totals = {}
+            for ingredient, amount in self.recipes[item]["ingredients"].items():
+                for material, per_unit in self.unit_raw(ingredient).items():
+                    totals[material] = totals.get(material, 0) + per_unit * amount
+            self._unit_raw[item] = {material: total / self.output(item) for material, total in totals.items()}
+        return self._unit_raw[item]
+
+    def check_explosives(self, explosives):
+        """
+        Raises ValueError unless every explosive has a recipe whose raw materials per unit
+        match its raw_materials in explosives.json.
+        """
+        for exp, data in explosives.items():
+            if exp not in self.recipes:
+                raise ValueError(f"No recipe for explosive '{exp}'.")
+            expected = {material: Fraction(amount) for material, amount in data["raw_materials"].items() if amount}
+            if self.unit_raw(exp) != expected:
+                raise ValueError(f"Recipe for '{exp}' does not add up to its raw_materials in explosives.json.")
+
+    def expand(self, order):
+        """
+        Expands {item: quantity} in one pass over the sorted recipes. Crafts are rounded up to
+        whole batches per item, over the whole order. Returns {"crafts": {item: crafts},
+        "intermediates": {item: amount used by other recipes}, "leftover": {item: amount made
+        beyond the need}, "raw_materials": {material: amount}}.
+        """
+        demand = {}
+        for item, quantity in order.items():
+            if item not in self.recipes:
+                raise ValueError(f"No recipe for '{item}'.")
+            if not _count(quantity) or quantity < 0:
+                raise ValueError("Quantities must be non-negative integers.")
+            demand[item] = demand.get(item, 0) + quantity
+        crafts, intermediates, leftover, raw = {}, {}, {}, {}
+        for item in self.order:
+            need = demand.get(item, 0)
+            if not need:
+                continue
+            batches = -(-need // self.output(item))
+            crafts[item] = batches
+            if batches * self.output(item) > need:
+                leftover[item] = batches * self.output(item) - need
+            for ingredient, amount in self.recipes[item]["ingredients"].items():
+                if ingredient in self.recipes:
+                    demand[ingredient] = demand.get(ingredient, 0) + amount * batches
+                    intermediates[ingredient] = intermediates.get(ingredient, 0) + amount * batches
+                else:
+                    raw[ingredient] = raw.get(ingredient, 0) + amount * batches
+        return {"crafts": crafts, "intermediates": intermediates, "leftover": leftover, "raw_materials": raw}
+
+    def tails(self, items):
+        """
+        Longest chain of craft times from each item to a finished product, counting only items.
+        """
+        tails = {}
+        for item in self.order:
+            if item not in items:
+                continue
+            consumers = [tails[other] for other in items if other in tails
+                         and item in self.recipes[other]["ingredients"]]
+            tails[item] = self.craft_time(item) + max(consumers, default=0)
+        return tails
+
+    def schedule(self, order, benches=1):
+        """
+        List-schedules the crafts of an order over parallel workbenches. benches is a count of
+        level-3 benches or a list of levels. Whenever a bench is free it starts the ready craft
+        with the longest chain still behind it; a craft is ready when the intermediates it needs
+        have been made. Raw materials are assumed to be on hand. The bench then keeps making that
+        item for a run of crafts: no more than its share of what is left among the benches able to
+        make it, no more than the ingredients in stock allow, and not past the next arrival of an
+        intermediate that could make a more urgent craft ready for it.
+        Returns the expansion plus "makespan" (seconds), "lower_bound" (no schedule can finish
+        sooner) and "benches": [{"level", "busy", "jobs": [{"item", "crafts", "start", "end"}]}],
+        with back-to-back crafts of one item merged into one job.
+        """
+        if _count(benches):
+            benches = [DEFAULT_WORKBENCH] * benches
+        if not isinstance(benches, list) or not 1 <= len(benches) <= MAX_BENCHES:
+            raise ValueError(f"benches must be a count or a list of workbench levels, from 1 to {MAX_BENCHES}.")
+        for level in benches:
+            if not _count(level) or not 0 <= level <= MAX_WORKBENCH:
+                raise ValueError(f"Workbench levels go from 0 to {MAX_WORKBENCH}.")
+        expansion = self.expand(order)
+        remaining = dict(expansion["crafts"])
+        for item in remaining:
+            if self.workbench(item) > max(benches):
+                raise ValueError(f"'{item}' needs a level {self.workbench(item)} workbench.")
+
+        tails = self.tails(remaining)
+        # Highest first; each entry is (item, craft time, output, workbench, intermediates needed)
+        priority = [
+            (item, self.craft_time(item), self.output(item), self.workbench(item), [
+                (ingredient, amount) for ingredient, amount in self.recipes[item]["ingredients"].items()
+                if ingredient in self.recipes
+            ])
+            for item in sorted(remaining, key=lambda item: -tails[item])
+        ]
+        stock = dict.fromkeys(remaining, 0)
+        tie = itertools.count(len(benches))
+        free = [(0, b, b) for b in range(len(benches))]
+        # Runs in progress as (end of the next craft, item, output, craft time, crafts left)
+        finishing = []
+        jobs = [[] for _ in benches]
+        busy = [0] * len(benches)
+        left = sum(remaining.values())
+        idle = 0
+        while left:
+            now, _, b = heapq.heappop(free)
+            while finishing and finishing[0][0] <= now:
+                end, item, output, craft_time, crafts = heapq.heappop(finishing)
+                done = min(crafts, int((now - end) // craft_time) + 1) if craft_time else crafts
+                stock[item] += output * done
+                # New stock gives every bench another look before it can count as stuck
+                idle = 0
+                if done < crafts:
+                    heapq.heappush(finishing, (end + craft_time * done, item, output, craft_time, crafts - done))
+            # Intermediates whose arrival could make a more urgent craft ready for this bench
+            feeds_ahead = set()
+            for item, craft_time, output, workbench, needs in priority:
+                if remaining[item] and workbench <= benches[b] and all(
+                    stock[ingredient] >= amount for ingredient, amount in needs
+                ):
+                    break
+                if remaining[item] and workbench <= benches[b]:
+                    feeds_ahead.update(ingredient for ingredient, _ in needs)
+            else:
+                # Nothing this bench can make yet: wait for the next craft to finish, or let the
+                # other free benches go first
+                if not finishing and idle >= len(benches):
+                    raise ValueError("No workbench can make the remaining crafts.")
+                idle += 1
+                heapq.heappush(free, (finishing[0][0] if finishing else now, next(tie), b))
+                continue
+            idle = 0
+            crafts = min([remaining[item]] + [stock[ingredient] // amount for ingredient, amount in needs])
+            if craft_time:
+                # Its share: the crafts left are spread over the benches able to make them, from when
+                # each is free, and this bench takes the ones it can start before they would all finish
+                fills = sorted([now] + [at for at, _, other in free if benches[other] >= workbench])
+                total = remaining[item] * craft_time
+                for count, fill in enumerate(fills, 1):
+                    total += fill
+                    if count == len(fills) or total / count <= fills[count]:
+                        break
+                crafts = max(1, min(crafts, int((total / count - now) // craft_time)))
+            wake = min((arrival[0] for arrival in finishing if arrival[1] in feeds_ahead), default=None)
+            if wake is not None and craft_time:
+                crafts = max(1, min(crafts, -int((now - wake) // craft_time)))
+            for ingredient, amount in needs:
+                stock[ingredient] -= amount * crafts
+            remaining[item] -= crafts
+            left -= crafts
+            end = now + craft_time * crafts
+            heapq.heappush(finishing, (now + craft_time, item, output, craft_time, crafts))
+            heapq.heappush(free, (end, next(tie), b))
+            busy[b] += craft_time * crafts
+            last = jobs[b][-1] if jobs[b] else None
+            if last is not None and last["item"] == item and last["end"] == now:
+                last["crafts"] += crafts
+                last["end"] = end
+            else:
+                jobs[b].append({"item": item, "crafts": crafts, "start": now, "end": end})
+
+        work = sum(self.craft_time(item) * crafts for item, crafts in expansion["crafts"].items())
+        return dict(
+            expansion,
+            makespan=max((bench_jobs[-1]["end"] for bench_jobs in jobs if bench_jobs), default=0),
+            lower_bound=max([work / len(benches)] + list(tails.values())),
+            benches=[
+                {"level": level, "busy": busy[b], "jobs": jobs[b]} for b, level in enumerate(benches)
+            ],
+        )
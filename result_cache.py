@@ -0,0 +1,294 @@
+######################################
+# Optimizer result cache
+# In-process LRU cache with a time-to-live, plus optional tiers shared
+# between worker processes: a shared memory mapping that forked web
+# workers read and write directly, and an SQLite table that also
+# survives restarts.
+# SingleFlight collapses identical calls that are in flight at the same time.
+######################################
+
+import hashlib
+import json
+import mmap
+import multiprocessing
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import closing
+
+# Seconds a shared memory slot lock is waited for before the lookup counts as a miss
+SHARED_LOCK_TIMEOUT = 0.05
+
+
+def raid_cache_key(selected_structures, explosive_dict, data_version, **options):
+    """
+    Builds a canonical key for an optimizer call: structures and explosives are sorted so
+    the order they were submitted in doesn't matter, and the data version ties the entry
+    to the game data it was computed from.
+    """
+    payload = json.dumps({
+        "structures": sorted(selected_structures.items()),
+        "explosives": sorted(explosive_dict.items()),
+        "data_version": data_version,
+        "options": sorted(options.items()),
+    }, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SharedMemoryTier:
+    """
+    Fixed-size result store in an anonymous shared memory mapping. Created before the web
+    workers fork, so every worker reads and writes the same pages. Each key owns one of `slots`
+    slots (a newer key simply overwrites an older one that hashes to the same slot), holding
+    zlib-compressed JSON of at most slot_bytes; larger values are not shared. Slots are guarded
+    by a few process-shared locks, and a lock that is not free within SHARED_LOCK_TIMEOUT (say a
+    worker died holding it) turns the call into a miss instead of blocking the request.
+    """
+
+    # Digest of the key, time.time() when stored, payload length
+    HEADER = struct.Struct("<32sdI")
+
+    def __init__(self, slots=2048, slot_bytes=65536, stripes=16):
+        if slots <= 0 or slot_bytes <= self.HEADER.size:
+            raise ValueError(f"Shared cache needs slots and more than {self.HEADER.size} bytes per slot.")
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        # Anonymous mappings are shared with forked children; pages are only backed once written
+        self.memory = mmap.mmap(-1, slots * slot_bytes)
+        self.locks = [multiprocessing.Lock() for _ in range(stripes)]
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "too_large": 0, "lock_timeouts": 0}
+
+    def _slot(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:8], "little") % self.slots
+        return digest, index * self.slot_bytes, self.locks[index % len(self.locks)]
+
+    def get(self, key, ttl):
+        """
+        Returns (value, age in seconds) for key, or None when it is missing or older than ttl.
+        """
+        digest, offset, lock = self._slot(key)
+        if not lock.acquire(timeout=SHARED_LOCK_TIMEOUT):
+            self.counters["lock_timeouts"] += 1
+            return None
+        try:
+            stored, stored_at, length = self.HEADER.unpack_from(self.memory, offset)
+            payload = self.memory[offset + self.HEADER.size:offset + self.HEADER.size + length] \
+                if stored == digest else None
+        finally:
+            lock.release()
+        age = time.time() - stored_at
+        if payload is None or age > ttl:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return json.loads(zlib.decompress(payload)), age
+
+    def set(self, key, value):
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"), 1)
+        if self.HEADER.size + len(payload) > self.slot_bytes:
+            self.counters["too_large"] += 1
+            return
+        digest, offset, lock = self._slot(key)
+        if not lock.acquire(timeout=SHARED_LOCK_TIMEOUT):
+            self.counters["lock_timeouts"] += 1
+            return
+        try:
+            self.HEADER.pack_into(self.memory, offset, digest, time.time(), len(payload))
+            self.memory[offset + self.HEADER.size:offset + self.HEADER.size + len(payload)] = payload
+        finally:
+            lock.release()
+        self.counters["stores"] += 1
+
+    def clear(self):
+        empty = self.HEADER.pack(b"", 0, 0)
+        for offset in range(0, self.slots * self.slot_bytes, self.slot_bytes):
+            lock = self.locks[offset // self.slot_bytes % len(self.locks)]
+            if lock.acquire(timeout=SHARED_LOCK_TIMEOUT):
+                try:
+                    self.memory[offset:offset + len(empty)] = empty
+                finally:
+                    lock.release()
+
+    def stats(self):
+        """
+        This process's counters; every worker keeps its own.
+        """
+        return dict(self.counters, slots=self.slots, slot_bytes=self.slot_bytes)
+
+
+class ResultCache:
+    """
+    Bounded LRU cache whose entries expire `ttl` seconds after they were stored.
+    When `shared` (a SharedMemoryTier) is set, misses fall through to it, then to an SQLite table
+    when `sqlite_path` is set; stores are written to every tier. Counters for hits, misses,
+    evictions and expirations are kept in `stats()`.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600, sqlite_path=None, shared=None):
+        if maxsize <= 0:
+            raise ValueError("Cache size must be a positive integer.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self.shared = shared
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {
+            "hits": 0, "misses": 0, "evictions": 0, "expired": 0, "shared_hits": 0, "disk_hits": 0
+        }
+        if sqlite_path:
+            with closing(self._connect()) as db, db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS results "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        # One short-lived connection per call keeps the tier safe across threads and processes
+        return sqlite3.connect(self.sqlite_path, timeout=5)
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                del self.entries[key]
+                self.counters["expired"] += 1
+
+        found = self.shared.get(key, self.ttl) if self.shared is not None else None
+        tier = "shared_hits"
+        if found is None and self.sqlite_path:
+            found = self._disk_get(key)
+            tier = "disk_hits"
+        with self.lock:
+            if found is None:
+                self.counters["misses"] += 1
+                return None
+            value, age = found
+            self.counters["hits"] += 1
+            self.counters[tier] += 1
+            # Keep the original age so a disk hit doesn't extend the entry's lifetime
+            self._store(key, value, time.monotonic() - age)
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self._store(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+        if self.sqlite_path:
+            self._disk_set(key, value)
+
+    def _store(self, key, value, stored_at=None):
+        self.entries[key] = (time.monotonic() if stored_at is None else stored_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _disk_get(self, key):
+        try:
+            with closing(self._connect()) as db, db:
+                row = db.execute("SELECT value, stored_at FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                age = time.time() - row[1]
+                if age > self.ttl:
+                    db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    return None
+                return json.loads(row[0]), age
+        except sqlite3.Error:
+            return None
+
+    def _disk_set(self, key, value):
+        try:
+            with closing(self._connect()) as db, db:
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time()),
+                )
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+        if self.sqlite_path:
+            try:
+                with closing(self._connect()) as db, db:
+                    db.execute("DELETE FROM results")
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["size"] = len(self.entries)
+            stats["maxsize"] = self.maxsize
+        return stats
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while a call for the same key
+    is in flight wait for it and share its result (or its exception) instead of starting
+    their own. Calls with different keys run independently.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.counters = {"calls": 0, "shared": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.counters["calls"] += 1
+            else:
+                self.counters["shared"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args, **kwargs)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self.flights)
+        return stats
@@ -0,0 +1,188 @@
+######################################
+# Production server
+# Preforking entry point for the web app. The master process loads the
+# game data, matrices and plan table, imports the solver, binds the
+# listening socket and sets up the shared memory result caches, then
+# forks N workers. Everything loaded before the fork is shared between
+# the workers copy-on-write, and gc.freeze() keeps the garbage collector
+# from touching (and so copying) those pages. Each worker runs a threaded
+# server on the shared socket and solves in its request threads; the
+# master restarts workers that die and stops them all on SIGTERM/SIGINT.
+#
+# Jobs, incremental sessions and metrics stay per worker: poll a job or
+# reuse a session through the same worker, or run with --workers 1.
+#
+# Usage:
+#   python serve.py                             one worker per CPU on 127.0.0.1:8000
+#   python serve.py --workers 4 --port 8080
+######################################
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# A worker that dies sooner than this after starting is not restarted, so a broken worker can't fork-loop
+MIN_WORKER_LIFETIME = 1.0
+MAX_WORKERS = 64
+
+# Settings of the serving mode, unless the environment says otherwise: solves run in the worker
+# that took the request (the workers are the process pool), and workers share results in memory
+SERVE_DEFAULTS = {
+    "RAID_SOLVER_WORKERS": "0",
+    "RAID_SHARED_CACHE_SLOTS": "2048",
+}
+
+
+def preload():
+    """
+    Imports the app in the master with the current game data version, its plan table and the
+    solver loaded, then freezes every object that exists so far out of the garbage collector.
+    Returns the app module and the data watch interval the workers should use.
+    """
+    for name, value in SERVE_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+    # Only workers watch the data files: a swap in the master would not reach processes already forked
+    watch_interval = float(os.environ.get("RAID_DATA_WATCH_INTERVAL", 2))
+    os.environ["RAID_DATA_WATCH_INTERVAL"] = "0"
+    sys.path.insert(0, BASE_DIR)
+    import pulp  # noqa: F401  (loaded once here instead of on each worker's first solve)
+    import app as raid_app
+
+    raid_app.store.get().plan_table
+    gc.collect()
+    gc.freeze()
+    return raid_app, watch_interval
+
+
+def memory_usage(pid):
+    """
+    {"rss", "pss", "uss", "shared"} of a process in bytes from /proc/<pid>/smaps_rollup, or None
+    where that is not available. uss (pages only this process maps) is what each extra worker
+    costs; pss splits shared pages evenly between the processes mapping them.
+    """
+    fields = {"Rss": 0, "Pss": 0, "Private_Clean": 0, "Private_Dirty": 0, "Shared_Clean": 0, "Shared_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            for line in file:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    fields[name] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        return None
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+    }
+
+
+def child_pids(pid):
+    """
+    Process ids of the direct children of pid, from /proc; empty where that is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as file:
+            return [int(child) for child in file.read().split()]
+    except (OSError, ValueError):
+        return []
+
+
+def run_worker(raid_app, sock, watch_interval):
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if watch_interval > 0:
+        raid_app.store.watch(watch_interval)
+    server = make_server(sock.getsockname()[0], sock.getsockname()[1], raid_app.app, threaded=True,
+                         fd=sock.fileno())
+    # shutdown() waits for serve_forever to return, so it can't run in the signal handler's thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    server.serve_forever()
+
+
+def spawn(raid_app, sock, watch_interval):
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 0
+    try:
+        run_worker(raid_app, sock, watch_interval)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        # Never return into the master's loop
+        os._exit(code)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the raid calculator with preforked workers.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPUs)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    args = parser.parse_args(argv)
+    if not 1 <= args.workers <= MAX_WORKERS:
+        parser.error(f"--workers must be between 1 and {MAX_WORKERS}")
+    if not hasattr(os, "fork"):
+        parser.error("serve.py needs os.fork; use app.py on this platform")
+
+    raid_app, watch_interval = preload()
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    sock.set_inheritable(True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    workers = {}
+    for _ in range(args.workers):
+        workers[spawn(raid_app, sock, watch_interval)] = time.monotonic()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers (master pid {os.getpid()})",
+          file=sys.stderr, flush=True)
+
+    while workers and not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if not pid:
+            time.sleep(0.2)
+            continue
+        started = workers.pop(pid, None)
+        if started is None:
+            continue
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            print(f"Worker {pid} exited right after starting; not restarting it", file=sys.stderr, flush=True)
+            continue
+        print(f"Worker {pid} exited with status {status}; restarting it", file=sys.stderr, flush=True)
+        workers[spawn(raid_app, sock, watch_interval)] = time.monotonic()
+
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
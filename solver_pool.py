@@ -0,0 +1,201 @@
+######################################
+# Solver worker pool
+# Runs optimizer calls in a bounded process pool instead of the web request
+# thread. Each call gets a wall-clock limit that is passed to the solver,
+# and once every worker is busy and the wait queue is full new calls are
+# rejected straight away so the caller can answer 503 instead of piling up.
+# Solves that must run in this process (their state lives here) take turns
+# on as many slots as there are workers. A map() over many items holds one
+# slot per chunk in flight and only ever uses part of the workers, so single
+# solves still get through while a batch runs.
+######################################
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+
+# Extra seconds to wait past the solver's own limit before giving up on a worker
+TIME_LIMIT_GRACE = 5
+# Share of the workers one map() may keep busy
+MAP_WORKER_SHARE = 0.5
+
+
+class SolverBusy(RuntimeError):
+    def __init__(self, retry_after):
+        super().__init__("All solver workers are busy, try again shortly.")
+        self.retry_after = retry_after
+
+
+class SolverTimeout(RuntimeError):
+    pass
+
+
+def _apply_chunk(fn, chunk):
+    return [fn(item) for item in chunk]
+
+
+class SolverPool:
+    """
+    Bounded pool for `fn`, which must accept a `time_limit` keyword argument.
+    At most max_workers calls run at once and at most max_queue more wait for a worker.
+    max_workers=0 runs calls in the calling thread, one at a time, still subject to the queue bound.
+    """
+
+    def __init__(self, fn, max_workers=None, max_queue=None, time_limit=30, retry_after=5):
+        self.fn = fn
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_queue = 2 * max(self.max_workers, 1) if max_queue is None else max_queue
+        self.time_limit = time_limit
+        self.retry_after = retry_after
+        self.slots = threading.BoundedSemaphore(max(self.max_workers, 1) + self.max_queue)
+        # Turns for solves run in the calling thread
+        self.local_turns = threading.BoundedSemaphore(max(self.max_workers, 1))
+        self.lock = threading.Lock()
+        self.executor = None
+        self.counters = {"submitted": 0, "rejected": 0, "timed_out": 0, "active": 0}
+
+    def _executor(self):
+        # Created on first use so importing the app in a worker never starts a nested pool
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self.executor
+
+    def _release(self, _future=None):
+        with self.lock:
+            self.counters["active"] -= 1
+        self.slots.release()
+
+    def _acquire(self, most=1):
+        # Takes between one and `most` slots without waiting and returns how many it got
+        taken = 0
+        while taken < most and self.slots.acquire(blocking=False):
+            taken += 1
+        if not taken:
+            with self.lock:
+                self.counters["rejected"] += 1
+            raise SolverBusy(self.retry_after)
+        with self.lock:
+            self.counters["submitted"] += 1
+            self.counters["active"] += taken
+        return taken
+
+    def _timed_out(self, message):
+        with self.lock:
+            self.counters["timed_out"] += 1
+        return SolverTimeout(message)
+
+    def run_local(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, time_limit=..., **kwargs) in the calling thread, for solves whose state
+        lives in this process. It takes a pool slot like run(), so the same backpressure applies,
+        and at most max_workers (at least one) of these calls run at once while the rest wait for
+        a turn. Waiting counts against the time limit: fn gets what is left of it, and
+        SolverTimeout is raised when the limit passes before a turn comes up.
+        """
+        self._acquire()
+        try:
+            started = time.monotonic()
+            if not self.local_turns.acquire(timeout=self.time_limit or None):
+                raise self._timed_out("The optimizer did not get to run within its time limit.")
+            try:
+                time_limit = self.time_limit - (time.monotonic() - started) if self.time_limit else self.time_limit
+                return fn(*args, time_limit=time_limit, **kwargs)
+            finally:
+                self.local_turns.release()
+        finally:
+            self._release()
+
+    def run(self, *args, **kwargs):
+        """
+        Runs fn(*args, time_limit=..., **kwargs) on a worker and returns its result.
+        Raises SolverBusy when the queue is full and SolverTimeout when the worker overruns.
+        """
+        return self.run_with(self.fn, *args, **kwargs)
+
+    def run_with(self, fn, *args, **kwargs):
+        """
+        run() with another picklable fn, which must also accept a `time_limit` keyword argument.
+        """
+        if self.max_workers == 0:
+            return self.run_local(fn, *args, **kwargs)
+
+        self._acquire()
+
+        try:
+            future = self._executor().submit(fn, *args, time_limit=self.time_limit, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # The slot is only freed once the worker finishes, even if the caller stopped waiting
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.time_limit + TIME_LIMIT_GRACE if self.time_limit else None)
+        except FutureTimeoutError:
+            raise self._timed_out("The optimizer did not finish within its time limit.")
+
+    def map(self, fn, items):
+        """
+        Returns [fn(item) for item in items], computed on the pool's workers in chunks. Each chunk
+        in flight holds a slot, and at most MAP_WORKER_SHARE of the workers (at least one) work on
+        one map; it raises SolverBusy only when no slot is free at all. fn gets no time limit of
+        its own and should bound each item itself, while the whole map must finish within the
+        pool's time limit (plus TIME_LIMIT_GRACE) or SolverTimeout is raised and the chunks not yet
+        started are dropped. With max_workers=0 it runs here.
+        """
+        deadline = time.monotonic() + self.time_limit + TIME_LIMIT_GRACE if self.time_limit else None
+        if self.max_workers == 0:
+            def run_items(time_limit):
+                results = []
+                for item in items:
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise self._timed_out("The batch did not finish within its time limit.")
+                    results.append(fn(item))
+                return results
+            return self.run_local(run_items)
+
+        items = list(items)
+        free = self._acquire(max(1, int(self.max_workers * MAP_WORKER_SHARE)))
+        chunksize = max(1, len(items) // (self.max_workers * 4))
+        chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+        results = [None] * len(chunks)
+        running = {}
+        try:
+            executor = self._executor()
+            submitted = 0
+            while submitted < len(chunks) or running:
+                while free and submitted < len(chunks):
+                    running[executor.submit(_apply_chunk, fn, chunks[submitted])] = submitted
+                    submitted += 1
+                    free -= 1
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    raise self._timed_out("The batch did not finish within its time limit.")
+                for future in done:
+                    results[running.pop(future)] = future.result()
+                    free += 1
+        finally:
+            for future in running:
+                # Chunks already on a worker keep their slot until they finish
+                if future.cancel():
+                    free += 1
+                else:
+                    future.add_done_callback(self._release)
+            for _ in range(free):
+                self._release()
+        return [result for chunk in results for result in chunk]
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats["max_workers"] = self.max_workers
+        stats["max_queue"] = self.max_queue
+        return stats
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
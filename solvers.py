@@ -0,0 +1,373 @@
+######################################
+# Solver backends
+# The per-type raid model can be solved by CBC through PuLP or by an
+# in-process dynamic program over owned-inventory usage. The DP avoids
+# writing an MPS file and starting a CBC process, which dominates latency
+# for small raids; CBC remains the fallback when the DP state space is too big.
+######################################
+
+import time
+
+from patterns import add_timing, kill_pattern_alternatives, kill_pattern_table, solve_by_type
+
+# Upper bounds on the DP: distinct owned-inventory states and state x pattern x instance steps
+DP_STATE_LIMIT = 20000
+DP_WORK_LIMIT = 200000
+
+
+class SolverNotApplicable(ValueError):
+    pass
+
+
+def solve_dp(selected_structures, explosive_dict, explosives, structures, timings=None, tables=None):
+    """
+    Exact bounded-knapsack DP over owned explosives.
+    Every instance picks one kill pattern; the state is how many of each owned explosive
+    have been spent so far and the value is the crafted sulfur paid. Only instances that
+    can still receive owned explosives are stepped through, the rest use the cheapest
+    crafted-only pattern. Returns the same solution dict as patterns.solve_by_type.
+    tables ({structure: kill pattern rows, cheapest first}) skips building the pattern tables;
+    rows spending more owned explosives than explosive_dict allows are skipped.
+    """
+    curve = dp_cost_curve(selected_structures, explosive_dict, explosives, structures, timings, tables)
+    started = time.perf_counter()
+    # The cheapest final state, spending as little owned inventory as possible on ties
+    state = min(curve["cost"], key=lambda s: (curve["cost"][s], sum(curve["digits"](s))))
+    solution = dp_solution(curve, state)
+    add_timing(timings, "extract", started)
+    return solution
+
+
+def dp_cost_curve(selected_structures, explosive_dict, explosives, structures, timings=None, tables=None,
+                  work_limit=DP_WORK_LIMIT):
+    """
+    Runs the owned-inventory DP of solve_dp and returns its state: "cost" maps every reachable
+    state (owned explosives spent, as a mixed-radix integer over "owned_list" with digits up to
+    "limits") to the least total crafted sulfur that spends exactly that much. "digits"(state)
+    turns a state into per-explosive counts; dp_solution(curve, state) builds the plan for one.
+    Raises SolverNotApplicable when the state space or the work (state x pattern x instance steps)
+    is over the DP limits; work_limit raises the latter for callers that reuse one curve many times.
+    """
+    started = time.perf_counter()
+    explosive_list = list(explosive_dict.keys())
+    owned_list = [exp for exp in explosive_list if explosive_dict[exp] > 0]
+    limits = tuple(explosive_dict[exp] for exp in owned_list)
+
+    state_count = 1
+    for limit in limits:
+        state_count *= limit + 1
+    if state_count > DP_STATE_LIMIT:
+        raise SolverNotApplicable("Owned inventory is too large for the DP solver.")
+
+    if tables is None:
+        tables = {
+            struct: kill_pattern_table(struct, explosive_dict, explosives, structures)
+            for struct in selected_structures
+        }
+
+    # Instances that receive owned explosives each take at least one, so at most sum(limits) of them
+    steps = {struct: min(qty, sum(limits)) for struct, qty in selected_structures.items()}
+    work = sum(state_count * len(tables[struct]) * steps[struct] for struct in selected_structures)
+    if work > work_limit:
+        raise SolverNotApplicable("Raid is too large for the DP solver.")
+    started = add_timing(timings, "build", started)
+
+    # States are mixed-radix integers: digit k is how many of owned_list[k] have been spent
+    strides = []
+    stride = 1
+    for limit in limits:
+        strides.append(stride)
+        stride *= limit + 1
+
+    def digits(state):
+        return tuple((state // s) % (limit + 1) for s, limit in zip(strides, limits))
+
+    cost = {0: 0}
+    history = []
+    base_sulfur = 0
+    default_rows = {}
+    for struct, qty in selected_structures.items():
+        rows = tables[struct]
+        default_rows[struct] = next(p for p, row in enumerate(rows) if not row["owned"])
+        moves = []
+        for p, row in enumerate(rows):
+            spent = [row["owned"].get(exp, 0) for exp in owned_list]
+            offset = sum(a * s for a, s in zip(spent, strides))
+            room = tuple(limit - a for a, limit in zip(spent, limits))
+            moves.append((p, offset, row["sulfur"], room))
+        # Moves that still fit in the owned inventory, worked out once per reachable state
+        valid_moves = {}
+        for _ in range(steps[struct]):
+            new_cost = {}
+            parents = {}
+            for state, sulfur in cost.items():
+                fitting = valid_moves.get(state)
+                if fitting is None:
+                    spent_so_far = digits(state)
+                    fitting = valid_moves[state] = [
+                        (p, offset, pattern_sulfur) for p, offset, pattern_sulfur, room in moves
+                        if all(d <= r for d, r in zip(spent_so_far, room))
+                    ]
+                for p, offset, pattern_sulfur in fitting:
+                    after = state + offset
+                    total = sulfur + pattern_sulfur
+                    if total < new_cost.get(after, total + 1):
+                        new_cost[after] = total
+                        parents[after] = (state, p)
+            cost = new_cost
+            history.append((struct, parents))
+        base_sulfur += (qty - steps[struct]) * rows[default_rows[struct]]["sulfur"]
+
+    add_timing(timings, "solve", started)
+    return {
+        "selected_structures": selected_structures,
+        "explosive_list": explosive_list,
+        "owned_list": owned_list,
+        "limits": limits,
+        "digits": digits,
+        "cost": {state: sulfur + base_sulfur for state, sulfur in cost.items()},
+        "history": history,
+        "steps": steps,
+        "default_rows": default_rows,
+        "tables": tables,
+    }
+
+
+def dp_solution(curve, state):
+    """
+    Walks back from one final state of a dp_cost_curve and returns the plan that reaches it,
+    as the same solution dict as patterns.solve_by_type.
+    """
+    selected_structures = curve["selected_structures"]
+    tables = curve["tables"]
+    sulfur_cost = curve["cost"][state]
+    owned_used = {exp: 0 for exp in curve["explosive_list"]}
+    owned_used.update(zip(curve["owned_list"], curve["digits"](state)))
+    counts = {struct: {} for struct in selected_structures}
+    for struct, parents in reversed(curve["history"]):
+        state, p = parents[state]
+        counts[struct][p] = counts[struct].get(p, 0) + 1
+    for struct, qty in selected_structures.items():
+        if qty > curve["steps"][struct]:
+            p = curve["default_rows"][struct]
+            counts[struct][p] = counts[struct].get(p, 0) + qty - curve["steps"][struct]
+
+    pattern_counts = {
+        struct: [(tables[struct][p]["pattern"], counts[struct][p]) for p in sorted(counts[struct])]
+        for struct in selected_structures
+    }
+    return {
+        "pattern_counts": pattern_counts,
+        "owned_used": owned_used,
+        "sulfur_cost": sulfur_cost,
+        "optimal": True,
+    }
+
+
+def _keep_best(candidates, k):
+    # Cheapest k entries with distinct explosive usage; entries are (sulfur, usage, back pointer)
+    candidates.sort(key=lambda entry: entry[0])
+    kept = []
+    seen = set()
+    for entry in candidates:
+        if entry[1] not in seen:
+            seen.add(entry[1])
+            kept.append(entry)
+            if len(kept) == k:
+                break
+    return kept
+
+
+def solve_dp_top_k(selected_structures, explosive_dict, explosives, structures, k, timings=None):
+    """
+    The k cheapest raid plans that differ in how many of each explosive they use (owned or
+    crafted), cheapest first, as solution dicts like solve_dp's. It is the same DP over owned
+    inventory, keeping the k cheapest distinct usages per state instead of one, over kill
+    patterns that include alternative crafted fills (patterns.kill_pattern_alternatives).
+    Any top-k plan extends one of the k best distinct prefixes at its state, so this is exact.
+    Raises SolverNotApplicable when the inventory or raid is too large for the DP.
+    """
+    started = time.perf_counter()
+    explosive_list = list(explosive_dict.keys())
+    owned_list = [exp for exp in explosive_list if explosive_dict[exp] > 0]
+    limits = tuple(explosive_dict[exp] for exp in owned_list)
+    state_count = 1
+    for limit in limits:
+        state_count *= limit + 1
+    if state_count > DP_STATE_LIMIT:
+        raise SolverNotApplicable("Owned inventory is too large for the DP solver.")
+
+    tables = {
+        struct: kill_pattern_alternatives(struct, explosive_dict, explosives, structures, k)
+        for struct in selected_structures
+    }
+    steps = {struct: min(qty, sum(limits)) for struct, qty in selected_structures.items()}
+    work = sum(state_count * len(tables[struct]) * steps[struct] for struct in selected_structures)
+    if work > DP_WORK_LIMIT:
+        raise SolverNotApplicable("Raid is too large for the DP solver.")
+    started = add_timing(timings, "build", started)
+
+    strides = []
+    stride = 1
+    for limit in limits:
+        strides.append(stride)
+        stride *= limit + 1
+
+    def digits(state):
+        return tuple((state // s) % (limit + 1) for s, limit in zip(strides, limits))
+
+    def usage_of(pattern, times=1):
+        return tuple(pattern.get(exp, 0) * times for exp in explosive_list)
+
+    def add(a, b):
+        return tuple(x + y for x, y in zip(a, b))
+
+    # entries[state] = [(sulfur, usage per explosive, (previous state, previous entry, ((pattern, count), ...)))]
+    entries = {0: [(0, (0,) * len(explosive_list), None)]}
+    history = []
+    for struct, qty in selected_structures.items():
+        rows = tables[struct]
+        moves = []
+        for p, row in enumerate(rows):
+            spent = [row["owned"].get(exp, 0) for exp in owned_list]
+            offset = sum(a * s for a, s in zip(spent, strides))
+            room = tuple(limit - a for a, limit in zip(spent, limits))
+            moves.append((p, offset, row["sulfur"], room, usage_of(row["pattern"])))
+        # Instances that may still receive owned explosives try every pattern
+        for _ in range(steps[struct]):
+            candidates = {}
+            for state, kept in entries.items():
+                spent_so_far = digits(state)
+                for p, offset, sulfur, room, usage in moves:
+                    if all(d <= r for d, r in zip(spent_so_far, room)):
+                        bucket = candidates.setdefault(state + offset, [])
+                        for i, (total, used, _) in enumerate(kept):
+                            bucket.append((total + sulfur, add(used, usage), (state, i, ((p, 1),))))
+            entries = {state: _keep_best(bucket, k) for state, bucket in candidates.items()}
+            history.append((struct, entries))
+
+        # The rest only use crafted patterns: the k best multisets of them, found once for all states
+        rest = qty - steps[struct]
+        if rest:
+            crafted = [(p, sulfur, usage) for p, _, sulfur, room, usage in moves if not rows[p]["owned"]]
+            multisets = [(0, (0,) * len(explosive_list), (0,) * len(crafted))]
+            for _ in range(rest):
+                multisets = _keep_best([
+                    (total + sulfur, add(used, usage), chosen[:j] + (chosen[j] + 1,) + chosen[j + 1:])
+                    for total, used, chosen in multisets
+                    for j, (p, sulfur, usage) in enumerate(crafted)
+                ], k)
+            multisets = [
+                (total, used, tuple((crafted[j][0], n) for j, n in enumerate(chosen) if n))
+                for total, used, chosen in multisets
+            ]
+            entries = {
+                state: _keep_best([
+                    (total + extra, add(used, usage), (state, i, chosen))
+                    for i, (total, used, _) in enumerate(kept)
+                    for extra, usage, chosen in multisets
+                ], k)
+                for state, kept in entries.items()
+            }
+            history.append((struct, entries))
+    started = add_timing(timings, "solve", started)
+
+    final = sorted(
+        ((entry[0], sum(digits(state)), state, i) for state, kept in entries.items() for i, entry in enumerate(kept))
+    )[:k]
+    solutions = []
+    for sulfur_cost, _, state, i in final:
+        owned_used = {exp: 0 for exp in explosive_list}
+        owned_used.update(zip(owned_list, digits(state)))
+        counts = {struct: {} for struct in selected_structures}
+        for struct, step in reversed(history):
+            state, i, chosen = step[state][i][2]
+            for p, n in chosen:
+                counts[struct][p] = counts[struct].get(p, 0) + n
+        solutions.append({
+            "pattern_counts": {
+                struct: [(tables[struct][p]["pattern"], counts[struct][p]) for p in sorted(counts[struct])]
+                for struct in selected_structures
+            },
+            "owned_used": owned_used,
+            "sulfur_cost": sulfur_cost,
+            "optimal": True,
+        })
+    add_timing(timings, "extract", started)
+    return solutions
+
+
+def solve_table(selected_structures, explosive_dict, plan_table):
+    """
+    Answers zero-inventory raids straight from the precomputed plan table:
+    every instance of a structure uses the cheapest crafted plan for the selected explosives.
+    """
+    if any(explosive_dict.values()):
+        raise SolverNotApplicable("The plan table only covers raids without owned explosives.")
+    explosive_list = list(explosive_dict.keys())
+    pattern_counts = {}
+    sulfur_cost = 0
+    for struct, qty in selected_structures.items():
+        best = plan_table.best(struct, explosive_list)
+        if best is None:
+            raise ValueError(f"Selected explosives cannot destroy '{struct}'.")
+        sulfur, plan = best
+        pattern_counts[struct] = [(plan, qty)]
+        sulfur_cost += sulfur * qty
+    return {
+        "pattern_counts": pattern_counts,
+        "owned_used": {exp: 0 for exp in explosive_list},
+        "sulfur_cost": sulfur_cost,
+        "optimal": True,
+    }
+
+
+SOLVER_BACKENDS = {
+    "dp": solve_dp,
+    "cbc": solve_by_type,
+}
+
+
+def solve_raid(selected_structures, explosive_dict, explosives, structures, backend="auto", plan_table=None,
+               time_limit=None, on_incumbent=None, timings=None, solve_info=None):
+    """
+    Solves the per-type raid model with the chosen backend.
+    "auto" answers zero-inventory raids from the plan table when one is given, otherwise uses
+    the DP solver and falls back to CBC when the DP does not apply. time_limit only applies to
+    CBC; the table and DP backends are bounded by construction. on_incumbent(sulfur) is called
+    whenever a better plan is known. timings, if given, collects seconds per phase
+    ("build", "write", "solve", "extract") as in patterns.solve_by_type, and solve_info gets
+    the "backend" that answered plus the model size when CBC was used.
+    """
+    if backend == "auto":
+        if plan_table is not None and not any(explosive_dict.values()):
+            backend = "table"
+        else:
+            try:
+                solution = solve_dp(selected_structures, explosive_dict, explosives, structures, timings)
+            except SolverNotApplicable:
+                backend = "cbc"
+            else:
+                if solve_info is not None:
+                    solve_info["backend"] = "dp"
+                backend = None
+    if solve_info is not None and backend is not None:
+        solve_info["backend"] = backend
+    if backend == "table":
+        if plan_table is None:
+            raise ValueError("The table backend needs a plan table.")
+        started = time.perf_counter()
+        solution = solve_table(selected_structures, explosive_dict, plan_table)
+        add_timing(timings, "solve", started)
+    elif backend == "cbc":
+        return solve_by_type(
+            selected_structures, explosive_dict, explosives, structures, time_limit, on_incumbent, timings, solve_info
+        )
+    elif backend is not None:
+        if backend not in SOLVER_BACKENDS:
+            raise ValueError(f"Unknown solver backend '{backend}'.")
+        solution = SOLVER_BACKENDS[backend](selected_structures, explosive_dict, explosives, structures,
+                                            timings=timings)
+    if on_incumbent is not None:
+        on_incumbent(solution["sulfur_cost"])
+    return solution
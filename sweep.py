@@ -0,0 +1,126 @@
+######################################
+# What-if sweep over owned inventory
+# For a fixed raid, tabulates the crafted sulfur as the owned count of one
+# or two explosives varies over a grid. One DP run at the largest counts
+# gives the cheapest plan for every exact amount spent; a running minimum
+# along the swept axes then answers every grid point at once.
+######################################
+
+import csv
+import itertools
+
+import numpy as np
+
+from batch import parse_explosives, parse_raid_spec
+from solvers import dp_cost_curve, solve_raid, SolverNotApplicable
+
+# Explosives that can be swept at once
+MAX_SWEPT = 2
+# Grid points in one sweep
+MAX_SWEEP_POINTS = 20000
+# A single DP run replaces every grid point's solve, so it may do far more work than one request
+SWEEP_WORK_LIMIT = 20000000
+
+
+def parse_sweep(spec, explosives, structures):
+    """
+    Validates a sweep spec of the form
+    {"structures": {name: quantity}, "explosives": {name: owned}, "sweep": {name: max or {"min", "max", "step"}}}
+    and returns (selected_structures, explosive_dict, {explosive: owned counts to try}).
+    Swept explosives are added to the allowed explosives. Raises ValueError on bad input.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Sweep spec must be a JSON object.")
+    sweep = spec.get("sweep")
+    if not isinstance(sweep, dict) or not 1 <= len(sweep) <= MAX_SWEPT:
+        raise ValueError(f"\"sweep\" must name 1 to {MAX_SWEPT} explosives.")
+    explosive_dict = parse_explosives(spec.get("explosives"), explosives)
+    values = {}
+    for exp, grid in sweep.items():
+        if exp not in explosives:
+            raise ValueError(f"Explosive type '{exp}' not found.")
+        if not isinstance(grid, dict):
+            grid = {"max": grid}
+        low, high, step = grid.get("min", 0), grid.get("max"), grid.get("step", 1)
+        if any(not isinstance(n, int) or isinstance(n, bool) for n in (low, high, step)):
+            raise ValueError("Sweep min, max and step must be integers.")
+        if low < 0 or high < low or step <= 0:
+            raise ValueError("Sweep ranges need 0 <= min <= max and a positive step.")
+        values[exp] = list(range(low, high + 1, step))
+        if values[exp][-1] != high:
+            values[exp].append(high)
+        explosive_dict.setdefault(exp, 0)
+    selected_structures, explosive_dict = parse_raid_spec(
+        {"structures": spec.get("structures"), "explosives": explosive_dict}, explosives, structures
+    )
+    return selected_structures, explosive_dict, values
+
+
+def owned_sweep(selected_structures, explosive_dict, sweep, explosives, structures, plan_table=None,
+                time_limit=None):
+    """
+    Minimum crafted sulfur for the raid at every combination of owned counts in
+    sweep ({explosive: list of owned counts}, one or two explosives). Explosives in
+    explosive_dict that are not swept keep their owned amounts.
+    Returns {"explosives": swept names, "rows": [{explosive: owned, ..., "sulfur_cost": n}],
+    "method": "dp" or "points"}. "points" means the grid was too large for one DP run and
+    every point was solved on its own (still sharing the memoized kill-pattern searches).
+    """
+    if not 1 <= len(sweep) <= MAX_SWEPT:
+        raise ValueError(f"Sweep between 1 and {MAX_SWEPT} explosives.")
+    names = list(sweep)
+    points = list(itertools.product(*(sweep[exp] for exp in names)))
+    if len(points) > MAX_SWEEP_POINTS:
+        raise ValueError(f"At most {MAX_SWEEP_POINTS} sweep points.")
+    limits = dict(explosive_dict)
+    limits.update({exp: max(sweep[exp]) for exp in names})
+
+    try:
+        curve = dp_cost_curve(selected_structures, limits, explosives, structures, work_limit=SWEEP_WORK_LIMIT)
+    except SolverNotApplicable:
+        curve = None
+
+    rows = []
+    if curve is not None:
+        method = "dp"
+        owned_list = curve["owned_list"]
+        # Flat index = mixed-radix state, so axis 0 is the last owned explosive
+        shape = tuple(limit + 1 for limit in reversed(curve["limits"])) or (1,)
+        cost = np.full(int(np.prod(shape)), np.inf)
+        for state, sulfur in curve["cost"].items():
+            cost[state] = sulfur
+        cost = cost.reshape(shape)
+        for k, exp in enumerate(owned_list):
+            axis = len(owned_list) - 1 - k
+            if exp in sweep:
+                # Owning more never has to be used: the best plan for "up to n" is a running minimum
+                cost = np.minimum.accumulate(cost, axis=axis)
+            else:
+                cost = cost.min(axis=axis, keepdims=True)
+        for point in points:
+            owned = dict(zip(names, point))
+            index = tuple(
+                owned[exp] if exp in sweep else 0 for exp in reversed(owned_list)
+            ) or (0,)
+            rows.append(dict(owned, sulfur_cost=int(cost[index])))
+    else:
+        method = "points"
+        for point in points:
+            owned = dict(zip(names, point))
+            solution = solve_raid(
+                selected_structures, dict(explosive_dict, **owned), explosives, structures, "auto", plan_table,
+                time_limit
+            )
+            rows.append(dict(owned, sulfur_cost=solution["sulfur_cost"]))
+    return {"explosives": names, "rows": rows, "method": method}
+
+
+def write_sweep_csv(result, file):
+    """
+    Writes a sweep result as CSV: one column per swept explosive, then sulfur_cost.
+    """
+    writer = csv.writer(file)
+    columns = result["explosives"] + ["sulfur_cost"]
+    writer.writerow(columns)
+    for row in result["rows"]:
+        writer.writerow([row[column] for column in columns])
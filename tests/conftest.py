@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app must not start the data file watcher or attach to a shared cache database
+os.environ["RAID_DATA_WATCH_INTERVAL"] = "0"
+os.environ.pop("RAID_CACHE_DB", None)
@@ -0,0 +1,34 @@
+import app as raid_app
+from batch import PARALLEL_THRESHOLD
+
+
+def post_batch(raids):
+    response = raid_app.app.test_client().post("/api/batch", json={"raids": raids})
+    assert response.status_code == 200
+    return response.get_json()["results"]
+
+
+def test_large_owned_inventories_are_solved():
+    # Too many owned combinations for the kill pattern tables, as on the optimizer page
+    raid = {"structures": {"armored_wall": 1}, "explosives": {"explosive_ammo": 1000, "f1_grenade": 1000}}
+    [result] = post_batch([raid])
+    assert "error" not in result
+    assert result["sulfur_cost"] == 0
+    assert result["explosive_owned_totals"]["explosive_ammo"] + result["explosive_owned_totals"]["f1_grenade"] > 0
+
+
+def test_pool_solves_match_local_solves_and_duplicates_are_copies():
+    raids = [
+        {"structures": {"stone_wall": i % 6 + 1, "wooden_door": i // 6 + 1}, "explosives": {"rocket": i % 3, "c4": 1}}
+        for i in range(PARALLEL_THRESHOLD + 2)
+    ]
+    submitted = raid_app.solver_pool.stats()["submitted"]
+    pooled = post_batch(raids + raids[:2])
+    assert raid_app.solver_pool.stats()["submitted"] == submitted + 1
+    local = raid_app.evaluate_raids(raids, raid_app.store.get().explosives, raid_app.store.get().structures)
+    assert pooled[:len(raids)] == local
+
+    direct = raid_app.evaluate_raids(raids[:1] * 2, raid_app.store.get().explosives, raid_app.store.get().structures)
+    assert direct[0] == direct[1] and direct[0] is not direct[1]
+    direct[0]["structure_usage"]["stone_wall"]["c4"] = -1
+    assert direct[1]["structure_usage"]["stone_wall"].get("c4") != -1
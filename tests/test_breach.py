@@ -0,0 +1,40 @@
+import random
+import time
+
+from engine import get_engine
+
+
+def test_large_owned_inventories_are_priced():
+    base = {"start": "outside", "target": "loot", "edges": [
+        {"from": "outside", "to": "hall", "structure": "armored_wall"},
+        {"from": "hall", "to": "loot", "structure": "armored_door"},
+    ]}
+    # Too many owned combinations for the kill pattern tables
+    explosive_dict = {"explosive_ammo": 1000, "f1_grenade": 1000}
+    engine = get_engine()
+    plans = engine.plan_breach(base, explosive_dict)
+    [path] = plans["paths"]
+    expected = engine.run_raid_optimizer({"armored_wall": 1, "armored_door": 1}, explosive_dict)
+    assert path["sulfur_cost"] == expected["sulfur_cost"]
+    assert path["rooms"] == ["outside", "hall", "loot"]
+
+
+def test_owned_stock_on_a_large_grid_is_proven_quickly():
+    rng = random.Random(3)
+    kinds = ["stone_wall", "metal_wall", "wooden_wall", "sheet_metal_door", "garage_door", "armored_door"]
+    size = 30
+    edges = [{"from": "outside", "to": f"0,{j}", "structure": rng.choice(kinds)} for j in range(size)]
+    for i in range(size):
+        for j in range(size):
+            if i + 1 < size:
+                edges.append({"from": f"{i},{j}", "to": f"{i + 1},{j}", "structure": rng.choice(kinds)})
+            if j + 1 < size:
+                edges.append({"from": f"{i},{j}", "to": f"{i},{j + 1}", "structure": rng.choice(kinds)})
+    base = {"start": "outside", "target": f"{size - 1},{size - 1}", "edges": edges}
+    engine = get_engine()
+    started = time.perf_counter()
+    plans = engine.plan_breach(base, {"rocket": 40, "c4": 12}, k=2)
+    assert time.perf_counter() - started < 5
+    assert plans["optimal"]
+    costs = [path["sulfur_cost"] for path in plans["paths"]]
+    assert costs == sorted(costs) and len(costs) == 2
@@ -0,0 +1,19 @@
+import io
+import json
+
+from engine import get_engine
+from raid_calculator import run_batch
+
+
+def test_batch_solves_what_the_interactive_optimizer_solves():
+    # Too many owned combinations for the kill pattern tables, so the patterns are generated
+    selected_structures = {"armored_wall": 1}
+    explosive_dict = {"explosive_ammo": 1000, "f1_grenade": 1000}
+    out = io.StringIO()
+    run_batch([json.dumps({"id": 7, "structures": selected_structures, "explosives": explosive_dict})], out)
+    result = json.loads(out.getvalue())
+    assert result["id"] == 7
+    assert "error" not in result
+    expected = get_engine().run_raid_optimizer(selected_structures, explosive_dict)
+    assert result["sulfur_cost"] == expected["sulfur_cost"]
+    assert result["explosive_totals"] == expected["explosive_totals"]
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from anytime import greedy_solution
+from engine import get_engine
+
+RAIDS = 15
+
+
+@pytest.mark.parametrize("selected_structures, explosive_dict", [
+    # CBC preprocessing returned 3 rockets as optimal here, where 6 satchels cost less
+    ({"chain_link_fence": 3}, {"rocket": 0, "satchel_charge": 0}),
+    # ...and called this one infeasible (750 HP at 15.0075 per hit)
+    ({"metal_shop_front": 3}, {"high_velocity_rocket": 1}),
+])
+def test_per_instance_matches_by_type(selected_structures, explosive_dict, capfd):
+    engine = get_engine()
+    per_instance = engine.run_raid_optimizer(selected_structures, explosive_dict, "per_instance")
+    by_type = engine.run_raid_optimizer(selected_structures, explosive_dict)
+    assert per_instance["optimal"]
+    assert per_instance["sulfur_cost"] == by_type["sulfur_cost"]
+    # CBC's log stays out of the web server's and the CLI's output
+    assert capfd.readouterr().out == ""
+
+
+def test_per_instance_matches_by_type_on_random_raids():
+    engine = get_engine()
+    rng = random.Random(3)
+    for _ in range(RAIDS):
+        selected_structures = {
+            struct: rng.randint(1, 3) for struct in rng.sample(sorted(engine.structures), rng.randint(1, 2))
+        }
+        explosive_dict = {exp: rng.choice((0, 0, 1, 2)) for exp in rng.sample(sorted(engine.explosives), 3)}
+        try:
+            by_type = engine.run_raid_optimizer(selected_structures, explosive_dict)
+        except ValueError:
+            continue
+        per_instance = engine.run_raid_optimizer(selected_structures, explosive_dict, "per_instance", time_limit=20)
+        assert per_instance["sulfur_cost"] == by_type["sulfur_cost"], (selected_structures, explosive_dict)
+
+
+def test_time_limited_per_instance_still_returns_a_plan():
+    engine = get_engine()
+    # 100 instances against 7 explosives with owned stock: CBC finds no plan of its own in a second
+    structures = sorted(engine.structures)
+    selected_structures = {struct: 0 for struct in structures}
+    for i in range(100):
+        selected_structures[structures[i % len(structures)]] += 1
+    explosive_dict = {exp: 50 for exp in engine.explosives}
+    output = engine.run_raid_optimizer(selected_structures, explosive_dict, "per_instance", time_limit=1)
+    # ...so it starts from the greedy plan and never ends on a worse one
+    greedy = greedy_solution(selected_structures, explosive_dict, engine.explosives, engine.structures)
+    assert 0 < output["sulfur_cost"] <= greedy["sulfur_cost"]
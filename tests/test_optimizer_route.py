@@ -0,0 +1,53 @@
+import pytest
+from markupsafe import escape
+
+import app as raid_app
+from patterns import NoPlanFound
+
+FORM = {"qty_wooden_door": "2", "use_satchel_charge": "on", "owned_satchel_charge": "0"}
+
+
+@pytest.mark.parametrize("exception, status", [
+    (NoPlanFound("No raid plan was found within the time limit."), 504),
+    (ValueError("Game data version 'current' has changed since the request started."), 400),
+])
+def test_solver_errors_render_on_the_page(monkeypatch, exception, status):
+    raid_app.optimizer_cache.clear()
+
+    def failing_solve(*args, **kwargs):
+        raise exception
+
+    monkeypatch.setattr(raid_app, "solve_and_cache", failing_solve)
+    response = raid_app.app.test_client().post("/optimizer", data=FORM)
+    assert response.status_code == status
+    assert f"<strong>{escape(str(exception))}</strong>" in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize("form", [
+    {"explosives": ["satchel_charge"]},
+    {"structure": "moat", "explosives": ["satchel_charge"]},
+    {"structure": "wooden_door", "explosives": ["nuke"]},
+])
+def test_damage_errors_render_on_the_page(form):
+    response = raid_app.app.test_client().post("/damage", data=form)
+    assert response.status_code == 400
+    assert "<strong>" in response.get_data(as_text=True)
+
+
+def test_sessions_solve_cold_on_a_worker_and_only_warm_edits_locally(monkeypatch):
+    raid_app.optimizer_cache.clear()
+    pool = raid_app.solver_pool
+    calls = []
+    run_with, run_local = pool.run_with, pool.run_local
+    monkeypatch.setattr(pool, "run_with", lambda fn, *a, **k: calls.append("worker") or run_with(fn, *a, **k))
+    monkeypatch.setattr(pool, "run_local", lambda fn, *a, **k: calls.append(fn.__name__) or run_local(fn, *a, **k))
+    client = raid_app.app.test_client()
+    form = {"qty_stone_wall": "3", "use_rocket": "on", "owned_rocket": "6", "use_c4": "on", "owned_c4": "1"}
+    assert client.post("/optimizer", data=form).status_code == 200
+    assert calls == ["worker"]
+    # Fewer owned rockets only filters the tables the worker handed back
+    assert client.post("/optimizer", data=dict(form, owned_rocket="4")).status_code == 200
+    assert calls == ["worker", "session_raid_optimizer"]
+    # A structure type the session has no table for goes back to a worker
+    assert client.post("/optimizer", data=dict(form, qty_metal_wall="1")).status_code == 200
+    assert calls == ["worker", "session_raid_optimizer", "worker"]
@@ -0,0 +1,36 @@
+import json
+import os
+import time
+
+from recipes import RecipeGraph, RECIPES_FILE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def recipe_graph():
+    with open(os.path.join(ROOT, RECIPES_FILE)) as f:
+        return RecipeGraph(json.load(f))
+
+
+def test_large_orders_schedule_in_runs_and_meet_the_bound():
+    started = time.perf_counter()
+    schedule = recipe_graph().schedule({"rocket": 20000}, 16)
+    assert time.perf_counter() - started < 1
+    assert schedule["makespan"] == schedule["lower_bound"]
+    for bench in schedule["benches"]:
+        assert bench["busy"] == sum(job["end"] - job["start"] for job in bench["jobs"])
+        assert len(bench["jobs"]) < 20
+    crafted = {}
+    for bench in schedule["benches"]:
+        for job in bench["jobs"]:
+            crafted[job["item"]] = crafted.get(job["item"], 0) + job["crafts"]
+    assert crafted == schedule["crafts"]
+
+
+def test_a_higher_bench_still_gets_its_turn_after_the_others_idle():
+    # Only the level 3 bench can make the last rockets, after six lower benches ran out of work
+    schedule = recipe_graph().schedule(
+        {"satchel_charge": 37, "high_velocity_rocket": 66, "rocket": 44}, [1, 1, 1, 2, 2, 2, 3]
+    )
+    assert schedule["makespan"] >= schedule["lower_bound"]
+    assert any(job["item"] == "rocket" for job in schedule["benches"][-1]["jobs"])
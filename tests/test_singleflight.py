@@ -0,0 +1,42 @@
+import re
+import threading
+import time
+
+import app as raid_app
+
+USERS = 12
+FORM = {"qty_metal_shop_front": "3", "use_rocket": "on", "owned_rocket": "1", "use_c4": "on", "owned_c4": "0"}
+
+
+def test_identical_concurrent_optimizer_posts_share_one_solve(monkeypatch):
+    raid_app.optimizer_cache.clear()
+    real_solve = raid_app.solve_and_cache
+    solves = []
+
+    def counting_solve(*args, **kwargs):
+        solves.append(args[0])
+        # Long enough for every other request to arrive while this one is in flight
+        time.sleep(0.5)
+        return real_solve(*args, **kwargs)
+
+    monkeypatch.setattr(raid_app, "solve_and_cache", counting_solve)
+    start = threading.Barrier(USERS)
+    responses = [None] * USERS
+
+    def user(index):
+        client = raid_app.app.test_client()
+        start.wait()
+        responses[index] = client.post("/optimizer", data=FORM)
+
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(USERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(solves) == 1
+    assert all(response.status_code == 200 for response in responses)
+    pages = {response.get_data(as_text=True) for response in responses}
+    assert len(pages) == 1
+    assert re.search(r"Total Sulfur Cost: \d+", pages.pop())
+    assert raid_app.optimizer_flights.stats()["shared"] >= USERS - 1
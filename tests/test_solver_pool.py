@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from solver_pool import SolverBusy, SolverPool, SolverTimeout
+
+
+def test_local_solves_take_turns_and_waiting_counts_against_the_limit():
+    pool = SolverPool(None, max_workers=1, max_queue=2, time_limit=5)
+    running = []
+    peak = []
+    limits = []
+    lock = threading.Lock()
+
+    def solve(time_limit):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+            limits.append(time_limit)
+        time.sleep(0.2)
+        with lock:
+            running.pop()
+
+    threads = [threading.Thread(target=pool.run_local, args=(solve,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 1
+    assert max(limits) <= 5
+    # The last solve waited for the other two
+    assert min(limits) < 5 - 0.3
+
+
+def test_local_solves_past_the_queue_are_rejected_and_late_turns_time_out():
+    pool = SolverPool(None, max_workers=1, max_queue=1, time_limit=0.3)
+    started = threading.Event()
+    errors = []
+
+    def slow(time_limit):
+        started.set()
+        time.sleep(1)
+
+    def waiting_solve():
+        try:
+            pool.run_local(slow)
+        except SolverTimeout as e:
+            errors.append(e)
+
+    first = threading.Thread(target=pool.run_local, args=(slow,))
+    first.start()
+    started.wait()
+    second = threading.Thread(target=waiting_solve)
+    second.start()
+    time.sleep(0.05)
+    with pytest.raises(SolverBusy):
+        pool.run_local(slow)
+    second.join()
+    first.join()
+    assert len(errors) == 1
+    assert pool.stats()["timed_out"] == 1
+
+
+def test_map_holds_a_slot_per_chunk_and_leaves_workers_for_single_solves():
+    pool = SolverPool(None, max_workers=4, max_queue=4, time_limit=10)
+    active = []
+    try:
+        batch = threading.Thread(target=lambda: active.append(pool.map(time.sleep, [0.3] * 8)))
+        batch.start()
+        time.sleep(0.15)
+        during = pool.stats()["active"]
+        batch.join()
+    finally:
+        pool.shutdown()
+    # Half of the four workers, one slot each
+    assert during == 2
+    assert active == [[None] * 8]
+    assert pool.stats()["active"] == 0
+
+
+def test_map_past_its_deadline_times_out_and_frees_its_slots(monkeypatch):
+    monkeypatch.setattr("solver_pool.TIME_LIMIT_GRACE", 0)
+    pool = SolverPool(None, max_workers=2, max_queue=0, time_limit=0.3)
+    try:
+        started = time.monotonic()
+        with pytest.raises(SolverTimeout):
+            pool.map(time.sleep, [1] * 6)
+        assert time.monotonic() - started < 0.9
+        # The chunk still on a worker keeps its slot until it finishes
+        time.sleep(1)
+        assert pool.stats()["active"] == 0
+        assert pool.stats()["timed_out"] == 1
+    finally:
+        pool.shutdown()
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from engine import load_game_data
+from patterns import solve_by_type, solve_by_type_generated
+from solvers import SolverNotApplicable, solve_raid
+
+RAIDS = 40
+
+
+@pytest.fixture(scope="module")
+def game_data():
+    return load_game_data()
+
+
+def random_raid(rng, explosives, structures):
+    selected = {struct: rng.randint(1, 5) for struct in rng.sample(sorted(structures), rng.randint(1, 3))}
+    explosive_dict = {
+        exp: rng.choice((0, 0, 1, 2, 3, 5))
+        for exp in rng.sample(sorted(explosives), rng.randint(1, 4))
+    }
+    return selected, explosive_dict
+
+
+def test_dp_matches_cbc_on_random_raids(game_data):
+    explosives, structures = game_data
+    rng = random.Random(2)
+    compared = 0
+    for _ in range(RAIDS):
+        selected, explosive_dict = random_raid(rng, explosives, structures)
+        try:
+            cbc = solve_raid(selected, explosive_dict, explosives, structures, backend="cbc")
+        except ValueError:
+            # No selected explosive damages one of the structures
+            continue
+        try:
+            dp = solve_raid(selected, explosive_dict, explosives, structures, backend="dp")
+        except SolverNotApplicable:
+            continue
+        assert dp["sulfur_cost"] == cbc["sulfur_cost"], (selected, explosive_dict)
+        for exp, used in dp["owned_used"].items():
+            assert 0 <= used <= explosive_dict[exp]
+        compared += 1
+    assert compared >= RAIDS // 2
+
+
+def test_generated_patterns_match_listed_patterns(game_data):
+    explosives, structures = game_data
+    rng = random.Random(5)
+    for _ in range(RAIDS):
+        selected, explosive_dict = random_raid(rng, explosives, structures)
+        selected = {struct: qty * 6 for struct, qty in selected.items()}
+        try:
+            listed = solve_by_type(selected, explosive_dict, explosives, structures)
+        except ValueError:
+            continue
+        generated = solve_by_type_generated(selected, explosive_dict, explosives, structures)
+        assert generated["optimal"]
+        assert generated["sulfur_cost"] == listed["sulfur_cost"], (selected, explosive_dict)
+
+
+def test_large_owned_inventories_stay_flat_in_quantity(game_data):
+    explosives, structures = game_data
+    # Far too many owned combinations to list as kill patterns
+    explosive_dict = dict.fromkeys(explosives, 50)
+    for qty in (300, 3000):
+        selected = {"stone_wall": qty, "metal_wall": qty, "garage_door": qty}
+        solution = solve_raid(selected, explosive_dict, explosives, structures, backend="cbc")
+        assert solution["optimal"]
+        assert sum(count for _, count in solution["pattern_counts"]["metal_wall"]) == qty